@@ -0,0 +1,268 @@
+"""
+Benchmarks the deck pipeline of script.py on synthetic corpora
+
+A directory tree of decks is generated for every combination of --cards and
+--files, then each stage is timed and its peak memory traced with tracemalloc.
+Speech synthesis, decoding and translation are replaced by local fakes, so nothing
+here touches the network or needs SoX.
+
+    python3 benchmarks/pipeline.py                        # 1k to 100k cards, 10 to 1k files
+    python3 benchmarks/pipeline.py --full                 # up to 1M cards and 10k files
+    python3 benchmarks/pipeline.py --save                 # record the results as the baseline
+    python3 benchmarks/pipeline.py --tolerance 1.5        # fail if a stage is 50% slower than the baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import script
+
+BASELINE: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+DECKS_PER_DIRECTORY: int = 100
+TRANSLATED_LINES: int = 10000
+TESTED_CARDS: int = 1000
+
+
+class FakeTranslation:
+    def __init__(self, text: str):
+        self.text: str = text
+
+
+class FakeTranslator:
+    def translate(
+        self, text: str, src: str = "en", dest: str = "ru"
+    ) -> FakeTranslation:
+        return FakeTranslation(text[::-1])
+
+
+def fakeSynthesize(text: str, lang: str) -> bytes:
+    return f"{lang}:{text}".encode("utf-8")
+
+
+def fakeDecode(path: str) -> bytes:
+    with open(path, "rb") as clip:
+        return clip.read()
+
+
+class FakeSpeech(script.Silence):
+    """CachedSpeech without google_speech, clips go through the cache and player as usual"""
+
+    def __init__(self, text: str, lang: str, cache=None, player=None):
+        self.text, self.lang, self.cache, self.player = text, lang, cache, player
+
+    def play(self, sox_effects=()):
+        if self.text and self.player is not None:
+            self.player.submit(self.cache.fetch(self.text, self.lang))
+
+
+def generateCorpus(root: str, cards: int, files: int) -> list:
+    """writes (cards) cards spread over (files) decks, 100 decks to a directory, returns their paths"""
+    paths: list = []
+    per_file, extra = divmod(cards, files)
+    card: int = 0
+    for number in range(files):
+        directory: str = os.path.join(root, f"P{number // DECKS_PER_DIRECTORY}")
+        os.makedirs(directory, exist_ok=True)
+        path: str = os.path.join(directory, f"deck{number}")
+        count: int = per_file + (number < extra)
+        with open(path, "w") as deck:
+            deck.writelines(
+                f"R:Word {i}#слово {i}\n" for i in range(card, card + count)
+            )
+        card += count
+        paths.append(path)
+    return paths
+
+
+def measure(stage: Callable) -> tuple:
+    """returns (seconds, peak KiB) of calling stage"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started: float = time.perf_counter()
+    stage()
+    seconds: float = time.perf_counter() - started
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (seconds, peak // 1024)
+
+
+def stages(root: str, paths: list, cache_dir: str) -> list:
+    """the (name, function) of every stage, in the order they run"""
+    working_dir: str = os.path.join(root, "decks")
+    lines: list = []
+    answers = iter(())
+
+    def filesCold():
+        script.DECK_INDEXES.clear()
+        script.files(working_dir, [], [".py"])
+
+    def filesWarm():
+        script.files(working_dir, [], [".py"])
+
+    def getFile():
+        index = script.deckIndex(working_dir, [], [".py"])
+        lines.clear()
+        for deck in index.decks:
+            lines.extend(script.getFile(deck, {}, index, working_dir))
+
+    def parse():
+        script.parseLines(lines, "#")
+
+    def compileDeck():
+        for path in paths:
+            script.compileDeck(path, "#", cache_dir)
+
+    def sample():
+        index = script.deckIndex(working_dir, [], [".py"])
+        script.getRandomSelection({}, list(index.decks), working_dir, 30, "#", cache_dir)
+
+    def remodelData():
+        script.remodelData(lines, "#")
+
+    def makeTranslation():
+        script.makeTranslation(
+            [line.split("#")[1] for line in lines[:TRANSLATED_LINES]], "R", "ru"
+        )
+
+    def test():
+        nonlocal answers
+        cards: list = lines[:TESTED_CARDS]
+        answers = iter([line.split("#")[0] for line in cards] * 4)
+        # the player discards the clips rather than handing them to SoX
+        player = script.PlaybackWorker(["sh", "-c", "cat > /dev/null"])
+        try:
+            with open(os.devnull, "w") as devnull:
+                with script.redirect_stdout(devnull):
+                    script.Test(
+                        cards,
+                        "#",
+                        {"E": "en", "R": "ru"},
+                        True,
+                        script.AudioCache(os.path.join(cache_dir, "audio")),
+                        3,
+                        player,
+                        read=script.scriptedAnswers(answers),
+                    )
+        finally:
+            player.close()
+
+    return [
+        ("files() cold", filesCold),
+        ("files() warm", filesWarm),
+        ("getFile()", getFile),
+        ("parseLines()", parse),
+        ("compileDeck() cold", compileDeck),
+        ("compileDeck() warm", compileDeck),
+        ("getRandomSelection() cold", sample),
+        ("getRandomSelection() warm", sample),
+        ("remodelData()", remodelData),
+        (f"makeTranslation() {TRANSLATED_LINES} lines", makeTranslation),
+        (f"Test() {TESTED_CARDS} cards", test),
+    ]
+
+
+def run(cards: list, files: list) -> list:
+    results: list = []
+    for card_count in cards:
+        for file_count in files:
+            if file_count > card_count:
+                continue
+            with tempfile.TemporaryDirectory() as root:
+                paths: list = generateCorpus(
+                    os.path.join(root, "decks"), card_count, file_count
+                )
+                cache_dir: str = os.path.join(root, "cache")
+                for name, stage in stages(root, paths, cache_dir):
+                    seconds, peak = measure(stage)
+                    results.append(
+                        dict(
+                            stage=name,
+                            cards=card_count,
+                            files=file_count,
+                            seconds=round(seconds, 6),
+                            peak_kb=peak,
+                        )
+                    )
+                    print(
+                        f"{name:<34} {card_count:>8} cards {file_count:>6} files"
+                        f" {seconds * 1000:>10.1f} ms {peak:>10} KiB",
+                        flush=True,
+                    )
+    return results
+
+
+def key(result: dict) -> str:
+    return f"{result['stage']}/{result['cards']}/{result['files']}"
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """returns a message for every stage slower than tolerance times its baseline"""
+    previous: dict = {key(result): result for result in baseline}
+    regressions: list = []
+    for result in results:
+        before = previous.get(key(result))
+        # stages that take under a millisecond are too noisy to compare
+        if before and max(result["seconds"], before["seconds"]) >= 0.001:
+            ratio: float = result["seconds"] / max(before["seconds"], 1e-9)
+            if ratio > tolerance:
+                regressions.append(
+                    f"{key(result)} {before['seconds'] * 1000:.1f} ms"
+                    f" -> {result['seconds'] * 1000:.1f} ms ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", default="1000,10000,100000")
+    parser.add_argument("--files", default="10,100,1000")
+    parser.add_argument(
+        "--full", action="store_true", help="1k to 1M cards, 10 to 10k files"
+    )
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument(
+        "--save", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.full:
+        args.cards, args.files = "1000,10000,100000,1000000", "10,100,1000,10000"
+    random.seed(args.seed)
+    script.synthesize = fakeSynthesize
+    script.decodeClip = fakeDecode
+    script.googleTranslator = FakeTranslator
+    script.speechClass = lambda: FakeSpeech
+    script.COLOUR = False
+
+    results: list = run(
+        [int(n) for n in args.cards.split(",")], [int(n) for n in args.files.split(",")]
+    )
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+        print(f"saved baseline to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions: list = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Times a cold start of script.py
+
+Each run imports script in a fresh interpreter, as launching the CLI does, and the
+median is compared with also importing the audio and translation dependencies that
+script.py only loads when a command needs them.
+
+    python3 benchmarks/startup.py [--runs 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY: tuple = ("google_speech", "googletrans", "pendulum")
+
+
+def coldStart(statement: str, runs: int) -> list:
+    """returns the wall time in ms of running statement in (runs) fresh interpreters"""
+    timings: list = []
+    for _ in range(runs):
+        started: float = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    baseline: list = coldStart("pass", args.runs)
+    lazy: list = coldStart("import script", args.runs)
+    print(f"interpreter        {statistics.median(baseline):8.1f} ms")
+    print(f"import script      {statistics.median(lazy):8.1f} ms")
+    try:
+        eager: list = coldStart(f"import script, {', '.join(HEAVY)}", args.runs)
+        print(
+            f"with audio imports {statistics.median(eager):8.1f} ms  ({', '.join(HEAVY)})"
+        )
+    except subprocess.CalledProcessError:
+        print(
+            "could not import the audio and translation dependencies (is SoX installed?)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,302 @@
+from __future__ import annotations
+
 import os
 import sys
+import queue
+import asyncio
+import time
+import datetime
+import io
+import json
+import base64
+import argparse
+import re
 import random
+import mmap
+import bisect
+import heapq
+import fcntl
+import struct
+import pickle
+import sqlite3
+import hashlib
+import unicodedata
+import tempfile
+import threading
+import subprocess
+import urllib.parse
 from cmd import Cmd
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
+from enum import Enum
 from configparser import ConfigParser
-from typing import Optional, Union
+from functools import lru_cache, wraps
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Union,
+)
 from termcolor import colored
-import google_speech
-from googletrans import Translator
-import pendulum
+
+if TYPE_CHECKING:
+    import google_speech
+
+# google_speech, googletrans and pendulum are imported by the functions that use them,
+# so starting the CLI (or importing this module) does not pay for audio or translation
+
+
+def localTime():
+    """the current local time as a pendulum DateTime"""
+    import pendulum
+
+    return pendulum.now()
+
+
+def googleTranslator():
+    """returns a new googletrans Translator"""
+    import googletrans
+
+    return googletrans.Translator()
+
+
+CACHE_DIR: str = os.path.join(
+    os.path.expanduser("~"), ".cache", "terminal_language_review"
+)
+AUDIO_CACHE_DIR: str = os.path.join(CACHE_DIR, "audio")
+DECK_CACHE_DIR: str = os.path.join(CACHE_DIR, "decks")
+PCM_STORE_DIR: str = os.path.join(CACHE_DIR, "pcm")
+TRANSLATION_STORE: str = os.path.join(CACHE_DIR, "translations.db")
+SEARCH_INDEX: str = os.path.join(CACHE_DIR, "search.db")
+
+
+class Profiler:
+    """
+    In-memory latency histograms for the hot paths marked with @profiled
+
+    Every stage keeps a count, total and max along with a histogram of power of two
+    microsecond buckets, so percentiles are accurate to within a factor of two
+    whatever the number of calls. While disabled a profiled call costs one attribute
+    lookup, nothing is recorded.
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.stages: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        bucket: int = int(seconds * 1e6).bit_length()
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = dict(count=0, total=0.0, max=0.0, buckets={})
+            timings: dict = self.stages[stage]
+            timings["count"] += 1
+            timings["total"] += seconds
+            timings["max"] = max(timings["max"], seconds)
+            timings["buckets"][bucket] = timings["buckets"].get(bucket, 0) + 1
+
+    @contextmanager
+    def timer(self, stage: str):
+        """times the body of a with block as stage, if enabled"""
+        if not self.enabled:
+            yield None
+            return None
+        started: float = time.perf_counter()
+        try:
+            yield None
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def percentile(self, stage: str, percent: float) -> float:
+        """the upper bound in seconds of the bucket holding the given percentile"""
+        timings: dict = self.stages[stage]
+        rank: float = timings["count"] * percent / 100
+        seen: int = 0
+        for bucket in sorted(timings["buckets"]):
+            seen += timings["buckets"][bucket]
+            if seen >= rank:
+                return min(2**bucket / 1e6, timings["max"])
+        return timings["max"]
+
+    def report(self) -> list:
+        """one dict per stage with its call count and latencies in ms, slowest total first"""
+        with self._lock:
+            stages: list = sorted(
+                self.stages, key=lambda stage: self.stages[stage]["total"], reverse=True
+            )
+            return [
+                dict(
+                    stage=stage,
+                    count=self.stages[stage]["count"],
+                    total_ms=round(1000 * self.stages[stage]["total"], 2),
+                    mean_ms=round(
+                        1000
+                        * self.stages[stage]["total"]
+                        / self.stages[stage]["count"],
+                        3,
+                    ),
+                    p50_ms=round(1000 * self.percentile(stage, 50), 3),
+                    p95_ms=round(1000 * self.percentile(stage, 95), 3),
+                    p99_ms=round(1000 * self.percentile(stage, 99), 3),
+                    max_ms=round(1000 * self.stages[stage]["max"], 3),
+                )
+                for stage in stages
+            ]
+
+    def export(self, path: str):
+        """appends the report to path as a single JSON line"""
+        with open(path, "a") as f:
+            f.write(json.dumps(dict(time=time.time(), stages=self.report())) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+
+
+PROFILER: Profiler = Profiler()
+
+
+def profiled(stage: str) -> Callable:
+    """decorator recording how long each call of a function takes in PROFILER as stage"""
+
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def timed(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            started: float = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PROFILER.record(stage, time.perf_counter() - started)
+
+        return timed
+
+    return decorate
+
+
+class DeckIndex:
+    """
+    In memory index of the deck files under root, built with a single os.scandir walk
+    (recursive unless told otherwise, hidden files and directories are skipped)
+
+    decks maps the path of each deck relative to root to its full path, the mtime of
+    every directory walked is remembered so refresh() only re-walks the tree when a
+    deck has been added, removed or renamed somewhere in it
+    """
+
+    def __init__(
+        self, root: str, excludes: list, excludes_ext: list, recursive: bool = True
+    ):
+        self.root: str = root
+        self.excludes: tuple = tuple(excludes)
+        self.excludes_ext: tuple = tuple(excludes_ext)
+        self.recursive: bool = recursive
+        self.decks: dict = {}
+        self.directories: dict = {}
+        self.generation: int = 0
+        self.build()
+
+    def excluded(self, name: str, relpath: str) -> bool:
+        return (
+            name in self.excludes
+            or relpath in self.excludes
+            or any(name.endswith(ext) for ext in self.excludes_ext)
+        )
+
+    @profiled("DeckIndex.build")
+    def build(self):
+        decks: dict = {}
+        directories: dict = {}
+        if os.path.isdir(self.root):
+            stack: list = [(self.root, "")]
+            while stack:
+                directory, prefix = stack.pop()
+                try:
+                    directories[directory] = os.stat(directory).st_mtime_ns
+                    with os.scandir(directory) as it:
+                        entries: list = list(it)
+                except OSError:
+                    continue
+                for entry in entries:
+                    relpath: str = prefix + entry.name
+                    if entry.name.startswith(".") or self.excluded(entry.name, relpath):
+                        continue
+                    if entry.is_dir():
+                        if self.recursive:
+                            stack.append((entry.path, relpath + os.sep))
+                    elif entry.is_file():
+                        decks[relpath] = entry.path
+        self.decks = dict(sorted(decks.items()))
+        self.directories = directories
+        self.generation += 1
+
+    def stale(self) -> bool:
+        if not self.directories:
+            return os.path.isdir(self.root)
+        for directory, mtime in self.directories.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    @profiled("DeckIndex.refresh")
+    def refresh(self) -> "DeckIndex":
+        if self.stale():
+            self.build()
+        return self
+
+    def __contains__(self, deck: str) -> bool:
+        return deck in self.decks
+
+    def __len__(self) -> int:
+        return len(self.decks)
+
+    def get(self, deck: str) -> Optional[str]:
+        return self.decks.get(deck)
+
+
+DECK_INDEXES: dict = {}
+
+
+def deckIndex(
+    root: str, excludes: list, excludes_ext: list, recursive: bool = True
+) -> DeckIndex:
+    """returns the cached DeckIndex for root, refreshed if the tree has changed"""
+    key: tuple = (
+        os.path.abspath(root),
+        tuple(excludes),
+        tuple(excludes_ext),
+        recursive,
+    )
+    if key not in DECK_INDEXES:
+        DECK_INDEXES[key] = DeckIndex(root, excludes, excludes_ext, recursive)
+        return DECK_INDEXES[key]
+    return DECK_INDEXES[key].refresh()
 
 
 def files(working_dir: str, excludes: list, excludes_ext: list) -> tuple:
     """
     Returns files from the working directory / current directory that meet certain conditions
+    files in sub directories of the working directory are given as paths relative to it
     """
-    working_dir_files: list = [
-        file
-        for file in os.listdir(working_dir)
-        if os.path.isdir(working_dir)
-        and file not in excludes
-        and all(not file.endswith(ext) for ext in excludes_ext)
-    ]
-
-    fileList: list = [
-        file
-        for file in os.listdir()
-        if file not in excludes and all(not file.endswith(ext) for ext in excludes_ext)
-    ]
+    working_dir_files: list = list(deckIndex(working_dir, excludes, excludes_ext).decks)
+    fileList: list = list(
+        deckIndex(os.curdir, excludes, excludes_ext, recursive=False).decks
+    )
     return (fileList, working_dir_files)
 
 
+COLOUR: bool = True
+
+
 def print_coloured(
     text: str,
     color: str = "blue",
@@ -37,7 +304,9 @@ def print_coloured(
     end: Optional[str] = "\n" * 2,
     sep: Optional[str] = "\t",
 ) -> None:
-    """prints content to terminal in desired colors"""
+    """prints content to terminal in desired colors, or as plain text if COLOUR is False"""
+    if not COLOUR:
+        return print(text, sep=sep, end=end)
     params: tuple = (text, color, background) if background else (text, color)
     formattedText: colored = colored(*params, attrs=["bold"])
     print(formattedText, sep=sep, end=end)
@@ -45,18 +314,33 @@ def print_coloured(
 
 def getFile(
     file: str,
-    filelist: list,
-    working_dir_files: list,
+    filelist: Union[list, dict, DeckIndex],
+    working_dir_files: Union[list, dict, DeckIndex],
     working_dir: str,
     mode: str = "r",
 ) -> list:
-    """returns a file in a given mode if the file exists"""
+    """
+    returns a file in a given mode if the file exists
+    filelist and working_dir_files can be DeckIndexes to make the lookup a dict hit
+    """
+    return open(
+        deckPath(file, filelist, working_dir_files, working_dir), mode
+    ).readlines()
+
+
+def deckPath(
+    file: str,
+    filelist: Union[list, dict, DeckIndex],
+    working_dir_files: Union[list, dict, DeckIndex],
+    working_dir: str,
+) -> str:
+    """returns the path of a file from the current directory or the working directory"""
     if file in filelist and not os.path.isdir(file):
-        return open(file, mode).readlines()
+        return file
     elif file in working_dir_files and not os.path.isdir(
         os.path.join(working_dir, file)
     ):
-        return open(os.path.join(working_dir, file), mode).readlines()
+        return os.path.join(working_dir, file)
     else:
         raise IOError("File Not Found")
 
@@ -68,199 +352,2401 @@ def getRandomFile(filelist: list, working_dir_files: list, working_dir: str) ->
 
 
 def getRandomSelection(
-    filelist, working_dir_files: list, working_dir: str, k: int = 3
+    filelist,
+    working_dir_files: list,
+    working_dir: str,
+    k: int = 30,
+    delimiter: str = "#",
+    cache_dir: str = DECK_CACHE_DIR,
 ) -> list:
-    """Returns the content of (k) number of files as a concatenated list"""
-    lines: list = []
-    files: list = random.choices(working_dir_files, k=k)
-    for file in files:
-        lines += getFile(file, filelist, working_dir_files, working_dir)
-    return lines
+    """
+    Returns (k) cards drawn at random from all of the working_dir_files
+    only the sampled lines are read, see CardSampler
+    """
+    paths: list = [
+        deckPath(file, filelist, working_dir_files, working_dir)
+        for file in working_dir_files
+    ]
+    with CardSampler(paths, delimiter, cache_dir) as sampler:
+        return sampler.sample(k)
 
 
-def speak(
-    question: str, answer: str, languages: list, audio: Union[str, bool, None] = None
-) -> tuple:
+class Card(NamedTuple):
+    """
+    A parsed deck line, answer#question
+            question_voice / answer_voice are the (text, language key) to be spoken
+            key is every normalized answer that is accepted, see answerKey
+    """
+
+    line: str
+    question: str
+    answer: str
+    question_voice: tuple
+    answer_voice: tuple
+    key: tuple
+
+
+# the stress marks, accents and diaeresis (ё) are folded away, only the breve (й, ў) is kept
+FOLDED_MARKS = re.compile("[\u0300-\u0305\u0307-\u036f]+")
+LANGUAGE_PREFIX = re.compile(r"^\s*[A-Z]{1,3}:")
+ALTERNATIVES = re.compile(r"[/;]")
+PARENTHESES = re.compile(r"\([^)]*\)")
+NOT_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalizeAnswer(text: str) -> str:
+    """
+    R:Ты говори́шь! -> тыговоришь
+    drops a language prefix, case, accents, stress marks, punctuation and spaces
+    """
+    text = LANGUAGE_PREFIX.sub("", text).casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFD", text)
+        text = unicodedata.normalize("NFC", FOLDED_MARKS.sub("", text))
+    return NOT_ALNUM.sub("", text)
+
+
+def answerKey(answer: str) -> tuple:
+    """
+    every normalized answer that is accepted for answer,
+    answers can be separated by / or ; and anything in brackets is optional
+    """
+    if not ALTERNATIVES.search(answer) and "(" not in answer:
+        return (normalizeAnswer(answer),)
+    accepted: dict = {}
+    for alternative in ALTERNATIVES.split(answer):
+        accepted[normalizeAnswer(alternative)] = None
+        if "(" in alternative:
+            accepted[normalizeAnswer(PARENTHESES.sub("", alternative))] = None
+    accepted.pop("", None)
+    return tuple(accepted) or (normalizeAnswer(answer),)
+
+
+def withinDistance(a: str, b: str, limit: int) -> bool:
+    """
+    True if a can be turned into b with at most limit insertions, deletions or substitutions
+    only the band of cells within limit of the diagonal is computed, and it gives up
+    as soon as a whole row is over limit, so this is O(len(a) * limit)
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if limit == 0 or a == b:
+        return a == b
+    over: int = limit + 1
+    previous: list = [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low: int = max(1, i - limit)
+        high: int = min(len(b), i + limit)
+        current: list = [over] * (len(b) + 1)
+        current[0] = min(i, over)
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+        if min(current[low - 1 : high + 1]) > limit:
+            return False
+        previous = current
+    return previous[len(b)] <= limit
+
+
+def typosAllowed(accepted: str, typos: int) -> int:
+    """answers shorter than 4 letters have to be exact, then one typo is allowed per 4 letters up to typos"""
+    return min(typos, len(accepted) // 4)
+
+
+def voices(question: str, answer: str) -> tuple:
     """
     question = R:To speak
     answer = говорить
 
-    This function splits both the question or answer looking for R:, this is the language codes from
-    the languages dictionary defined in the header. This function then returns the answer and question
-    in the correct spoken format, ready to be played
-
+    returns the (text, language key) that the question and the answer are spoken as,
+    the side prefixed with a language key is spoken in English and the other side in that language
     """
     split_question: list = question.split(":")
     split_answer: list = answer.split(":")
+    if len(split_question) > 1:
+        return ((split_question[1], "E"), (answer, split_question[0]))
+    elif len(split_answer) > 1:
+        return ((question, split_answer[0]), (split_answer[1], "E"))
+    return ((question, "E"), (answer, "E"))
 
-    verbal_answer: google_speech.Speech = google_speech.Speech
-    verbal_question: google_speech.Speech = google_speech.Speech
 
-    if len(split_question) > 1 and audio:
-        return (
-            verbal_question(question.split(":")[1], languages["E"]),
-            verbal_answer(answer, languages[question.split(":")[0]]),
-        )
-    elif len(split_answer) > 1 and audio:
-        return (
-            verbal_question(question, languages[answer.split(":")[0]]),
-            verbal_answer(answer.split(":")[1], languages["E"]),
-        )
-    elif audio:
-        return (
-            verbal_question(question, languages["E"]),
-            verbal_answer(answer, languages["E"]),
-        )
+def parseLines(lines: list, delimiter: str) -> list:
+    """parses answer#question lines into Cards, lines without the delimiter are skipped"""
+    cards: list = []
+    for line in lines:
+        if isinstance(line, Card):
+            cards.append(line)
+        elif delimiter in line:
+            split_line: list = line.strip().split(delimiter)
+            question: str = split_line[1]
+            answer: str = split_line[0]
+            cards.append(
+                Card(
+                    line, question, answer, *voices(question, answer), answerKey(answer)
+                )
+            )
+    return cards
+
+
+# bumped whenever Card changes so that decks compiled by an older version are parsed again
+DECK_FORMAT: int = 2
+
+
+@profiled("compileDeck")
+def compileDeck(
+    path: str, delimiter: str = "#", cache_dir: str = DECK_CACHE_DIR
+) -> list:
+    """
+    Returns the Cards of the deck at path, parsing it at most once per change
+
+    The parsed deck is pickled in cache_dir along with the mtime, size and sha256
+    of the source, while the mtime and size match the cached copy is loaded without
+    reading the source, if only the mtime has changed the hash decides
+    """
+    stat = os.stat(path)
+    name: str = hashlib.sha256(
+        f"{os.path.abspath(path)}\0{delimiter}\0{DECK_FORMAT}".encode("utf-8")
+    ).hexdigest()
+    compiled_path: str = os.path.join(cache_dir, name + ".pickle")
+    fingerprint: tuple = (stat.st_mtime_ns, stat.st_size)
+    compiled: Optional[dict] = None
+    try:
+        with open(compiled_path, "rb") as f:
+            compiled = pickle.load(f)
+        if compiled["fingerprint"] == fingerprint:
+            return [Card(*card) for card in compiled["cards"]]
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, TypeError):
+        compiled = None
+
+    with open(path, "rb") as f:
+        data: bytes = f.read()
+    digest: str = hashlib.sha256(data).hexdigest()
+    if compiled is not None and compiled.get("sha256") == digest:
+        cards: list = [Card(*card) for card in compiled["cards"]]
     else:
-        return (verbal_question("", "en"), verbal_answer("", "en"))
+        lines: list = data.decode("utf-8").splitlines(keepends=True)
+        cards = parseLines(lines, delimiter)
 
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(
+            dict(
+                fingerprint=fingerprint,
+                sha256=digest,
+                cards=[tuple(card) for card in cards],
+            ),
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp, compiled_path)
+    return cards
 
-def prompt(
-    question_number: int,
-    lines: list,
-    question: str,
-    answer: str,
-    verbal_answer: google_speech.Speech,
-    attempts: int = 0,
-) -> bool:
+
+class LineIndex:
     """
-    Asks the user to answer the given question,
-            if correct returns True
-            if "show" the answer is printed on the screen then returns false
-            if error question is reiterated a maximum of 3 times before returning false
+    The byte offset of every line of a deck
 
-            if verbal_answer is an invoke function then the answer will be played at the
-            appropriate time
+    The offsets are written once per change of the deck as unsigned 64 bit integers
+    to a file in cache_dir, after a header holding the mtime and size of the deck.
+    Only the header is read when the index is opened, the two offsets around a line
+    are read with one pread when the line is looked up, so memory stays constant no
+    matter how large or how many the decks. No file is kept open between lookups,
+    the deck and its offsets are only opened while a line is read, so any number of
+    decks can be indexed at once whatever the limit on open files
+    """
 
-            if verbal_answer is a reference to an object then no error will be raised and no sound will
-            be played
+    HEADER: struct.Struct = struct.Struct("<qq")
+    OFFSET: struct.Struct = struct.Struct("<Q")
+
+    def __init__(self, path: str, cache_dir: str = DECK_CACHE_DIR):
+        self.path: str = path
+        stat = os.stat(path)
+        self.size: int = stat.st_size
+        fingerprint: tuple = (stat.st_mtime_ns, stat.st_size)
+        name: str = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+        self.index_path: str = os.path.join(cache_dir, name + ".offsets")
+        if self.fingerprint() != fingerprint:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.build(fingerprint)
+        index_size: int = os.stat(self.index_path).st_size
+        self.count: int = (index_size - self.HEADER.size) // self.OFFSET.size
+
+    def fingerprint(self) -> Optional[tuple]:
+        try:
+            with open(self.index_path, "rb") as f:
+                return self.HEADER.unpack(f.read(self.HEADER.size))
+        except (OSError, struct.error):
+            return None
+
+    def build(self, fingerprint: tuple):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.index_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as index, open(self.path, "rb") as deck:
+            index.write(self.HEADER.pack(*fingerprint))
+            if self.size:
+                with mmap.mmap(deck.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    start: int = 0
+                    while start < self.size:
+                        index.write(self.OFFSET.pack(start))
+                        end: int = data.find(b"\n", start)
+                        start = self.size if end == -1 else end + 1
+        os.replace(tmp, self.index_path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def span(self, number: int) -> tuple:
+        """returns the (start, end) byte offsets of line number"""
+        if number >= self.count:
+            return (self.size, self.size)
+        fd: int = os.open(self.index_path, os.O_RDONLY)
+        try:
+            data: bytes = os.pread(
+                fd, 2 * self.OFFSET.size, self.HEADER.size + number * self.OFFSET.size
+            )
+        finally:
+            os.close(fd)
+        (start,) = self.OFFSET.unpack_from(data)
+        if len(data) < 2 * self.OFFSET.size:
+            return (start, self.size)
+        return (start, self.OFFSET.unpack_from(data, self.OFFSET.size)[0])
+
+    def line(self, number: int) -> str:
+        start, end = self.span(number)
+        with open(self.path, "rb") as deck:
+            deck.seek(start)
+            return deck.read(end - start).decode("utf-8")
+
+    def close(self):
+        self.count = 0
+
+
+class CardSampler:
     """
-    print_coloured(f"\n\nQUESTION ({question_number+1} of {len(lines)})\n")
-    print_coloured(question + "\n")
-    user_input: str = input("YOUR ANSWER: ")
-    if user_input.replace(" ", "").lower() == answer.replace(" ", "").lower():
-        verbal_answer.play()
-        print_coloured("Correct", color="green")
-        return True
+    Draws random cards from many decks without reading any deck in full
 
-    elif user_input.lower() == "show":
-        print_coloured(answer + "\n", color="red")
-        verbal_answer.play()
+    Lines are drawn uniformly over every line of every deck using the LineIndex of
+    each deck, lines that are not cards are rejected and drawn again, so the cards
+    returned are uniform over all cards while only the sampled lines are ever read
+    """
 
-    elif attempts < 3:
-        print_coloured("Wrong", color="red")
-        return prompt(
-            question_number, lines, question, answer, verbal_answer, attempts + 1
-        )
+    def __init__(
+        self, paths: list, delimiter: str = "#", cache_dir: str = DECK_CACHE_DIR
+    ):
+        self.delimiter: str = delimiter
+        self.indexes: list = []
+        self.cumulative: list = []
+        total: int = 0
+        for path in paths:
+            index: LineIndex = LineIndex(path, cache_dir)
+            if len(index):
+                total += len(index)
+                self.indexes.append(index)
+                self.cumulative.append(total)
+            else:
+                index.close()
+        self.total: int = total
 
-    elif attempts == 3:
-        print_coloured("Wrong", color="red")
-        print_coloured(
-            "Too many attempts! Moving to next question", color="yellow", end="\n"
-        )
-        verbal_answer.play()
-    return False
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def draw(self) -> tuple:
+        """returns (deck number, line number) of a line drawn uniformly from all decks"""
+        number: int = random.randrange(self.total)
+        deck: int = bisect.bisect_right(self.cumulative, number)
+        previous: int = self.cumulative[deck - 1] if deck else 0
+        return (deck, number - previous)
 
+    def sample(self, k: int, max_draws: Optional[int] = None) -> list:
+        """returns up to k distinct cards, giving up after max_draws draws (default 20 * k)"""
+        lines: list = []
+        seen: set = set()
+        max_draws = 20 * k if max_draws is None else max_draws
+        while self.total and len(lines) < k and max_draws > 0:
+            max_draws -= 1
+            deck, number = self.draw()
+            if (deck, number) in seen:
+                continue
+            seen.add((deck, number))
+            line: str = self.indexes[deck].line(number)
+            if self.delimiter in line:
+                lines.append(line)
+        return lines
 
-def Test(lines: list, delimiter: str, languages: list, audio: bool = True) -> tuple:
+    def close(self):
+        for index in self.indexes:
+            index.close()
+
+
+@contextmanager
+def fileLock(path: str, shared: bool = False):
+    """holds an advisory lock on path (created if missing) for the duration of the block"""
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield lock_file
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def lockPath(path: str) -> str:
+    """the hidden lock file guarding path"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.lock")
+
+
+def appendFile(path: str, text: str, sync: bool = True):
+    """appends text to path in a single write, and unless sync is False waits for it to reach the disk"""
+    with open(path, "a") as f:
+        f.write(text)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+
+
+def syncFile(path: str):
+    """waits for everything written to path to reach the disk"""
+    fd: int = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replaceFile(path: str, text: str):
+    """replaces path with text through a temporary file and an atomic rename"""
+    tmp: str = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class StorageWriter:
     """
-    Takes a list of strings
-            e.g. France#Country with a red, white blue flag
-                 R:Hello#привет
-            The strings correspond to answer#question
+    Collects the writes a session makes to the score log, the error deck and the
+    config and commits them together
 
-    The function then prompts the user to answer the questions
-    Returns the number questions correct,total number of questions answered
-    and a list of questions which the user got incorrect
+    Each file is written while holding an exclusive advisory lock on a hidden
+    .{name}.lock next to it, so terminals and servers sharing a working_dir never
+    interleave or clobber each other. Everything appended to a file goes in one
+    write, whole files are replaced by an atomic rename, and any read-modify-write
+    (see ErrorJournal) is queued with locked() so it runs under the same lock.
+    Files are committed in sorted order so two writers cannot deadlock, the files
+    appended to are fsynced together once all of them are written and only then are
+    the reports queued with afterwards() run.
+    Used as a context manager the writes are committed when the block ends.
+    """
+
+    def __init__(self):
+        self.appends: dict = {}
+        self.operations: dict = {}
+        self.reports: list = []
+        self.unsynced: set = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.commit()
+
+    def append(self, path: str, text: str):
+        self.appends.setdefault(path, []).append(text)
+
+    def replace(self, path: str, text: str):
+        self.locked(path, lambda: replaceFile(path, text))
+
+    def locked(self, path: str, operation: Callable):
+        """queues operation to run while path is locked, after anything appended to path"""
+        self.operations.setdefault(path, []).append(operation)
+
+    def write(self, path: str, text: str):
+        """
+        appends text to path straight away, for operations queued with locked(),
+        it is fsynced with everything else at the end of the commit
+        """
+        appendFile(path, text, sync=False)
+        self.unsynced.add(path)
+
+    def afterwards(self, report: Callable):
+        """queues report to run once everything has been committed"""
+        self.reports.append(report)
+
+    def commit(self):
+        appends, self.appends = self.appends, {}
+        operations, self.operations = self.operations, {}
+        reports, self.reports = self.reports, []
+        for path in sorted(set(appends) | set(operations)):
+            with fileLock(lockPath(path)):
+                if path in appends:
+                    self.write(path, "".join(appends[path]))
+                for operation in operations.get(path, ()):
+                    operation()
+        unsynced, self.unsynced = self.unsynced, set()
+        for path in sorted(unsynced):
+            try:
+                syncFile(path)
+            except FileNotFoundError:
+                # removed since it was written, e.g. a journal that has been compacted
+                pass
+        for report in reports:
+            report()
 
-    if audio is True then the spoken text is used along side it's written counterpart
+
+@contextmanager
+def storageWriter(writer: Optional[StorageWriter] = None):
+    """yields writer to add to, or when there is none a new StorageWriter committed at the end of the block"""
+    if writer is not None:
+        yield writer
+        return None
+    with StorageWriter() as writer:
+        yield writer
+
+
+# the effects google_speech plays clips with, cutting the silence around the speech
+SOX_EFFECTS: tuple = ("trim", "0.1", "reverse", "trim", "0.07", "reverse")
+
+
+def soxCommand(path: str) -> list:
+    """the SoX command playing an mp3 file with the same trimming as google_speech"""
+    return ["sox", "-q", "-t", "mp3", path, "-d", *SOX_EFFECTS]
+
+
+@profiled("playback")
+def playAudioFile(path: str) -> None:
+    """plays an mp3 file through SoX"""
+    subprocess.run(soxCommand(path), stdout=subprocess.DEVNULL, check=True)
+
+
+class AudioCache:
     """
-    random.shuffle(lines)
-    lines: list = [line for line in lines if delimiter in line]
-    score: int = 0
+    On-disk cache of synthesized speech, one mp3 per (text, language code)
 
-    failed_questions: set = set()
+    Files are named by the sha256 of the key so lookups never touch the network,
+    a file's mtime is bumped on every hit and the least recently used files are
+    evicted first once the cache grows past max_size bytes.
+    Writes go through a temporary file and an atomic rename so several processes
+    can share one cache directory, eviction is serialised with an advisory lock.
+    """
 
-    for question_number, line in enumerate(lines):
-        attempts: int = 0
-        split_line: list = line.strip().split(delimiter)
-        question: str = split_line[1]
-        answer: str = split_line[0]
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, max_size: int = 100 * 2**20):
+        self.directory: str = directory
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._pending: dict = {}
 
-        verbal_cues: tuple = speak(question, answer, languages, audio)
-        verbal_question: google_speech.Speech = verbal_cues[0]
-        verbal_answer: google_speech.Speech = verbal_cues[1]
-        verbal_question.play()
+    @staticmethod
+    def key(text: str, lang: str) -> str:
+        return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
 
-        if prompt(question_number, lines, question, answer, verbal_answer):
-            score += 1
-        else:
-            failed_questions.add(line)
+    def path(self, text: str, lang: str) -> str:
+        return os.path.join(self.directory, self.key(text, lang) + ".mp3")
 
-    return (score, len(lines), failed_questions)
+    def entries(self) -> list:
+        """returns (mtime, size, path) for every cached clip"""
+        entries: list = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".mp3") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            # nothing has been cached yet
+            pass
+        return entries
 
+    def size(self) -> int:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+            return self._size
 
-def writeLog(file: str, correct: int, total: int, log_file: str, log: bool):
-    with open(log_file, "a") as open_log_file:
-        open_log_file.write(
-            f"\n{pendulum.now().strftime('%d/%m/%Y %H:%M')} {file} {correct}/{total} {round((100/total)*correct)}%"
-        )
-    print_coloured(f"Wrote log for the last test scores in {log_file}")
+    def get(self, text: str, lang: str) -> Optional[str]:
+        """returns the path of the cached clip and marks it as recently used, None on a miss"""
+        path: str = self.path(text, lang)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
 
+    def put(self, text: str, lang: str, data: bytes) -> str:
+        """stores audio data for (text, lang) and returns the path of the clip"""
+        path: str = self.path(text, lang)
+        # the directory is only made once there is something to cache
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            replaced: int = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - replaced
+        if self.size() > self.max_size:
+            self.prune()
+        return path
 
-def writeErrorsToFile(file: str, error_file: str, errors: set):
-    """writes errors made in the test to a specified file without duplicate lines"""
-    lines: list = []
-    if os.path.exists(error_file):
-        f = open(error_file, "r")
-        lines + f.readlines()
-        f.close()
+    @profiled("audio fetch")
+    def fetch(self, text: str, lang: str) -> str:
+        """
+        returns the path of the clip for (text, lang), synthesizing it on a miss
+        concurrent fetches of the same clip wait for a single synthesis
+        """
+        return self._fetch(text, lang)[0]
 
-    wf = open(error_file, "w")
-    if file != error_file and file.lower() != "random collection":
-        lines = set(lines) | errors
-    elif file == error_file:
-        lines = errors
-    for line in lines:
-        wf.write(line)
-    wf.close()
-    print_coloured(f"Wrote Errors to {error_file}", color="cyan")
+    @profiled("audio fetch")
+    def read(self, text: str, lang: str) -> bytes:
+        """fetch() that returns the clip itself, so evicting it afterwards cannot take it away"""
+        return self._fetch(text, lang, True)[1]
 
+    def _fetch(self, text: str, lang: str, read: bool = False) -> tuple:
+        """(path, data) of the clip for (text, lang), data is only read if read is True"""
+        key: str = self.key(text, lang)
+        with self._lock:
+            key_lock: threading.Lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            path: Optional[str] = self.get(text, lang)
+            data: Optional[bytes] = None
+            if path is not None and read:
+                try:
+                    with open(path, "rb") as clip:
+                        data = clip.read()
+                except FileNotFoundError:
+                    # evicted since get(), so it is synthesized again
+                    path = None
+            if path is None:
+                data = synthesize(text, lang)
+                path = self.put(text, lang, data)
+        with self._lock:
+            self._pending.pop(key, None)
+        return (path, data)
 
-def score(
-    file: str, correct: int, total: int, log_file: str, log: bool, error_file: str
-):
-    if total > 0:
-        print_coloured(f"\nYou scored {correct}/{total}", color="cyan", end="\n")
-        print_coloured(
-            f"Percent:{round((100/total)*correct)}%", color="yellow", end="\n"
-        )
-        print_coloured(f"File:s{file}", color="green", end="\n")
-        print_coloured(
-            f"Date:{pendulum.now().strftime('%d/%m/%Y %H:%M')}", color="yellow"
+    def prune(self, max_size: Optional[int] = None) -> int:
+        """evicts least recently used clips until the cache fits in max_size, returns the number removed"""
+        max_size = self.max_size if max_size is None else max_size
+        removed: int = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        with fileLock(os.path.join(self.directory, ".lock")):
+            entries: list = sorted(self.entries())
+            total: int = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            with self._lock:
+                self._size = total
+        return removed
+
+    def clear(self) -> int:
+        return self.prune(max_size=0)
+
+    def stats(self) -> dict:
+        entries: list = self.entries()
+        return dict(
+            directory=self.directory,
+            entries=len(entries),
+            size=sum(size for _, size, _ in entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
         )
-        if log and file != error_file and file.lower() != "random collection":
-            writeLog(file, correct, total, log_file, log)
 
 
-def remodelFile(src: str, dest: str, delimiter: str = "#"):
-    if os.path.exists(src):
-        if os.path.exists(dest):
-            print_coloured(
-                f"{dest} already exists, Type 'overwrite' to overwrite",
-                color="red",
-                end="",
+@profiled("synthesize")
+def synthesize(text: str, lang: str) -> bytes:
+    """downloads the speech for text in the given language as mp3 data"""
+    import google_speech
+
+    return b"".join(
+        segment.getAudioData() for segment in google_speech.Speech(text, lang)
+    )
+
+
+# every decoded clip is resampled to one raw format so a single output process plays them all
+PCM_FORMAT: tuple = ("-t", "raw", "-r", "24000", "-e", "signed", "-b", "16", "-c", "1")
+PCM_BYTES_PER_SECOND: int = 48000
+
+
+def decodeClip(path: str) -> bytes:
+    """decodes an mp3 clip into raw samples in PCM_FORMAT through SoX, trimmed as soxCommand trims it"""
+    return subprocess.run(
+        ["sox", "-q", "-t", "mp3", path, *PCM_FORMAT, "-", *SOX_EFFECTS],
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+
+
+class PcmStore:
+    """
+    Decoded samples of the clips that are played again and again, in one memory-mapped file
+
+    The first play of a clip decodes its mp3 and appends the samples to the data
+    file, later plays are a slice of the mmap written straight to an output process
+    reading raw samples, so replaying the _Errors deck decodes nothing.
+    The index maps the name of each clip to [offset, length, last used], once the
+    samples outgrow max_size the least recently used clips are dropped from it and
+    the data is rewritten to a new generation of the file when over half is dead.
+    Writes happen under an advisory lock and the index is replaced atomically,
+    readers reload it whenever another process has replaced it. The recency of
+    clips that were only played is written with the next put(), or on close().
+    """
+
+    def __init__(self, directory: str = PCM_STORE_DIR, max_size: int = 64 * 2**20):
+        self.directory: str = directory
+        self.max_size: int = max_size
+        self.index_path: str = os.path.join(directory, "clips.index")
+        self.generation: int = 0
+        self.clips: dict = {}
+        self.map: Optional[mmap.mmap] = None
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evicted: int = 0
+        self._loaded: Optional[tuple] = None
+        self._touched: bool = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self.refresh()
+
+    def dataPath(self, generation: int) -> str:
+        return os.path.join(self.directory, f"clips.{generation}.pcm")
+
+    def remap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        try:
+            with open(self.dataPath(self.generation), "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+
+    def refresh(self):
+        """reloads the index and remaps the data if the index has been replaced"""
+        try:
+            stat = os.stat(self.index_path)
+            loaded: Optional[tuple] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            loaded = None
+        if loaded == self._loaded:
+            return None
+        index: dict = dict(generation=0, clips={})
+        if loaded is not None:
+            try:
+                with open(self.index_path, "rb") as f:
+                    index = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+        # recency seen by this process since it last wrote is kept
+        for name, entry in index["clips"].items():
+            previous: Optional[list] = self.clips.get(name)
+            if previous is not None and previous[:2] == entry[:2]:
+                entry[2] = max(entry[2], previous[2])
+        self.generation, self.clips = index["generation"], index["clips"]
+        self._loaded = loaded
+        self.remap()
+
+    def save(self):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                dict(generation=self.generation, clips=self.clips),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
             )
-            overwrite: str = input(": ")
-            if "overwrite" not in overwrite.lower():
-                raise IOError("Refusing to overwrite")
-        data = open(src)
-        parsedData = remodelData(data.readlines(), delimiter)
-        data.close()
-        writeData(dest, parsedData)
-        return f"Added inverse data and exported as {dest}"
-    else:
-        raise IOError(f"{src} file does not exist")
+        os.replace(tmp, self.index_path)
+        stat = os.stat(self.index_path)
+        self._loaded = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self._touched = False
+        self.remap()
+
+    def size(self) -> int:
+        """the bytes of samples held by live clips"""
+        return sum(entry[1] for entry in self.clips.values())
+
+    def get(self, name: str) -> Optional[bytes]:
+        """returns the samples of a clip and marks it as recently used, None on a miss"""
+        with self._lock:
+            self.refresh()
+            entry: Optional[list] = self.clips.get(name)
+            if entry is None or self.map is None or entry[0] + entry[1] > len(self.map):
+                self.misses += 1
+                return None
+            entry[2] = time.time()
+            self._touched = True
+            self.hits += 1
+            return self.map[entry[0] : entry[0] + entry[1]]
+
+    def put(self, name: str, samples: bytes):
+        """appends the samples of a clip, evicting least recently used clips past max_size"""
+        with self._lock, fileLock(os.path.join(self.directory, ".lock")):
+            self.refresh()
+            with open(self.dataPath(self.generation), "ab") as f:
+                offset: int = f.seek(0, os.SEEK_END)
+                f.write(samples)
+            self.clips[name] = [offset, len(samples), time.time()]
+            self.evict()
+            self.save()
+
+    def evict(self):
+        live: int = self.size()
+        if live > self.max_size:
+            for name, entry in sorted(self.clips.items(), key=lambda item: item[1][2]):
+                if live <= self.max_size:
+                    break
+                del self.clips[name]
+                live -= entry[1]
+                self.evicted += 1
+        if os.path.getsize(self.dataPath(self.generation)) > 2 * live:
+            self.compact()
+
+    def compact(self):
+        """copies the live clips to the next generation of the data file"""
+        old: str = self.dataPath(self.generation)
+        new: str = self.dataPath(self.generation + 1)
+        with open(old, "rb") as src, open(new, "wb") as dest:
+            for entry in self.clips.values():
+                src.seek(entry[0])
+                samples: bytes = src.read(entry[1])
+                entry[0] = dest.tell()
+                dest.write(samples)
+        self.generation += 1
+        # processes still mapping the old generation keep reading it until they reload
+        os.remove(old)
+
+    def fetch(self, path: str) -> bytes:
+        """returns the samples of the mp3 clip at path, decoding and storing them on a miss"""
+        name: str = os.path.splitext(os.path.basename(path))[0]
+        samples: Optional[bytes] = self.get(name)
+        if samples is None:
+            samples = decodeClip(path)
+            self.put(name, samples)
+        return samples
+
+    def clear(self) -> int:
+        """drops every clip, returns the number removed"""
+        with self._lock, fileLock(os.path.join(self.directory, ".lock")):
+            self.refresh()
+            removed: int = len(self.clips)
+            self.evicted += removed
+            self.clips = {}
+            if os.path.exists(self.dataPath(self.generation)):
+                self.compact()
+            self.save()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            self.refresh()
+            return dict(
+                directory=self.directory,
+                clips=len(self.clips),
+                size=self.size(),
+                mapped=len(self.map) if self.map is not None else 0,
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evicted=self.evicted,
+            )
+
+    def close(self):
+        """writes the recency of the clips played since the last put(), then unmaps the data"""
+        with self._lock:
+            if self._touched:
+                with fileLock(os.path.join(self.directory, ".lock")):
+                    self.refresh()
+                    self.save()
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+
+
+# the most clips a PlaybackWorker keeps decoded ahead of playing them
+MAX_PREPARED: int = 16
+
+
+class PlaybackWorker:
+    """
+    A single long-lived SoX process that clips are streamed into through a queue
+
+    Each clip is decoded to raw samples, trimmed as soxCommand trims it, and written
+    back to back into the stdin of one output process so that playing a clip never
+    opens the audio device again. How long the output stays busy follows from the
+    number of samples written, cancel() empties the queue and only kills the output
+    process, which is started again for the next clip, if something is still playing.
+    latency is measured from submit() to the clip reaching the output process.
+    With a PcmStore clips are streamed from the store, so a clip is only decoded
+    the first time it is played. Clips passed to prepare() (by the AudioPrefetcher)
+    are decoded before they are played rather than on the playback thread, either
+    way a clip being decoded is waited for rather than decoded twice.
+    """
+
+    def __init__(self, command: Optional[list] = None, pcm: Optional[PcmStore] = None):
+        self.pcm: Optional[PcmStore] = pcm
+        # the decoded samples of clips prepared ahead of being played, by path
+        self.prepared: dict = {}
+        self.bytes_per_second: int = PCM_BYTES_PER_SECOND
+        self.command: list = command or ["sox", "-q", *PCM_FORMAT, "-", "-d"]
+        self.queue: queue.Queue = queue.Queue()
+        self.process: Optional[subprocess.Popen] = None
+        self.busy_until: float = 0.0
+        self.clips: int = 0
+        self.spawns: int = 0
+        self.cancelled: int = 0
+        self.latencies: deque = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="playback", daemon=True)
+        self.thread.start()
+
+    def submit(self, path: str):
+        """queues a clip to be played after those already queued"""
+        self.queue.put((path, time.monotonic()))
+
+    def decoding(self, path: str) -> Future:
+        """
+        the Future of the samples of the clip at path, decoding them, through the
+        PcmStore if there is one, unless another thread already is
+        """
+        with self._lock:
+            samples: Optional[Future] = self.prepared.get(path)
+            if samples is not None:
+                return samples
+            samples = Future()
+            self.prepared[path] = samples
+            # clips that were never played, e.g. a question cut off by its answer
+            while len(self.prepared) > MAX_PREPARED:
+                del self.prepared[next(iter(self.prepared))]
+        try:
+            if self.pcm is not None:
+                samples.set_result(self.pcm.fetch(path))
+            else:
+                samples.set_result(decodeClip(path))
+        except BaseException as e:
+            samples.set_exception(e)
+        return samples
+
+    def prepare(self, path: str):
+        """decodes the clip at path ahead of it being played, into the PcmStore if there is one"""
+        self.decoding(path)
+
+    def samples(self, path: str) -> bytes:
+        """the samples of the clip at path, waiting for prepare() if it is decoding them"""
+        samples: Future = self.decoding(path)
+        with self._lock:
+            if self.prepared.get(path) is samples:
+                del self.prepared[path]
+        return samples.result()
+
+    def output(self) -> subprocess.Popen:
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                self.process = subprocess.Popen(
+                    self.command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL
+                )
+                self.spawns += 1
+            return self.process
+
+    def run(self):
+        while True:
+            item: Optional[tuple] = self.queue.get()
+            try:
+                if item is None:
+                    return None
+                path, submitted = item
+                data: bytes = self.samples(path)
+                process: subprocess.Popen = self.output()
+                try:
+                    # the pipe only takes the samples as fast as the output plays them
+                    with PROFILER.timer("playback"):
+                        process.stdin.write(data)
+                        process.stdin.flush()
+                except (BrokenPipeError, ValueError):
+                    continue
+                now: float = time.monotonic()
+                if PROFILER.enabled:
+                    PROFILER.record("playback queue", now - submitted)
+                with self._lock:
+                    self.latencies.append(now - submitted)
+                    self.clips += 1
+                    self.busy_until = (
+                        max(now, self.busy_until) + len(data) / self.bytes_per_second
+                    )
+            except (OSError, subprocess.CalledProcessError) as e:
+                print_coloured(f"Audio Error: {e}", color="red")
+            finally:
+                self.queue.task_done()
+
+    def cancel(self):
+        """drops the queued clips and cuts off the clip that is playing"""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.queue.task_done()
+        with self._lock:
+            if self.process is not None and time.monotonic() < self.busy_until:
+                self.process.kill()
+                self.process.wait()
+                self.process = None
+                self.cancelled += 1
+            self.busy_until = 0.0
+
+    def wait(self):
+        """blocks until every queued clip has been handed to the output process"""
+        self.queue.join()
+
+    def remaining(self) -> float:
+        """the seconds until the output process has played everything handed to it"""
+        with self._lock:
+            return max(0.0, self.busy_until - time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies: list = list(self.latencies)
+        return dict(
+            clips=self.clips,
+            spawns=self.spawns,
+            cancelled=self.cancelled,
+            queued=self.queue.qsize(),
+            mean_latency_ms=(
+                round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0
+            ),
+            max_latency_ms=round(1000 * max(latencies), 2) if latencies else 0,
+        )
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        with self._lock:
+            if self.process is not None:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process = None
+
+
+class Silence:
+    """stands in for a speech while audio is off, so that google_speech is never imported"""
+
+    text: str = ""
+    lang: str = "en"
+    cache: Optional[AudioCache] = None
+    player: Optional[PlaybackWorker] = None
+
+    def play(self, sox_effects=()):
+        return None
+
+
+@lru_cache(maxsize=None)
+def speechClass() -> type:
+    """
+    returns CachedSpeech, the class is created the first time audio is needed
+    as subclassing google_speech.Speech means importing google_speech
+    """
+    import google_speech
+
+    class CachedSpeech(google_speech.Speech):
+        """
+        google_speech.Speech that plays from an AudioCache, only synthesizing on a miss
+        if a PlaybackWorker is given the clip is queued on it instead of played by a new SoX process
+        """
+
+        def __init__(
+            self,
+            text: str,
+            lang: str,
+            cache: Optional[AudioCache] = None,
+            player: Optional[PlaybackWorker] = None,
+        ):
+            super().__init__(text, lang)
+            self.cache: Optional[AudioCache] = cache
+            self.player: Optional[PlaybackWorker] = player
+
+        def play(self, sox_effects=()):
+            if self.cache is None or sox_effects:
+                return super().play(sox_effects)
+            if self.text and self.player is not None:
+                self.player.submit(self.cache.fetch(self.text, self.lang))
+            elif self.text:
+                playAudioFile(self.cache.fetch(self.text, self.lang))
+
+    return CachedSpeech
+
+
+class AudioPrefetcher:
+    """
+    Synthesizes the clips of upcoming cards into an AudioCache on a small worker pool
+    so that by the time a card is asked its audio only has to be played, with a
+    PlaybackWorker the clips are decoded for it too, see PlaybackWorker.prepare.
+    At most depth cards ahead of the current one are scheduled, anything still
+    pending is cancelled when the prefetcher is closed.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[AudioCache],
+        depth: int = 3,
+        workers: int = 2,
+        player: Optional[PlaybackWorker] = None,
+    ):
+        self.cache: Optional[AudioCache] = cache
+        self.player: Optional[PlaybackWorker] = player
+        self.depth: int = depth if cache is not None else 0
+        self.futures: dict = {}
+        self.executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+            if self.depth > 0
+            else None
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, speech: google_speech.Speech) -> Optional[Future]:
+        """schedules the synthesis of a single clip unless it is empty or already scheduled"""
+        key: tuple = (speech.text, speech.lang)
+        if self.executor is None or not speech.text:
+            return None
+        if key not in self.futures:
+            self.futures[key] = self.executor.submit(
+                self.load, speech.text, speech.lang
+            )
+        return self.futures[key]
+
+    def load(self, text: str, lang: str) -> str:
+        path: str = self.cache.fetch(text, lang)
+        if self.player is not None:
+            self.player.prepare(path)
+        return path
+
+    def ahead(self, verbal_cues: list, current: int):
+        """schedules the question and answer clips for the cards following current"""
+        for cues in verbal_cues[current : current + self.depth + 1]:
+            for speech in cues:
+                self.submit(speech)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+def speak(
+    question: str,
+    answer: str,
+    languages: list,
+    audio: Union[str, bool, None] = None,
+    cache: Optional[AudioCache] = None,
+    player: Optional[PlaybackWorker] = None,
+) -> tuple:
+    """
+    question = R:To speak
+    answer = говорить
+
+    This function splits both the question or answer looking for R:, this is the language codes from
+    the languages dictionary defined in the header. This function then returns the answer and question
+    in the correct spoken format, ready to be played
+
+    """
+    return speakVoices(voices(question, answer), languages, audio, cache, player)
+
+
+def speakCard(
+    card: Card,
+    languages: list,
+    audio: Union[str, bool, None] = None,
+    cache: Optional[AudioCache] = None,
+    player: Optional[PlaybackWorker] = None,
+) -> tuple:
+    """speak() for a Card, using the voices worked out when the deck was parsed"""
+    return speakVoices(
+        (card.question_voice, card.answer_voice), languages, audio, cache, player
+    )
+
+
+@profiled("speak")
+def speakVoices(
+    verbal_cues: tuple,
+    languages: list,
+    audio: Union[str, bool, None] = None,
+    cache: Optional[AudioCache] = None,
+    player: Optional[PlaybackWorker] = None,
+) -> tuple:
+    if audio:
+        return tuple(
+            speechClass()(text, languages[key], cache, player)
+            for text, key in verbal_cues
+        )
+    return (Silence(), Silence())
+
+
+def renderDeck(
+    cards: list,
+    outdir: str,
+    languages: list,
+    cache: AudioCache,
+    workers: int = 4,
+    name: str = "deck",
+) -> dict:
+    """
+    Writes the spoken question and answer of every card to outdir for listening away from the terminal
+
+    Each card becomes a numbered mp3 of its question followed by its answer, spoken
+    in the languages worked out by voices() just as in a session, name.mp3 is every
+    card one after another and name.m3u lists the cards with their text.
+    Clips are synthesized into cache by (workers) threads, so clips the cache already
+    has, or that several cards share, are only synthesized once. Each card is written
+    from the clips as they were fetched, so a cache smaller than the deck only means
+    clips are synthesized again rather than missing. At most workers * 2 cards are
+    rendered ahead of the one being written, so memory does not grow with the deck.
+    Returns the number of cards and clips, how long it took and the cards per second
+    """
+    os.makedirs(outdir, exist_ok=True)
+    width: int = max(4, len(str(len(cards))))
+    clips: set = set()
+    for card in cards:
+        for text, key in (card.question_voice, card.answer_voice):
+            if text.strip() and key in languages:
+                clips.add((text, languages[key]))
+
+    def render(card: Card) -> bytes:
+        return b"".join(
+            cache.read(text, languages[key])
+            for text, key in (card.question_voice, card.answer_voice)
+            if text.strip() and key in languages
+        )
+
+    started: float = time.perf_counter()
+    playlist: list = ["#EXTM3U\n"]
+    remaining = iter(cards)
+    # only workers * 2 cards are in flight, so rendered cards don't pile up in memory
+    pending: deque = deque()
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="render"
+    ) as executor, open(os.path.join(outdir, f"{name}.mp3"), "wb") as everything:
+        for card in remaining:
+            pending.append((card, executor.submit(render, card)))
+            if len(pending) >= 2 * max(1, workers):
+                break
+        number: int = 0
+        while pending:
+            card, future = pending.popleft()
+            data: bytes = future.result()
+            following: Optional[Card] = next(remaining, None)
+            if following is not None:
+                pending.append((following, executor.submit(render, following)))
+            number += 1
+            filename: str = f"{number:0{width}d}.mp3"
+            with open(os.path.join(outdir, filename), "wb") as f:
+                f.write(data)
+            everything.write(data)
+            playlist.append(f"#EXTINF:-1,{card.question} - {card.answer}\n{filename}\n")
+    writeData(os.path.join(outdir, f"{name}.m3u"), playlist)
+
+    seconds: float = time.perf_counter() - started
+    return dict(
+        cards=len(cards),
+        clips=len(clips),
+        seconds=round(seconds, 2),
+        cards_per_second=round(len(cards) / seconds, 1) if seconds else 0,
+    )
+
+
+MAX_ATTEMPTS: int = 3
+
+
+class Match(Enum):
+    """how an answer matched the answers accepted, see checkAnswer"""
+
+    EXACT = "exact"
+    TYPO = "typo"
+    WRONG = "wrong"
+
+
+def checkAnswer(user_input: str, key: tuple, typos: int = 0) -> Match:
+    """EXACT if user_input is one of the answers in key, TYPO if it is within (typos) edits of one, otherwise WRONG"""
+    attempt: str = normalizeAnswer(user_input)
+    if attempt in key:
+        return Match.EXACT
+    elif attempt and any(
+        withinDistance(attempt, accepted, typosAllowed(accepted, typos))
+        for accepted in key
+    ):
+        return Match.TYPO
+    return Match.WRONG
+
+
+def silent(*args, **kwargs) -> None:
+    """print_coloured for sessions that are not shown in the terminal"""
+
+
+def respond(
+    user_input: str,
+    answer: str,
+    key: tuple,
+    attempts: int,
+    typos: int = 0,
+    echo: bool = True,
+) -> Optional[bool]:
+    """
+    prints the response to the users input, unless echo is False
+            returns True if correct, False if the answer was shown or there have been
+            too many attempts and None if the question should be asked again
+            an answer within (typos) edits of the right one is correct, and the right spelling is shown
+    """
+    show: Callable = print_coloured if echo else silent
+    matched: Match = checkAnswer(user_input, key, typos)
+    if matched is Match.EXACT:
+        show("Correct", color="green")
+        return True
+
+    elif user_input.lower() == "show":
+        show(answer + "\n", color="red")
+        return False
+
+    elif matched is Match.TYPO:
+        show("Correct", color="green", end=" ")
+        show(answer, color="yellow")
+        return True
+
+    show("Wrong", color="red")
+    if attempts < MAX_ATTEMPTS:
+        return None
+    show("Too many attempts! Moving to next question", color="yellow", end="\n")
+    return False
+
+
+def prompt(
+    question_number: int,
+    lines: list,
+    question: str,
+    answer: str,
+    verbal_answer: google_speech.Speech,
+    attempts: int = 0,
+    key: Optional[tuple] = None,
+    typos: int = 0,
+) -> bool:
+    """
+    Asks the user to answer the given question,
+            if correct returns True
+            if "show" the answer is printed on the screen then returns false
+            if error question is reiterated a maximum of 3 times before returning false
+
+            if verbal_answer is an invoke function then the answer will be played at the
+            appropriate time
+
+            if verbal_answer is a reference to an object then no error will be raised and no sound will
+            be played
+
+            key is the answers accepted, computed from answer if not given, see answerKey
+    """
+    key = answerKey(answer) if key is None else key
+    while True:
+        print_coloured(f"\n\nQUESTION ({question_number+1} of {len(lines)})\n")
+        print_coloured(question + "\n")
+        user_input: str = input("YOUR ANSWER: ")
+        correct: Optional[bool] = respond(user_input, answer, key, attempts, typos)
+        if correct is not None:
+            verbal_answer.play()
+            return correct
+        attempts += 1
+
+
+async def playSpeech(speech: google_speech.Speech):
+    """
+    plays a speech without blocking the event loop
+    clips from an AudioCache are queued on the speeches PlaybackWorker if it has one,
+    otherwise played by a SoX process that is killed if the playback is cancelled,
+    anything else is played on a worker thread
+    """
+    if not speech.text:
+        return None
+    loop = asyncio.get_running_loop()
+    if getattr(speech, "cache", None) is None:
+        return await loop.run_in_executor(None, speech.play)
+    path: str = await loop.run_in_executor(
+        None, speech.cache.fetch, speech.text, speech.lang
+    )
+    if speech.player is not None:
+        return speech.player.submit(path)
+    process = await asyncio.create_subprocess_exec(
+        *soxCommand(path), stdout=asyncio.subprocess.DEVNULL
+    )
+    try:
+        with PROFILER.timer("playback"):
+            await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+
+class AsyncPlayer:
+    """
+    Plays speeches one after another in the background of a session,
+    stop() cuts off whatever is playing or waiting to be played, including
+    anything already queued on the sessions PlaybackWorker
+    """
+
+    def __init__(self, worker: Optional[PlaybackWorker] = None):
+        self.tasks: list = []
+        self.worker: Optional[PlaybackWorker] = worker
+
+    def play(self, speech: google_speech.Speech):
+        previous: list = [task for task in self.tasks if not task.done()]
+
+        async def after_previous():
+            await asyncio.gather(*previous, return_exceptions=True)
+            try:
+                await playSpeech(speech)
+            except (OSError, RuntimeError) as e:
+                print_coloured(f"Audio Error: {e}", color="red")
+
+        self.tasks = previous + [asyncio.create_task(after_previous())]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        if self.worker is not None:
+            self.worker.cancel()
+
+    async def drain(self):
+        """waits for everything queued to finish playing, including on the PlaybackWorker"""
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.worker is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.worker.wait)
+            await asyncio.sleep(self.worker.remaining())
+
+
+class InputReader:
+    """
+    Reads lines with input() on a daemon thread so that the event loop carries on while the user types
+
+    Nothing waits for the thread, so Ctrl-C ends a session straight away rather than
+    once Enter is pressed. A read that was given up on is handed to the next caller
+    instead of a second thread reading stdin, so no line typed is lost.
+    """
+
+    def __init__(self):
+        self.pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def read(self, text: str) -> Future:
+        """a Future of the next line, prompting with text"""
+        with self._lock:
+            if self.pending is None or self.pending.done():
+                self.pending = Future()
+                threading.Thread(
+                    target=self.run, args=(text, self.pending), name="input", daemon=True
+                ).start()
+            else:
+                print(text, end="", flush=True)
+            return self.pending
+
+    @staticmethod
+    def run(text: str, line: Future):
+        try:
+            line.set_result(input(text))
+        except BaseException as e:
+            line.set_exception(e)
+
+
+STDIN: InputReader = InputReader()
+
+
+async def ainput(text: str) -> str:
+    """input() without blocking the event loop, see InputReader"""
+    line: Future = STDIN.read(text)
+    loop = asyncio.get_running_loop()
+    ready: asyncio.Future = loop.create_future()
+
+    def wake(_):
+        try:
+            loop.call_soon_threadsafe(lambda: ready.done() or ready.set_result(None))
+        except RuntimeError:
+            # the loop has been closed, the line is kept for the next read
+            pass
+
+    line.add_done_callback(wake)
+    await ready
+    return line.result()
+
+
+async def promptAsync(
+    question_number: int,
+    lines: list,
+    question: str,
+    answer: str,
+    verbal_answer: google_speech.Speech,
+    player: AsyncPlayer,
+    key: Optional[tuple] = None,
+    read: Callable = ainput,
+    inputs: Optional[list] = None,
+    typos: int = 0,
+    echo: bool = True,
+) -> bool:
+    """
+    prompt() for the asyncio session engine,
+    typing an answer interrupts any audio still playing and the answer is
+    then played in the background while the session moves on
+
+    answers are awaited from read, every answer given is appended to inputs,
+    nothing is printed if echo is False
+    """
+    key = answerKey(answer) if key is None else key
+    show: Callable = print_coloured if echo else silent
+    attempts: int = 0
+    while True:
+        show(f"\n\nQUESTION ({question_number+1} of {len(lines)})\n")
+        show(question + "\n")
+        user_input: str = await read("YOUR ANSWER: ")
+        if inputs is not None:
+            inputs.append(user_input)
+        player.stop()
+        correct: Optional[bool] = respond(
+            user_input, answer, key, attempts, typos, echo
+        )
+        if correct is not None:
+            player.play(verbal_answer)
+            return correct
+        attempts += 1
+
+
+async def runSession(
+    lines: list,
+    delimiter: str,
+    languages: list,
+    audio: bool = True,
+    cache: Optional[AudioCache] = None,
+    prefetch: int = 0,
+    player: Optional[PlaybackWorker] = None,
+    read: Callable = ainput,
+    report: Optional[Callable] = None,
+    typos: int = 0,
+    shuffle: bool = True,
+    echo: bool = True,
+) -> tuple:
+    """
+    The asyncio session engine behind Test(), each question is played while the
+    user is already able to answer it, the answer of the previous card plays while
+    the next card is shown and the clips of the next (prefetch) cards are synthesized
+    in the background, the return value is the same as Test()
+
+    answers are awaited from read, and report is called (and awaited if it is a
+    coroutine function) with a dict describing each card once it has been answered,
+    typos is how many mistakes an answer may have, the cards are asked in the order
+    given unless shuffle is True and nothing is printed if echo is False
+    """
+    if shuffle:
+        random.shuffle(lines)
+    cards: list = parseLines(lines, delimiter)
+    score: int = 0
+
+    failed_questions: set = set()
+    verbal_cues: list = [
+        speakCard(card, languages, audio, cache, player) for card in cards
+    ]
+    player: AsyncPlayer = AsyncPlayer(player)
+
+    with AudioPrefetcher(
+        cache, prefetch if audio else 0, player=player.worker
+    ) as prefetcher:
+        try:
+            for question_number, card in enumerate(cards):
+                verbal_question, verbal_answer = verbal_cues[question_number]
+                prefetcher.ahead(verbal_cues, question_number)
+                player.play(verbal_question)
+
+                inputs: list = []
+                started: float = time.perf_counter()
+                correct: bool = await promptAsync(
+                    question_number,
+                    cards,
+                    card.question,
+                    card.answer,
+                    verbal_answer,
+                    player,
+                    card.key,
+                    read,
+                    inputs,
+                    typos,
+                    echo,
+                )
+                if correct:
+                    score += 1
+                else:
+                    failed_questions.add(card.line)
+                if report is not None:
+                    reported = report(
+                        dict(
+                            card=question_number + 1,
+                            question=card.question,
+                            answer=card.answer,
+                            correct=correct,
+                            attempts=len(inputs),
+                            inputs=inputs,
+                            seconds=round(time.perf_counter() - started, 6),
+                        )
+                    )
+                    if asyncio.iscoroutine(reported):
+                        await reported
+            await player.drain()
+        except BaseException:
+            # only a session that is cut short cuts off its audio
+            player.stop()
+            raise
+
+    return (score, len(cards), failed_questions)
+
+
+def Test(
+    lines: list,
+    delimiter: str,
+    languages: list,
+    audio: bool = True,
+    cache: Optional[AudioCache] = None,
+    prefetch: int = 0,
+    player: Optional[PlaybackWorker] = None,
+    read: Callable = ainput,
+    report: Optional[Callable] = None,
+    typos: int = 0,
+    shuffle: bool = True,
+) -> tuple:
+    """
+    Takes a list of strings or of Cards already parsed by compileDeck
+            e.g. France#Country with a red, white blue flag
+                 R:Hello#привет
+            The strings correspond to answer#question
+
+    The function then prompts the user to answer the questions
+    Returns the number questions correct,total number of questions answered
+    and a list of questions which the user got incorrect
+
+    if audio is True then the spoken text is used along side it's written counterpart,
+    played from cache when one is given, with the clips of the next (prefetch) cards
+    synthesized in the background while the current card is answered, see runSession
+    which callers already running an event loop await instead
+    """
+    return asyncio.run(
+        runSession(
+            lines,
+            delimiter,
+            languages,
+            audio,
+            cache,
+            prefetch,
+            player,
+            read,
+            report,
+            typos,
+            shuffle,
+        )
+    )
+
+
+def writeLog(
+    file: str,
+    correct: int,
+    total: int,
+    log_file: str,
+    log: bool,
+    store: Optional["ScoreStore"] = None,
+    writer: Optional[StorageWriter] = None,
+    echo: bool = True,
+):
+    """appends the score to log_file and records it in store, reporting it unless echo is False"""
+    taken_at = localTime()
+    with storageWriter(writer) as storage:
+        storage.append(
+            log_file,
+            f"\n{taken_at.strftime('%d/%m/%Y %H:%M')} {file} {correct}/{total} {round((100/total)*correct)}%",
+        )
+        if store is not None:
+            storage.locked(
+                log_file,
+                lambda: store.record(
+                    file, correct, total, taken_at.strftime("%Y-%m-%d %H:%M")
+                ),
+            )
+        if echo:
+            storage.afterwards(
+                lambda: print_coloured(
+                    f"Wrote log for the last test scores in {log_file}"
+                )
+            )
+
+
+class ErrorJournal:
+    """
+    The error deck kept as an append-only log
+
+    New errors are appended to the error deck itself, cards that are answered
+    correctly are recorded as "-" events in a hidden journal next to it and a card
+    that comes back after being removed is appended again with a "+" event, so each
+    session only writes the cards that changed. The current errors are held in
+    memory as a set, compact() rewrites the deck without the removed cards and
+    empties the journal once it holds more than compact_after events.
+    Changes are made while the deck is locked, see StorageWriter.
+    """
+
+    def __init__(self, error_file: str, compact_after: int = 1000):
+        self.error_file: str = error_file
+        directory, name = os.path.split(error_file)
+        self.journal_file: str = os.path.join(directory, f".{name}.journal")
+        self.compact_after: int = compact_after
+        self.cards: set = set()
+        self.events: int = 0
+        self.load()
+
+    def fingerprint(self) -> tuple:
+        stats: list = []
+        for path in (self.error_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return tuple(stats)
+
+    def load(self):
+        cards: set = set()
+        events: int = 0
+        if os.path.exists(self.error_file):
+            with open(self.error_file) as f:
+                cards = {line.rstrip("\n") for line in f if line.strip()}
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file) as f:
+                for event in f:
+                    events += 1
+                    if event.startswith("-"):
+                        cards.discard(event[1:].rstrip("\n"))
+                    elif event.startswith("+"):
+                        cards.add(event[1:].rstrip("\n"))
+        self.cards = cards
+        self.events = events
+        self._fingerprint: tuple = self.fingerprint()
+
+    def refresh(self):
+        """reloads the deck if it has been changed by anything else"""
+        if self.fingerprint() != self._fingerprint:
+            self.load()
+
+    def update(
+        self,
+        added: Optional[set] = None,
+        removed: Optional[set] = None,
+        writer: Optional[StorageWriter] = None,
+    ):
+        """
+        appends the cards that are not already errors and journals the removal of those that are,
+        once writer is committed if one is given
+        """
+        with storageWriter(writer) as storage:
+            storage.locked(
+                self.error_file, lambda: self._update(added, removed, storage)
+            )
+
+    def _update(
+        self, added: Optional[set], removed: Optional[set], storage: StorageWriter
+    ):
+        self.refresh()
+        added = {line.rstrip("\n") for line in added or ()}
+        removed = {line.rstrip("\n") for line in removed or ()} - added
+        added -= self.cards
+        removed &= self.cards
+        if added:
+            storage.write(
+                self.error_file, "".join(f"{line}\n" for line in sorted(added))
+            )
+        journal: list = [f"-{line}\n" for line in sorted(removed)]
+        if os.path.exists(self.journal_file):
+            journal += [f"+{line}\n" for line in sorted(added)]
+        if journal:
+            storage.write(self.journal_file, "".join(journal))
+        self.cards = (self.cards | added) - removed
+        self.events += len(journal)
+        self._fingerprint = self.fingerprint()
+        if self.events > self.compact_after:
+            self._compact()
+
+    def compact(self):
+        """rewrites the error deck as the current set of errors and empties the journal"""
+        with fileLock(lockPath(self.error_file)):
+            self._compact()
+
+    def _compact(self):
+        self.refresh()
+        if self.events or len(self.cards) != self.lines():
+            replaceFile(
+                self.error_file, "".join(f"{line}\n" for line in sorted(self.cards))
+            )
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+        self.events = 0
+        self._fingerprint = self.fingerprint()
+
+    def lines(self) -> int:
+        if not os.path.exists(self.error_file):
+            return 0
+        with open(self.error_file) as f:
+            return sum(1 for line in f if line.strip())
+
+
+ERROR_JOURNALS: dict = {}
+
+
+def errorJournal(error_file: str) -> ErrorJournal:
+    """returns the ErrorJournal of error_file, kept in memory between sessions"""
+    path: str = os.path.abspath(error_file)
+    if path not in ERROR_JOURNALS:
+        ERROR_JOURNALS[path] = ErrorJournal(error_file)
+    return ERROR_JOURNALS[path]
+
+
+def writeErrorsToFile(
+    file: str,
+    error_file: str,
+    errors: set,
+    writer: Optional[StorageWriter] = None,
+    echo: bool = True,
+):
+    """
+    writes errors made in the test to a specified file without duplicate lines
+    when the error file itself was tested the errors answered correctly are removed,
+    nothing is printed if echo is False
+    """
+    journal: ErrorJournal = errorJournal(error_file)
+    with storageWriter(writer) as storage:
+        if file != error_file and file.lower() != "random collection":
+            journal.update(added=errors, writer=storage)
+        elif file == error_file:
+            journal.refresh()
+            journal.update(
+                added=errors, removed=journal.cards - errors, writer=storage
+            )
+        if echo:
+            storage.afterwards(
+                lambda: print_coloured(f"Wrote Errors to {error_file}", color="cyan")
+            )
+
+
+def score(
+    file: str,
+    correct: int,
+    total: int,
+    log_file: str,
+    log: bool,
+    error_file: str,
+    store: Optional["ScoreStore"] = None,
+    writer: Optional[StorageWriter] = None,
+):
+    if total > 0:
+        print_coloured(f"\nYou scored {correct}/{total}", color="cyan", end="\n")
+        print_coloured(
+            f"Percent:{round((100/total)*correct)}%", color="yellow", end="\n"
+        )
+        print_coloured(f"File:s{file}", color="green", end="\n")
+        print_coloured(f"Date:{localTime().strftime('%d/%m/%Y %H:%M')}", color="yellow")
+        if log and file != error_file and file.lower() != "random collection":
+            writeLog(file, correct, total, log_file, log, store, writer)
+
+
+def isoDate(date: str) -> str:
+    """
+    converts dd/mm/YYYY to YYYY-MM-DD, dates already in YYYY-MM-DD are returned as is
+    raises ValueError if date is neither
+    """
+    if "/" in date:
+        day, month, year = date.split("/")
+        date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return datetime.date.fromisoformat(date).isoformat()
+
+
+class ScoreStore:
+    """
+    Indexed sqlite store of test scores
+
+    Every session is a row in scores, and the per deck per day rollups are updated
+    in the same transaction so summaries never have to scan the session history.
+    Existing scores.log files are imported once, the imports table remembers which
+    log files have already been read.
+    """
+
+    def __init__(self, path: str = "scores.db"):
+        self.path: str = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    id INTEGER PRIMARY KEY,
+                    taken_at TEXT NOT NULL,
+                    deck TEXT NOT NULL,
+                    correct INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    percent INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS scores_deck ON scores (deck, taken_at);
+                CREATE INDEX IF NOT EXISTS scores_taken_at ON scores (taken_at);
+                CREATE TABLE IF NOT EXISTS rollups (
+                    deck TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    sessions INTEGER NOT NULL,
+                    correct INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    worst INTEGER NOT NULL,
+                    PRIMARY KEY (deck, day)
+                );
+                CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY);
+                """)
+
+    def _insert(self, deck: str, correct: int, total: int, taken_at: str):
+        percent: int = round((100 / total) * correct) if total else 0
+        self.connection.execute(
+            "INSERT INTO scores (taken_at, deck, correct, total, percent) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (taken_at, deck, correct, total, percent),
+        )
+        self.connection.execute(
+            "INSERT INTO rollups VALUES (?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT (deck, day) DO UPDATE SET "
+            "sessions = sessions + 1, correct = correct + excluded.correct, "
+            "total = total + excluded.total, worst = MIN(worst, excluded.worst)",
+            (deck, taken_at[:10], correct, total, percent),
+        )
+
+    def record(self, deck: str, correct: int, total: int, taken_at: str):
+        """records one session, taken_at is YYYY-MM-DD HH:MM"""
+        with self.connection:
+            self._insert(deck, correct, total, taken_at)
+
+    def importLog(self, log_file: str) -> int:
+        """imports the sessions of a scores.log once, returns the number imported"""
+        path: str = os.path.abspath(log_file)
+        if (
+            not os.path.exists(path)
+            or self.connection.execute(
+                "SELECT 1 FROM imports WHERE path = ?", (path,)
+            ).fetchone()
+        ):
+            return 0
+        imported: int = 0
+        with self.connection, open(path) as log:
+            for line in log:
+                try:
+                    date, time, rest = line.strip().split(" ", 2)
+                    deck, result, _ = rest.rsplit(" ", 2)
+                    correct, total = result.split("/")
+                    self._insert(
+                        deck, int(correct), int(total), f"{isoDate(date)} {time}"
+                    )
+                    imported += 1
+                except ValueError:
+                    continue
+            self.connection.execute("INSERT INTO imports VALUES (?)", (path,))
+        return imported
+
+    @staticmethod
+    def _filters(
+        deck: Optional[str], since: Optional[str], until: Optional[str], column: str
+    ) -> tuple:
+        clauses: list = []
+        params: list = []
+        if deck:
+            clauses.append("deck = ?")
+            params.append(deck)
+        if since:
+            clauses.append(f"{column} >= ?")
+            params.append(isoDate(since))
+        if until:
+            clauses.append(f"{column} < date(?, '+1 day')")
+            params.append(isoDate(until))
+        return (clauses, params)
+
+    def sessions(
+        self,
+        deck: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        below: Optional[int] = None,
+    ) -> list:
+        """returns (taken_at, deck, correct, total, percent) rows, oldest first"""
+        clauses, params = self._filters(deck, since, until, "taken_at")
+        if below is not None:
+            clauses.append("percent < ?")
+            params.append(below)
+        where: str = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.connection.execute(
+            "SELECT taken_at, deck, correct, total, percent FROM scores"
+            f"{where} ORDER BY taken_at, id",
+            params,
+        ).fetchall()
+
+    def summary(
+        self,
+        deck: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        below: Optional[int] = None,
+    ) -> list:
+        """returns (deck, sessions, correct, total, percent, worst) per deck from the rollups"""
+        clauses, params = self._filters(deck, since, until, "day")
+        where: str = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        having: str = ""
+        if below is not None:
+            having = " HAVING percent < ?"
+            params.append(below)
+        return self.connection.execute(
+            "SELECT deck, SUM(sessions), SUM(correct), SUM(total), "
+            "CAST(ROUND(100.0 * SUM(correct) / MAX(SUM(total), 1)) AS INTEGER) AS percent, "
+            f"MIN(worst) FROM rollups{where} GROUP BY deck{having} ORDER BY deck",
+            params,
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def cardHash(card: Card) -> str:
+    """stable identifier of a card, the same whichever deck or delimiter it comes from"""
+    return hashlib.sha256(
+        f"{card.answer}\0{card.question}".encode("utf-8")
+    ).hexdigest()[:16]
+
+
+class ReviewState(NamedTuple):
+    repetitions: int = 0
+    interval: float = 0.0
+    ease: float = 2.5
+    due: float = 0.0
+
+
+def sm2(state: ReviewState, quality: int, now: float) -> ReviewState:
+    """
+    SuperMemo 2, quality is 0 (forgotten) to 5 (perfect), 3 or more is a pass
+    returns the state with the next interval in days and the time it is due
+    """
+    if quality >= 3:
+        if state.repetitions == 0:
+            interval: float = 1.0
+        elif state.repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(state.interval * state.ease)
+        repetitions: int = state.repetitions + 1
+    else:
+        interval = 1.0
+        repetitions = 0
+    ease: float = max(
+        1.3, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    return ReviewState(repetitions, interval, ease, now + interval * 86400)
+
+
+class ReviewStore:
+    """sqlite store of the ReviewState of every card that has been reviewed, keyed by cardHash"""
+
+    def __init__(self, path: str = "review.db"):
+        self.path: str = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS reviews ("
+                "card TEXT PRIMARY KEY, repetitions INTEGER NOT NULL, "
+                "interval REAL NOT NULL, ease REAL NOT NULL, due REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS attempts ("
+                "card TEXT PRIMARY KEY, asked INTEGER NOT NULL, "
+                "missed INTEGER NOT NULL, line TEXT, deck TEXT)"
+            )
+            columns: set = {
+                column[1]
+                for column in self.connection.execute("PRAGMA table_info(attempts)")
+            }
+            # review_db files written before the line and deck of a card were kept
+            for column in ("line", "deck"):
+                if column not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE attempts ADD COLUMN {column} TEXT"
+                    )
+
+    def states(self) -> dict:
+        return {
+            card: ReviewState(*state)
+            for card, *state in self.connection.execute("SELECT * FROM reviews")
+        }
+
+    def save(self, states: dict):
+        """stores a {cardHash: ReviewState} mapping in a single transaction"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?)",
+                [(card, *state) for card, state in states.items()],
+            )
+
+    def attempts(self) -> dict:
+        """returns {cardHash: (times asked, times missed)} for every card asked by random"""
+        return {
+            card: (asked, missed)
+            for card, asked, missed in self.connection.execute(
+                "SELECT card, asked, missed FROM attempts"
+            )
+        }
+
+    def attemptedLines(self) -> dict:
+        """returns {cardHash: (line, deck)} for every card asked by random whose line is known"""
+        return {
+            card: (line, deck)
+            for card, line, deck in self.connection.execute(
+                "SELECT card, line, deck FROM attempts WHERE line IS NOT NULL"
+            )
+        }
+
+    def recordAttempts(self, results: dict, lines: Optional[dict] = None):
+        """
+        adds a {cardHash: missed} mapping to the attempts in a single transaction,
+        lines is {cardHash: (line, deck)} for the cards whose line and deck are known
+        """
+        lines = lines or {}
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO attempts VALUES (?, 1, ?, ?, ?) "
+                "ON CONFLICT(card) DO UPDATE SET asked = asked + 1, "
+                "missed = missed + excluded.missed, "
+                "line = coalesce(excluded.line, line), "
+                "deck = coalesce(excluded.deck, deck)",
+                [
+                    (card, int(missed), *lines.get(card, (None, None)))
+                    for card, missed in results.items()
+                ],
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class ReviewQueue:
+    """
+    Min heap of (due, cardHash) over every card of every deck given
+
+    Cards that have never been reviewed are due straight away, due() pops the cards
+    whose time has come and grade() pushes them back with their next due time,
+    both in O(log n) per card
+    """
+
+    def __init__(self, cards, store: ReviewStore):
+        self.store: ReviewStore = store
+        self.cards: dict = {}
+        for card in cards:
+            self.cards.setdefault(cardHash(card), card)
+        self.states: dict = store.states()
+        self.heap: list = [
+            (self.states.get(card, ReviewState()).due, card) for card in self.cards
+        ]
+        heapq.heapify(self.heap)
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def due(self, n: int, now: Optional[float] = None) -> list:
+        """
+        removes and returns up to n Cards that are due, the most overdue first,
+        each must be given back to grade() or restore()
+        """
+        now = time.time() if now is None else now
+        cards: list = []
+        while self.heap and len(cards) < n and self.heap[0][0] <= now:
+            cards.append(self.cards[heapq.heappop(self.heap)[1]])
+        return cards
+
+    def restore(self, cards: list):
+        """pushes cards returned by due() that were not graded back as they were"""
+        for card in cards:
+            key: str = cardHash(card)
+            heapq.heappush(self.heap, (self.states.get(key, ReviewState()).due, key))
+
+    def grade(self, results: dict, now: Optional[float] = None):
+        """takes {Card: quality} for cards returned by due() and schedules them again"""
+        now = time.time() if now is None else now
+        states: dict = {}
+        for card, quality in results.items():
+            key: str = cardHash(card)
+            states[key] = sm2(self.states.get(key, ReviewState()), quality, now)
+            heapq.heappush(self.heap, (states[key].due, key))
+        self.states.update(states)
+        self.store.save(states)
+
+
+class AliasTable:
+    """
+    Walker's alias method, draws index i with probability weights[i] / sum(weights)
+    in O(1) after an O(n) build (Vose's variant)
+    """
+
+    def __init__(self, weights: list):
+        count: int = len(weights)
+        self.total: float = float(sum(weights))
+        self.probability: list = [1.0] * count
+        self.alias: list = list(range(count))
+        if not count or self.total <= 0:
+            return None
+        scaled: list = [weight * count / self.total for weight in weights]
+        small: list = [i for i, weight in enumerate(scaled) if weight < 1.0]
+        large: list = [i for i, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # whatever is left over is 1 up to rounding error
+        for i in small + large:
+            self.probability[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.alias)
+
+    def draw(self) -> int:
+        i: int = random.randrange(len(self.alias))
+        return i if random.random() < self.probability[i] else self.alias[i]
+
+
+def missWeight(asked: int, missed: int, in_errors: bool = False) -> float:
+    """
+    the smoothed miss rate of a card, (missed + 1) / (asked + 2),
+    a card in the error deck counts as one more miss
+    """
+    return (missed + in_errors + 1) / (asked + in_errors + 2)
+
+
+class ErrorWeightedSampler:
+    """
+    Draws cards with a probability proportional to their missWeight
+
+    Only the cards that have been asked before or are in the error deck are held,
+    split into blocks of block_size, each with its own AliasTable, and a top
+    AliasTable over the block totals picks the block, so a draw is two O(1)
+    lookups. record() only rebuilds the tables of the blocks holding the cards
+    answered plus the top table. Every other card weighs the same 1/2 and is drawn
+    uniformly through a CardSampler over the decks at paths, so no deck is read
+    beyond the lines drawn. Each draw first picks one side or the other by their
+    total weight, the weight of the uniform side is 1/2 for each line of the decks
+    less the cards held, an estimate as lines that are not cards are drawn again.
+    A card never asked weighs 1/2, one always answered correctly tends to 0 and one
+    always missed tends to 1, so weak cards come up far more often than known ones.
+    """
+
+    def __init__(
+        self,
+        paths: list,
+        store: ReviewStore,
+        errors: Optional[set] = None,
+        delimiter: str = "#",
+        cache_dir: str = DECK_CACHE_DIR,
+        block_size: int = 256,
+    ):
+        self.store: ReviewStore = store
+        self.delimiter: str = delimiter
+        self.block_size: int = block_size
+        self.lines: CardSampler = CardSampler(paths, delimiter, cache_dir)
+        self.attempts: dict = store.attempts()
+        self.keys: list = []
+        self.cards: list = []
+        # the deck each card came from, None for one only known from the error deck
+        self.decks: list = []
+        self.positions: dict = {}
+        self.weights: list = []
+        decks: set = set(paths)
+        for key, (line, deck) in store.attemptedLines().items():
+            if deck in decks:
+                for card in parseLines([line], delimiter):
+                    self.add(key, card, deck)
+        self.errors: set = self.inErrors(errors or set())
+        self.weights = [self.weight(key) for key in self.keys]
+        # the deck each card of the last sample was drawn from, see record()
+        self.drawn: dict = {}
+        self.blocks: list = [
+            AliasTable(self.weights[start : start + block_size])
+            for start in range(0, len(self.weights), block_size)
+        ]
+        self.top: AliasTable = AliasTable([block.total for block in self.blocks])
+        self.uniform: float = self.uniformWeight()
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def uniformWeight(self) -> float:
+        """the total weight of the cards that are not held, 1/2 per line"""
+        held: int = sum(deck is not None for deck in self.decks)
+        return missWeight(0, 0) * max(0, self.lines.total - held)
+
+    def add(self, key: str, card: Card, deck: Optional[str]) -> int:
+        """holds card with weight 0 until its block is rebuilt, returns its position"""
+        if key not in self.positions:
+            self.positions[key] = len(self.keys)
+            self.keys.append(key)
+            self.cards.append(card)
+            self.decks.append(deck)
+            self.weights.append(0.0)
+        return self.positions[key]
+
+    def weight(self, key: str) -> float:
+        """
+        the missWeight of a held card, 0 for a card that has left the error deck
+        without its deck being known as it can't be told apart from a removed one
+        """
+        if self.decks[self.positions[key]] is None and key not in self.errors:
+            return 0.0
+        return missWeight(*self.attempts.get(key, (0, 0)), key in self.errors)
+
+    def draw(self) -> Optional[tuple]:
+        """
+        returns (cardHash, Card, deck) of a card drawn by weight,
+        None when the line drawn uniformly is not a card or is a card that is held
+        """
+        if random.random() * (self.top.total + self.uniform) < self.top.total:
+            block: int = self.top.draw()
+            i: int = block * self.block_size + self.blocks[block].draw()
+            return (self.keys[i], self.cards[i], self.decks[i])
+        if not self.lines.total:
+            return None
+        deck, number = self.lines.draw()
+        index: LineIndex = self.lines.indexes[deck]
+        for card in parseLines([index.line(number)], self.delimiter):
+            key: str = cardHash(card)
+            if key not in self.positions or self.decks[self.positions[key]] is None:
+                return (key, card, index.path)
+        return None
+
+    def sample(self, k: int, max_draws: Optional[int] = None) -> list:
+        """returns up to k distinct Cards, giving up after max_draws draws (default 20 * k)"""
+        chosen: dict = {}
+        max_draws = 20 * k if max_draws is None else max_draws
+        self.drawn = {}
+        while len(chosen) < k and max_draws > 0:
+            max_draws -= 1
+            drawn: Optional[tuple] = self.draw()
+            if drawn is not None and drawn[0] not in chosen:
+                key, card, deck = drawn
+                chosen[key] = card
+                self.drawn[key] = deck
+        return list(chosen.values())
+
+    def inErrors(self, errors: set) -> set:
+        """
+        the keys of the cards whose line is in errors, the lines of the error deck,
+        holding any that are not held already
+        """
+        keys: set = set()
+        for card in parseLines([line + "\n" for line in errors], self.delimiter):
+            key: str = cardHash(card)
+            self.add(key, card, None)
+            keys.add(key)
+        return keys
+
+    def record(self, results: dict):
+        """takes {Card: missed} for cards that were asked, stores them and reweighs those cards"""
+        missed: dict = {cardHash(card): bool(miss) for card, miss in results.items()}
+        lines: dict = {}
+        for card in results:
+            key: str = cardHash(card)
+            i: int = self.add(key, card, None)
+            # a card held without a deck is placed once it is drawn from one
+            self.decks[i] = self.decks[i] or self.drawn.get(key)
+            lines[key] = (card.line, self.decks[i])
+        self.store.recordAttempts(missed, lines)
+        for key, miss in missed.items():
+            asked, misses = self.attempts.get(key, (0, 0))
+            self.attempts[key] = (asked + 1, misses + miss)
+        self.reweighKeys(missed)
+
+    def reweigh(self, errors: set):
+        """takes the lines now in the error deck and reweighs the cards that went in or out of it"""
+        errors = self.inErrors(errors)
+        changed: set = errors ^ self.errors
+        self.errors = errors
+        self.reweighKeys(changed)
+
+    def reweighKeys(self, keys: Iterable):
+        """works out the weights of the cards with keys again and rebuilds only their blocks"""
+        dirty: set = set()
+        for key in keys:
+            if key in self.positions:
+                i: int = self.positions[key]
+                self.weights[i] = self.weight(key)
+                dirty.add(i // self.block_size)
+        for block in sorted(dirty):
+            start: int = block * self.block_size
+            table: AliasTable = AliasTable(
+                self.weights[start : start + self.block_size]
+            )
+            if block < len(self.blocks):
+                self.blocks[block] = table
+            else:
+                self.blocks.append(table)
+        if dirty:
+            self.top = AliasTable([block.total for block in self.blocks])
+            self.uniform = self.uniformWeight()
+
+    def close(self):
+        self.lines.close()
+        self.store.close()
+
+
+def remodelFile(src: str, dest: str, delimiter: str = "#", dedupe: bool = False):
+    """
+    writes the inverse of every line of src followed by src itself to dest,
+    streamed so that src is never held in memory, see remodelLines
+    """
+    if os.path.exists(src):
+        if os.path.exists(dest):
+            print_coloured(
+                f"{dest} already exists, Type 'overwrite' to overwrite",
+                color="red",
+                end="",
+            )
+            overwrite: str = input(": ")
+            if "overwrite" not in overwrite.lower():
+                raise IOError("Refusing to overwrite")
+        writeData(dest, remodelLines(src, delimiter, dedupe))
+        return f"Added inverse data and exported as {dest}"
+    else:
+        raise IOError(f"{src} file does not exist")
 
 
 def getLanguage(language: str, languages: list) -> tuple:
@@ -271,75 +2757,596 @@ def getLanguage(language: str, languages: list) -> tuple:
     return tuple()
 
 
-def translateFile(
-    src: str,
-    dest: str,
-    languages: list,
-    delimiter: str = "#",
-    language: Optional[str] = None,
-):
-    if os.path.exists(src):
-        # if dest exists ask whether or not to overwrite it
-        if os.path.exists(dest):
-            print_coloured(
-                f"{dest} already exists, Type 'overwrite' to overwrite",
-                color="red",
-                end="",
+def translateFile(
+    src: str,
+    dest: str,
+    languages: list,
+    delimiter: str = "#",
+    language: Optional[str] = None,
+    store: Optional["TranslationStore"] = None,
+    workers: int = 8,
+    overwrite: bool = False,
+    backend=None,
+):
+    if os.path.exists(src):
+        # if dest exists ask whether or not to overwrite it
+        if os.path.exists(dest) and not overwrite:
+            print_coloured(
+                f"{dest} already exists, Type 'overwrite' to overwrite",
+                color="red",
+                end="",
+            )
+            overwrite: str = input(": ")
+            if "overwrite" not in overwrite.lower():
+                raise IOError("Refusing to overwrite")
+
+        with open(src) as data:
+            file_data: list = data.readlines()
+        # if language, validate it against dictionary keys
+        if language:
+            code, lang = getLanguage(language, languages)
+            translated_data = makeTranslation(
+                file_data, code, lang, delimiter, store, workers, backend
+            )
+            parsedData = remodelData(translated_data, delimiter)
+            writeData(dest, parsedData)
+            return f"Translated {src} and exported as {dest}"
+        # if not language take the first line from the top of the file and if it contains
+        # language=code then validate it else raise an error
+        elif not language:
+            file_header: str = file_data.pop(0)
+            if "language" in file_header:
+                code, lang = getLanguage(file_header, languages)
+                translated_data = makeTranslation(
+                    file_data, code, lang, delimiter, store, workers, backend
+                )
+                parsedData = remodelData(translated_data, delimiter)
+                writeData(dest, parsedData)
+                return f"Translated {src} and exported as {dest}"
+            else:
+                raise ValueError("No Language Defined in  File Header")
+    else:
+        print_coloured(f"{src} file does not exist", color="red")
+
+
+AUTOMAKE_CHECKPOINT: str = ".automake"
+
+
+def readCheckpoint(path: str) -> dict:
+    """returns {deck: (fingerprint, language)} for every deck recorded as done in an automake checkpoint"""
+    done: dict = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record: dict = json.loads(line)
+                    done[record["deck"]] = (record["fingerprint"], record["language"])
+                except (ValueError, KeyError):
+                    # a line cut short by an interrupted run
+                    continue
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def translateDirectory(
+    src_dir: str,
+    dest_dir: str,
+    languages: list,
+    delimiter: str = "#",
+    language: Optional[str] = None,
+    store: Optional["TranslationStore"] = None,
+    workers: int = 8,
+    file_workers: int = 4,
+    excludes_ext: Optional[list] = None,
+    backend=None,
+) -> dict:
+    """
+    Runs translateFile for every deck under src_dir, writing each to the same
+    relative path under dest_dir, (file_workers) decks at a time sharing one store
+
+    Each finished deck is appended to dest_dir/.automake with the mtime and size of
+    its source, so when an interrupted run is started again the decks already done
+    are skipped and only the lines of unfinished decks missing from store are translated.
+    Returns the number of decks translated, skipped and failed, the lines translated and how long it took
+    """
+    excludes_ext = [".py"] if excludes_ext is None else excludes_ext
+    index: DeckIndex = DeckIndex(src_dir, [], excludes_ext)
+    os.makedirs(dest_dir, exist_ok=True)
+    checkpoint: str = os.path.join(dest_dir, AUTOMAKE_CHECKPOINT)
+    done: dict = readCheckpoint(checkpoint)
+    pending: list = []
+    for deck, path in sorted(index.decks.items()):
+        stat = os.stat(path)
+        fingerprint: list = [stat.st_mtime_ns, stat.st_size]
+        dest: str = os.path.join(dest_dir, deck)
+        if done.get(deck) == (fingerprint, language) and os.path.exists(dest):
+            continue
+        pending.append((deck, path, dest, fingerprint))
+
+    # decks written by an earlier run are replaced, anything else is only overwritten if the user agrees
+    existing: list = [
+        deck
+        for deck, _, dest, _ in pending
+        if deck not in done and os.path.exists(dest)
+    ]
+    if existing:
+        print_coloured(
+            f"{len(existing)} decks in {dest_dir} already exist, Type 'overwrite' to overwrite",
+            color="red",
+            end="",
+        )
+        if "overwrite" not in input(": ").lower():
+            raise IOError("Refusing to overwrite")
+
+    lock = threading.Lock()
+
+    def translate(deck: str, path: str, dest: str, fingerprint: list) -> int:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        translateFile(
+            path,
+            dest,
+            languages,
+            delimiter,
+            language,
+            store,
+            workers,
+            overwrite=True,
+            backend=backend,
+        )
+        with open(path) as f:
+            lines: int = sum(1 for line in f if line.strip())
+        record: dict = dict(deck=deck, fingerprint=fingerprint, language=language)
+        with lock, open(checkpoint, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        return lines
+
+    results: dict = dict(
+        translated=0, skipped=len(index.decks) - len(pending), failed=0, lines=0
+    )
+    started: float = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, file_workers)) as executor:
+        futures: dict = {executor.submit(translate, *deck): deck[0] for deck in pending}
+        for future in as_completed(futures):
+            try:
+                results["lines"] += future.result()
+                results["translated"] += 1
+                print_coloured(
+                    f"Translated {futures[future]} ({results['translated']} of {len(pending)})",
+                    color="cyan",
+                    end="\n",
+                )
+            # one deck failing, whatever the reason, should not stop the others
+            except Exception as e:
+                results["failed"] += 1
+                print_coloured(f"{futures[future]}: {e}", color="red", end="\n")
+    results["seconds"] = round(time.perf_counter() - started, 2)
+    results["lines_per_second"] = (
+        round(results["lines"] / results["seconds"], 1) if results["seconds"] else 0
+    )
+    return results
+
+
+class TranslationStore:
+    """
+    Persistent memo of translations keyed by (text, src, dest), kept in sqlite so
+    that re-running automake over the same vocabulary never translates a line twice
+
+    This is the translation memory that is looked in before any backend, seed() fills
+    it with the pairs already in a collection of decks
+    """
+
+    def __init__(self, path: str = TRANSLATION_STORE):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path: str = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text TEXT NOT NULL, src TEXT NOT NULL, dest TEXT NOT NULL, "
+            "translation TEXT NOT NULL, PRIMARY KEY (text, src, dest))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS seeded ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, text: str, src: str, dest: str) -> Optional[str]:
+        """the translation of text, or of text in lower case as decks are seeded in lower case"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT translation FROM translations WHERE text IN (?, ?) "
+                "AND src=? AND dest=? ORDER BY text=? DESC LIMIT 1",
+                (text, text.lower(), src, dest, text),
+            ).fetchone()
+        return row[0] if row else None
+
+    def translate(self, text: str, src: str, dest: str) -> Optional[str]:
+        return self.get(text, src, dest)
+
+    def seed(self, paths: Iterable, languages: list, delimiter: str = "#") -> int:
+        """
+        adds the English#foreign pairs of every deck in paths, e.g. R:To speak#говорить,
+        a deck is only read again once it has changed, returns the number of pairs added
+        """
+        added: int = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                with self._lock:
+                    row = self.connection.execute(
+                        "SELECT mtime_ns, size FROM seeded WHERE path=?", (path,)
+                    ).fetchone()
+                if row == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                with open(path) as f:
+                    cards: list = parseLines(f, delimiter)
+            except (OSError, UnicodeDecodeError, IndexError):
+                continue
+            pairs: list = []
+            for card in cards:
+                (question, question_key), (answer, answer_key) = (
+                    card.question_voice,
+                    card.answer_voice,
+                )
+                if answer_key == "E" and question_key in languages:
+                    english, foreign, code = answer, question, question_key
+                elif question_key == "E" and answer_key in languages:
+                    english, foreign, code = question, answer, answer_key
+                else:
+                    continue
+                if english.strip() and foreign.strip() and languages[code] != "en":
+                    pairs.append(
+                        (
+                            english.strip().lower(),
+                            "en",
+                            languages[code],
+                            foreign.strip(),
+                        )
+                    )
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", pairs
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO seeded VALUES (?, ?, ?)",
+                    (path, stat.st_mtime_ns, stat.st_size),
+                )
+            added += len(pairs)
+        return added
+
+    def update(self, translations: dict, src: str, dest: str):
+        """stores a {text: translation} mapping in a single transaction"""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                [(text, src, dest, value) for text, value in translations.items()],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM translations"
+            ).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class GoogleTranslate:
+    """the network translation backend, googletrans is only imported for the first line translated"""
+
+    def __init__(self):
+        self._translator = None
+        self._lock = threading.Lock()
+
+    def translate(self, text: str, src: str, dest: str) -> Optional[str]:
+        with self._lock:
+            if self._translator is None:
+                self._translator = googleTranslator()
+        with PROFILER.timer("translate"):
+            return self._translator.translate(text, src=src, dest=dest).text
+
+
+class Offline:
+    """the backend for running without a network, anything not in the translation memory is left out"""
+
+    def translate(self, text: str, src: str, dest: str) -> Optional[str]:
+        return None
+
+
+# a backend has translate(text, src, dest) returning the translation, or None if it has none
+TRANSLATION_BACKENDS: dict = dict(google=GoogleTranslate, offline=Offline)
+
+
+@profiled("translateLines")
+def translateLines(
+    lines: list,
+    src: str,
+    dest: str,
+    store: Optional[TranslationStore] = None,
+    workers: int = 8,
+    backend=None,
+) -> dict:
+    """
+    Translates every distinct line once and returns a {line: translation} mapping
+    lines already in the store are not sent again, the rest are translated by
+    backend (GoogleTranslate if not given) concurrently on a pool of (workers) threads
+    and saved to the store every 100 lines, so a run that fails part way can pick up
+    from there. Lines the backend has no translation for are left out of the mapping
+    """
+    translations: dict = {}
+    missing: list = []
+    for line in dict.fromkeys(lines):
+        cached: Optional[str] = (
+            store.get(line, src, dest) if store is not None else None
+        )
+        if cached is None:
+            missing.append(line)
+        else:
+            translations[line] = cached
+
+    if missing:
+        backend = GoogleTranslate() if backend is None else backend
+
+        def translate(text: str) -> Optional[str]:
+            return backend.translate(text, src, dest)
+
+        unsaved: dict = {}
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for line, translation in zip(missing, executor.map(translate, missing)):
+                    if translation is None:
+                        continue
+                    translations[line] = unsaved[line] = translation
+                    if store is not None and len(unsaved) >= 100:
+                        store.update(unsaved, src, dest)
+                        unsaved.clear()
+        finally:
+            if store is not None and unsaved:
+                store.update(unsaved, src, dest)
+    return translations
+
+
+def makeTranslation(
+    data: list,
+    code: str,
+    lang: str,
+    delimiter: str = "#",
+    store: Optional[TranslationStore] = None,
+    workers: int = 8,
+    backend=None,
+) -> list:
+    """
+    returns code:Line#translation for every non empty line of data, in the order given,
+    lines that could not be translated are left out
+    """
+    lines: list = [line.strip() for line in data if line.strip()]
+    translations: dict = translateLines(lines, "en", lang, store, workers, backend)
+    return [
+        f"{code.capitalize()}:{line.capitalize()}{delimiter}{translations[line]}\n"
+        for line in lines
+        if line in translations
+    ]
+
+
+WRITE_BUFFER: int = 2**20
+
+
+def inverseLines(
+    lines: Iterable, delimiter: str, skip: Optional[set] = None
+) -> Iterator[str]:
+    """
+    lazily yields Question#Answer for every Answer#Question line,
+    inverses whose hash is in skip are left out
+    """
+    for line in lines:
+        split_line: list = line.rstrip().split(delimiter)
+        if len(split_line) == 2:
+            inverse: str = split_line[1] + delimiter + split_line[0]
+            if skip is None or hash(inverse) not in skip:
+                yield inverse + "\n"
+
+
+def remodelData(data: list, delimiter: str) -> list:
+    return list(inverseLines(data, delimiter)) + data
+
+
+def remodelLines(src: str, delimiter: str, dedupe: bool = False) -> Iterator[str]:
+    """
+    streams the inverse of every line of src and then src itself, reading src twice
+    with dedupe a first pass collects the hash of every line so that pairs already
+    in src in both directions are not added again, this costs memory per line of src
+    """
+    skip: Optional[set] = None
+    if dedupe:
+        with open(src) as f:
+            skip = {hash(line.rstrip()) for line in f}
+    with open(src) as f:
+        yield from inverseLines(f, delimiter, skip)
+    with open(src) as f:
+        yield from iter(lambda: f.read(WRITE_BUFFER), "")
+
+
+def writeData(dest: str, data: Iterable):
+    """
+    writes lines, or any strings, to dest through a large buffer,
+    dest is only replaced once everything has been written so it can also be the source
+    """
+    tmp: str = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", buffering=WRITE_BUFFER) as f:
+            f.writelines(data)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Persistent trigram index over the answer and question of every card, kept in sqlite
+
+    Cards are folded with normalizeAnswer, so a search ignores case, stress marks,
+    punctuation and spaces, and every trigram of the folded answer and question is
+    a row of grams. A search only reads the cards holding the rarest trigram of the
+    term and checks each of them for the whole term, terms under three letters scan
+    the folded cards.
+    update() only reads the decks whose mtime or size has changed since they were
+    indexed and drops the decks that are gone.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path: str = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS decks (id INTEGER PRIMARY KEY, "
+                "path TEXT UNIQUE NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cards (deck INTEGER NOT NULL, "
+                "line INTEGER NOT NULL, text TEXT NOT NULL, folded TEXT NOT NULL, "
+                "PRIMARY KEY (deck, line)) WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS grams (gram TEXT NOT NULL, "
+                "deck INTEGER NOT NULL, line INTEGER NOT NULL, "
+                "PRIMARY KEY (gram, deck, line)) WITHOUT ROWID"
             )
-            overwrite: str = input(": ")
-            if "overwrite" not in overwrite.lower():
-                raise IOError("Refusing to overwrite")
 
-        data = open(src)
-        file_data: list = data.readlines()
-        # if language, validate it against dictionary keys
-        if language:
-            code, lang = getLanguage(language, languages)
-            translated_data = makeTranslation(file_data, code, lang, delimiter)
-            parsedData = remodelData(translated_data, delimiter)
-            writeData(dest, parsedData)
-            return f"Translated {src} and exported as {dest}"
-        # if not language take the first line from the top of the file and if it contains
-        # language=code then validate it else raise an error
-        elif not language:
-            file_header: str = file_data.pop(0)
-            if "language" in file_header:
-                code, lang = getLanguage(file_header, languages)
-                translated_data = makeTranslation(file_data, code, lang, delimiter)
-                parsedData = remodelData(translated_data, delimiter)
-                writeData(dest, parsedData)
-                return f"Translated {src} and exported as {dest}"
-            else:
-                raise ValueError("No Language Defined in  File Header")
-        data.close()
-    else:
-        print_coloured(f"{src} file does not exist", color="red")
+    @staticmethod
+    def within(root: str) -> tuple:
+        """the range of paths under root"""
+        root = os.path.join(os.path.abspath(root), "")
+        return (root, root[:-1] + chr(ord(os.sep) + 1))
+
+    def update(self, root: str, paths: Iterable, delimiter: str = "#") -> int:
+        """indexes the decks in paths that changed and forgets the other decks under root, returns the number read"""
+        indexed: dict = {
+            path: (deck, mtime_ns, size)
+            for deck, path, mtime_ns, size in self.connection.execute(
+                "SELECT * FROM decks WHERE path >= ? AND path < ?", self.within(root)
+            )
+        }
+        read: int = 0
+        with self.connection:
+            for path in map(os.path.abspath, paths):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                deck, *fingerprint = indexed.pop(path, (None, None, None))
+                if fingerprint == [stat.st_mtime_ns, stat.st_size]:
+                    continue
+                if deck is not None:
+                    self.forget(deck)
+                deck = self.connection.execute(
+                    "INSERT INTO decks (path, mtime_ns, size) VALUES (?, ?, ?)",
+                    (path, stat.st_mtime_ns, stat.st_size),
+                ).lastrowid
+                self.add(deck, path, delimiter)
+                read += 1
+            for deck, *_ in indexed.values():
+                self.forget(deck)
+        return read
 
+    def add(self, deck: int, path: str, delimiter: str):
+        cards: list = []
+        grams: list = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if delimiter not in line:
+                        continue
+                    fields: list = [
+                        normalizeAnswer(field) for field in line.split(delimiter, 1)
+                    ]
+                    cards.append((deck, number, line.rstrip("\n"), "\n".join(fields)))
+                    grams.extend(
+                        (gram, deck, number)
+                        for gram in set().union(*map(trigrams, fields))
+                    )
+        except (OSError, UnicodeDecodeError):
+            # not a deck, it is remembered as one without cards so it is not read again
+            return None
+        self.connection.executemany("INSERT INTO cards VALUES (?, ?, ?, ?)", cards)
+        # inserted in key order the rows are appended to the pages of each trigram
+        self.connection.executemany("INSERT INTO grams VALUES (?, ?, ?)", sorted(grams))
 
-def makeTranslation(data: list, code: str, lang: str, delimiter: str = "#") -> list:
-    translated_data: list = []
-    for i in data:
-        translated_data.append(
-            f"{code.capitalize()}:{i.rstrip().capitalize()}{delimiter}{Translator().translate(i,src='en', dest=lang).text}\n"
+    def forget(self, deck: int):
+        cards: list = self.connection.execute(
+            "SELECT line, folded FROM cards WHERE deck = ?", (deck,)
+        ).fetchall()
+        self.connection.executemany(
+            "DELETE FROM grams WHERE gram = ? AND deck = ? AND line = ?",
+            [
+                (gram, deck, line)
+                for line, folded in cards
+                for gram in set().union(*map(trigrams, folded.split("\n")))
+            ],
         )
-    return translated_data
+        self.connection.execute("DELETE FROM cards WHERE deck = ?", (deck,))
+        self.connection.execute("DELETE FROM decks WHERE id = ?", (deck,))
 
+    def rarest(self, grams: set, cap: int = 10000) -> str:
+        """the trigram in the fewest cards, counting no further than cap cards for each"""
+        return min(
+            sorted(grams),
+            key=lambda gram: self.connection.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM grams WHERE gram = ? LIMIT ?)",
+                (gram, cap),
+            ).fetchone()[0],
+        )
 
-def remodelData(data: list, delimiter: str) -> list:
-    parsed_data: list = []
-    for line in data:
-        split_line: list = line.rstrip().split(delimiter)
-        if len(split_line) == 2:
-            parsed_line: str = split_line[1] + delimiter + split_line[0] + "\n"
-            parsed_data.append(parsed_line)
-    return parsed_data + data
+    def search(self, term: str, root: str, limit: int = 50) -> list:
+        """
+        returns (deck path, line number, line) of up to limit cards under root whose answer or question holds term,
+        only the cards holding the rarest trigram of the term are checked
+        """
+        folded: str = normalizeAnswer(term)
+        if not folded:
+            return []
+        grams: set = trigrams(folded)
+        if grams:
+            query: str = (
+                "SELECT decks.path, cards.line, cards.text, cards.folded FROM grams "
+                "JOIN cards ON cards.deck = grams.deck AND cards.line = grams.line "
+                "JOIN decks ON decks.id = grams.deck WHERE grams.gram = ? "
+                "AND decks.path >= ? AND decks.path < ? ORDER BY grams.deck, grams.line"
+            )
+            args: tuple = (self.rarest(grams), *self.within(root))
+        else:
+            query = (
+                "SELECT decks.path, cards.line, cards.text, cards.folded FROM cards "
+                "JOIN decks ON decks.id = cards.deck WHERE instr(cards.folded, ?) > 0 "
+                "AND decks.path >= ? AND decks.path < ? ORDER BY cards.deck, cards.line"
+            )
+            args = (folded, *self.within(root))
+        found: list = []
+        # rows come in index order so the search stops as soon as limit cards are found
+        for path, number, text, card in self.connection.execute(query, args):
+            if folded in card:
+                found.append((path, number, text))
+                if len(found) >= limit:
+                    break
+        return sorted(found)
+
+    def close(self):
+        self.connection.close()
 
 
-def writeData(dest: str, data: list):
-    f = open(dest, "w")
-    for line in data:
-        f.write(line)
-    f.close()
+def corpusKey(decks: dict) -> tuple:
+    """the (path, fingerprint) of every deck returned by CommandLine.corpusDecks"""
+    return tuple((path, fingerprint) for path, (fingerprint, _) in decks.items())
 
 
 class CommandLine(Cmd):
@@ -355,75 +3362,387 @@ class CommandLine(Cmd):
             excludes_ext=[".py"],
             working_dir="/home/michael/Downloads/Workarea/DevLearn/Russian/COMPLETE/P1",
             languages={"R": "ru", "E": "en", "U": "uk", "Z": "ZH-cn"},
+            audio_cache_dir=AUDIO_CACHE_DIR,
+            audio_cache_size=100,
+            prefetch=3,
+            playback_worker=True,
+            pcm_store=False,
+            pcm_store_dir=PCM_STORE_DIR,
+            pcm_store_size=64,
+            random_cards=30,
+            random_weighted=True,
+            score_db="scores.db",
+            review_db="review.db",
+            review_cards=20,
+            translation_store=TRANSLATION_STORE,
+            search_db=SEARCH_INDEX,
+            find_results=50,
+            translation_workers=8,
+            automake_workers=4,
+            translation_backend="google",
+            render_workers=4,
+            metrics_file="metrics.jsonl",
+            # typo tolerance is opt-in, an inflection one letter off is a real mistake
+            typos=0,
         )
+        self._audio_cache: Optional[AudioCache] = None
+        self._translation_store: Optional[TranslationStore] = None
+        self._search_index: Optional[SearchIndex] = None
+        self._score_store: Optional[ScoreStore] = None
+        self._review_queue: Optional[ReviewQueue] = None
+        self._playback_worker: Optional[PlaybackWorker] = None
+        self._pcm_store: Optional[PcmStore] = None
+        self._review_key: Optional[tuple] = None
+        self._error_sampler: Optional[ErrorWeightedSampler] = None
+        self._error_sampler_key: Optional[tuple] = None
+        self._error_sampler_errors: Optional[tuple] = None
+        # the (fingerprint, Cards) of every deck loaded by corpusDecks(), by path
+        self._corpus: dict = {}
         self.ruler: str = "-"
         self.prompt: str = "COMMAND >>"
         self.intro: str = "Type help to view commands\n".upper()
 
+    def audioCache(self) -> AudioCache:
+        """returns the audio cache for the current environment, audio_cache_size is in MB"""
+        directory: str = self.env["audio_cache_dir"]
+        max_size: int = int(self.env["audio_cache_size"]) * 2**20
+        if (
+            self._audio_cache is None
+            or self._audio_cache.directory != directory
+            or self._audio_cache.max_size != max_size
+        ):
+            self._audio_cache = AudioCache(directory, max_size)
+        return self._audio_cache
+
+    def playbackWorker(self) -> Optional[PlaybackWorker]:
+        """returns the long-lived playback worker, started the first time audio is played"""
+        if not self.env["audio"] or not self.env["playback_worker"]:
+            return None
+        pcm: Optional[PcmStore] = self.pcmStore()
+        if self._playback_worker is not None and self._playback_worker.pcm is not pcm:
+            self._playback_worker.close()
+            self._playback_worker = None
+        if self._playback_worker is None:
+            self._playback_worker = PlaybackWorker(pcm=pcm)
+        return self._playback_worker
+
+    def pcmStore(self) -> Optional[PcmStore]:
+        """returns the store of decoded clips when pcm_store is on, pcm_store_size is in MB"""
+        if not self.env["pcm_store"]:
+            return None
+        directory: str = self.env["pcm_store_dir"]
+        max_size: int = int(self.env["pcm_store_size"]) * 2**20
+        if (
+            self._pcm_store is None
+            or self._pcm_store.directory != directory
+            or self._pcm_store.max_size != max_size
+        ):
+            if self._pcm_store is not None:
+                self._pcm_store.close()
+            self._pcm_store = PcmStore(directory, max_size)
+        return self._pcm_store
+
+    def translationStore(self) -> TranslationStore:
+        """returns the translation store for the current environment"""
+        path: str = self.env["translation_store"]
+        if self._translation_store is None or self._translation_store.path != path:
+            self._translation_store = TranslationStore(path)
+        return self._translation_store
+
+    def searchIndex(self) -> SearchIndex:
+        """returns the search index, first indexing the decks of the working directory that changed"""
+        path: str = self.env["search_db"]
+        if self._search_index is None or self._search_index.path != path:
+            if self._search_index is not None:
+                self._search_index.close()
+            self._search_index = SearchIndex(path)
+        self._search_index.update(
+            self.env["working_dir"],
+            list(self.decks()[1].decks.values()),
+            self.env["delimiter"],
+        )
+        return self._search_index
+
+    def translationMemory(self) -> TranslationStore:
+        """returns the translation store, first adding the pairs in the decks of the working directory"""
+        store: TranslationStore = self.translationStore()
+        store.seed(
+            self.decks()[1].decks.values(),
+            self.env["languages"],
+            self.env["delimiter"],
+        )
+        return store
+
+    def translationBackend(self):
+        """returns the backend lines missing from the translation memory are translated by"""
+        name: str = self.env["translation_backend"]
+        if name not in TRANSLATION_BACKENDS:
+            raise ValueError(
+                f"translation_backend must be one of {', '.join(TRANSLATION_BACKENDS)}"
+            )
+        return TRANSLATION_BACKENDS[name]()
+
+    def ownFiles(self) -> list:
+        """the names of the files kept next to the decks, the error deck, log, databases and metrics"""
+        return [
+            os.path.basename(self.env[name])
+            for name in (
+                "error_file",
+                "log_file",
+                "score_db",
+                "review_db",
+                "metrics_file",
+            )
+        ]
+
+    def decks(self) -> tuple:
+        """
+        returns the DeckIndex of the current directory and of the working directory,
+        leaving out the excludes and the files of ownFiles()
+        """
+        excludes: list = list(self.env["excludes"]) + self.ownFiles()
+        return (
+            deckIndex(os.curdir, excludes, self.env["excludes_ext"], False),
+            deckIndex(self.env["working_dir"], excludes, self.env["excludes_ext"]),
+        )
+
+    def scoreStore(self) -> ScoreStore:
+        """returns the score store for the current environment, importing log_file the first time"""
+        path: str = self.env["score_db"]
+        if self._score_store is None or self._score_store.path != path:
+            self._score_store = ScoreStore(path)
+        self._score_store.importLog(self.env["log_file"])
+        return self._score_store
+
+    def reviewQueue(self) -> ReviewQueue:
+        """
+        returns the review queue over every deck in the working directory,
+        built again only when a deck or the review_db changes
+        """
+        decks: dict = self.corpusDecks()
+        key: tuple = (self.env["review_db"], corpusKey(decks))
+        if self._review_queue is None or self._review_key != key:
+            if self._review_queue is not None:
+                self._review_queue.store.close()
+            self._review_queue = ReviewQueue(
+                [card for _, cards in decks.values() for card in cards],
+                ReviewStore(self.env["review_db"]),
+            )
+            self._review_key = key
+        return self._review_queue
+
+    def corpusDecks(self) -> dict:
+        """
+        returns {path: (fingerprint, Cards)} for every deck in the working directory,
+        a deck is only loaded again once it changes
+        """
+        filelist, working_dir_files = self.decks()
+        decks: dict = {}
+        for path in working_dir_files.decks.values():
+            try:
+                stat = os.stat(path)
+                fingerprint: tuple = (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                    self.env["delimiter"],
+                )
+                loaded: Optional[tuple] = self._corpus.get(path)
+                if loaded is None or loaded[0] != fingerprint:
+                    loaded = (fingerprint, compileDeck(path, self.env["delimiter"]))
+            except (OSError, UnicodeDecodeError):
+                continue
+            decks[path] = loaded
+        self._corpus = decks
+        return decks
+
+    def corpus(self) -> list:
+        """returns the Cards of every deck in the working directory"""
+        return [card for _, cards in self.corpusDecks().values() for card in cards]
+
+    def errorSampler(self) -> ErrorWeightedSampler:
+        """
+        returns the sampler weighting the cards in the working directory by how often
+        they are missed, built again only when a deck or the review_db changes, a change
+        to the error deck only reweighs the cards that went in or out of it,
+        no deck is loaded
+        """
+        filelist, working_dir_files = self.decks()
+        paths: list = list(working_dir_files.decks.values())
+        journal: ErrorJournal = errorJournal(self.env["error_file"])
+        journal.refresh()
+        fingerprints: list = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            fingerprints.append((path, stat.st_mtime_ns, stat.st_size))
+        key: tuple = (self.env["review_db"], self.env["delimiter"], tuple(fingerprints))
+        if self._error_sampler is None or self._error_sampler_key != key:
+            if self._error_sampler is not None:
+                self._error_sampler.close()
+            self._error_sampler = ErrorWeightedSampler(
+                [path for path, *_ in fingerprints],
+                ReviewStore(self.env["review_db"]),
+                journal.cards,
+                self.env["delimiter"],
+            )
+            self._error_sampler_key = key
+        elif self._error_sampler_errors != journal.fingerprint():
+            self._error_sampler.reweigh(journal.cards)
+        self._error_sampler_errors = journal.fingerprint()
+        return self._error_sampler
+
     def emptyline(self):
         return self.default()
 
     def default(self, line=None):
-        filelist, working_dir_files = files(
-            self.env["working_dir"], self.env["excludes"], self.env["excludes_ext"]
-        )
+        filelist, working_dir_files = self.decks()
 
-        if line in filelist or line in working_dir_files:
-            file: list = getFile(
-                line, filelist, working_dir_files, self.env["working_dir"]
-            )
-        elif line not in filelist and line not in working_dir_files and line:
+        if line == self.env["error_file"]:
+            errorJournal(line).compact()
+            # the error deck is not listed with the decks, see decks()
+            path: Optional[str] = line if os.path.isfile(line) else None
+        else:
+            path = filelist.get(line) or working_dir_files.get(line)
+        if path is not None:
+            file: list = compileDeck(path, self.env["delimiter"])
+        elif line:
             print_coloured(f"{line} Not Recognized", color="red")
             return None
         else:
             line: str = "Random Collection"
             file: list = getRandomFile(
-                filelist, working_dir_files, self.env["working_dir"]
+                list(filelist.decks),
+                list(working_dir_files.decks),
+                self.env["working_dir"],
+            )
+
+        results: tuple = Test(
+            file,
+            self.env["delimiter"],
+            self.env["languages"],
+            self.env["audio"],
+            self.audioCache(),
+            int(self.env["prefetch"]),
+            self.playbackWorker(),
+            typos=int(self.env["typos"]),
+        )
+        correct, total, incorrect_questions = results
+        # the score and the errors of the session are committed together
+        with StorageWriter() as writer:
+            score(
+                line,
+                correct,
+                total,
+                self.env["log_file"],
+                self.env["log"],
+                self.env["error_file"],
+                self.scoreStore(),
+                writer,
             )
+            writeErrorsToFile(line, self.env["error_file"], incorrect_questions, writer)
 
+    def do_random(self, line=None):
+        """
+        returns a random selection of questions from the decks in the working directory,
+        the cards missed most often come up most often while random_weighted is on
+        random [number_of_questions]
+        """
+        filelist, working_dir_files = self.decks()
+        k: int = int(line) if line and line.isdigit() else int(self.env["random_cards"])
+        sampler: Optional[ErrorWeightedSampler] = None
+        if self.env["random_weighted"]:
+            sampler = self.errorSampler()
+            file: list = sampler.sample(k)
+        else:
+            file = getRandomSelection(
+                filelist,
+                list(working_dir_files.decks),
+                self.env["working_dir"],
+                k,
+                self.env["delimiter"],
+            )
         results: tuple = Test(
-            file, self.env["delimiter"], self.env["languages"], self.env["audio"]
+            file,
+            self.env["delimiter"],
+            self.env["languages"],
+            self.env["audio"],
+            self.audioCache(),
+            int(self.env["prefetch"]),
+            self.playbackWorker(),
+            typos=int(self.env["typos"]),
         )
         correct, total, incorrect_questions = results
+        if sampler is not None:
+            sampler.record({card: card.line in incorrect_questions for card in file})
         score(
-            line,
+            "Random Collection",
             correct,
             total,
             self.env["log_file"],
             self.env["log"],
             self.env["error_file"],
         )
-        writeErrorsToFile(line, self.env["error_file"], incorrect_questions)
 
-    def do_random(self, line=None):
-        """returns a random selection of question from the current directory and the working directory"""
-        filelist, working_dir_files = files(
-            self.env["working_dir"], self.env["excludes"], self.env["excludes_ext"]
-        )
-        file: list = getRandomSelection(
-            filelist, working_dir_files, self.env["working_dir"]
-        )
-        results: tuple = Test(
-            file, self.env["delimiter"], self.env["languages"], self.env["audio"]
+    def do_review(self, line: str):
+        """
+        asks the cards that are due for review across every deck in the working directory,
+        scheduled by spaced repetition (SM-2), the most overdue first
+        review [number_of_questions]
+        """
+        queue: ReviewQueue = self.reviewQueue()
+        cards: list = queue.due(
+            int(line) if line and line.isdigit() else int(self.env["review_cards"])
         )
-        correct, total, incorrect_questions = results
+        if not cards:
+            print_coloured("Nothing is due for review", color="green")
+            return None
+        graded: bool = False
+        try:
+            correct, total, incorrect_questions = Test(
+                list(cards),
+                self.env["delimiter"],
+                self.env["languages"],
+                self.env["audio"],
+                self.audioCache(),
+                int(self.env["prefetch"]),
+                self.playbackWorker(),
+                typos=int(self.env["typos"]),
+                shuffle=False,
+            )
+            queue.grade(
+                {card: 1 if card.line in incorrect_questions else 4 for card in cards}
+            )
+            graded = True
+        finally:
+            # a session cut short leaves its cards due rather than losing them
+            if not graded:
+                queue.restore(cards)
         score(
-            line,
+            "Review",
             correct,
             total,
             self.env["log_file"],
-            self.env["log"],
+            False,
             self.env["error_file"],
         )
 
     def do_audio(self, line: str):
         """
         audio on|off toggles the state of the audio for the verbal cues
+        audio stats shows how many clips the playback worker has played and how quickly
         """
         if line.lower() == "on" or line.lower() == "true":
             self.env["audio"] = True
         elif line.lower() == "off" or line.lower() == "false":
             self.env["audio"] = False
+        elif line.lower() == "stats" and self._playback_worker is not None:
+            for name, value in self._playback_worker.stats().items():
+                print_coloured(name, end=" : ", color="green")
+                print_coloured(value, end="\n", color="cyan")
+        elif line.lower() == "stats":
+            print_coloured("No audio has been played yet", color="yellow")
 
     def do_toggle_audio(self, line: str):
         """toggles audio on|off"""
@@ -468,7 +3787,7 @@ class CommandLine(Cmd):
         try:
             key, value, *args = line.split(" ")
             current_env_var: str = self.env.get(key, "")
-            if current_env_var:
+            if key in self.env:
                 print_coloured(f"\nCurrent values:", color="yellow", end=" ")
                 print_coloured(current_env_var, color="white")
                 if isinstance(current_env_var, dict) and args:
@@ -488,6 +3807,9 @@ class CommandLine(Cmd):
                     for items in [value, *args]:
                         self.env[key].add(items)
                     print_coloured("Successfully Updated Environment", "yellow")
+                elif isinstance(current_env_var, bool):
+                    self.env[key] = value.lower() in ("on", "true")
+                    print_coloured("Successfully Updated Environment", "yellow")
                 else:
                     self.env[key] = value
                     print_coloured("Successfully Updated Environment", "yellow")
@@ -508,8 +3830,10 @@ class CommandLine(Cmd):
         config = ConfigParser()
         config["CONFIG"] = self.env
 
-        with open(filename, "w") as conf:
-            config.write(conf)
+        conf = io.StringIO()
+        config.write(conf)
+        with storageWriter() as storage:
+            storage.replace(filename, conf.getvalue())
         print_coloured(f"Wrote environment to {filename}", color="green")
 
     def do_load(self, line):
@@ -533,30 +3857,82 @@ class CommandLine(Cmd):
 
     def do_ls(self, line: str):
         """lists current directory without arguments
-        ls working directory | lists working directory
+        ls working directory | lists working directory, including sub directories
         """
 
-        filelist, working_dir_files = files(
-            self.env["working_dir"], self.env["excludes"], self.env["excludes_ext"]
-        )
+        filelist, working_dir_files = self.decks()
         if not line:
-            print_coloured(filelist, "green")
+            print_coloured(list(filelist.decks), "green")
         elif line.lower() == "working directory":
-            print_coloured(working_dir_files, "green")
+            print_coloured(list(working_dir_files.decks), "green")
+
+    def do_find(self, line: str):
+        """
+        lists the cards of every deck in the working directory whose answer or question holds a term,
+        ignoring case, stress marks and punctuation
+        find TERM
+        """
+        if not line.strip():
+            print_coloured("find TERM", color="red")
+            return None
+        started: float = time.perf_counter()
+        found: list = self.searchIndex().search(
+            line, self.env["working_dir"], int(self.env["find_results"])
+        )
+        for path, number, text in found:
+            deck: str = os.path.relpath(path, self.env["working_dir"])
+            print_coloured(f"{deck}:{number}", end=" ", color="green")
+            print_coloured(text, end="\n", color="cyan")
+        print_coloured(
+            f"{len(found)} cards found in {(time.perf_counter() - started) * 1000:.1f} ms",
+            color="yellow",
+        )
 
     def do_stats(self, line):
-        """Prints the current log file, results less than 50% are shown in red"""
-        if os.path.exists(self.env["log_file"]):
-            file = open(self.env["log_file"])
-            for line in file:
-                percent: list = line.rsplit(" ", 1)
-                if len(percent) > 1:
-                    percent: str = percent[1].replace("%", "")
-                    if float(percent) <= 50:
-                        color: str = "red"
-                else:
-                    color: str = "yellow"
-                print_coloured(line, color=color, end="\n")
+        """
+        Prints the logged test scores, results of 50% or less are shown in red
+                stats [summary] [deck name] [from date] [to date] [below percent]
+                summary prints one line per deck instead of one per test
+                dates are given as dd/mm/YYYY or YYYY-MM-DD, below only shows scores under percent
+        e.g.    stats summary from 01/01/2021 below 60
+        """
+        args: list = line.split()
+        summary: bool = bool(args) and args[0] == "summary"
+        if summary:
+            args = args[1:]
+        filters: dict = dict(zip(args[::2], args[1::2]))
+        try:
+            if len(args) % 2 or not set(filters) <= {"deck", "from", "to", "below"}:
+                raise ValueError(line)
+            query: dict = dict(
+                deck=filters.get("deck"),
+                since=isoDate(filters["from"]) if "from" in filters else None,
+                until=isoDate(filters["to"]) if "to" in filters else None,
+                below=int(filters["below"]) if "below" in filters else None,
+            )
+        except ValueError:
+            print_coloured(
+                "stats [summary] [deck name] [from date] [to date] [below percent]",
+                color="red",
+            )
+            return None
+        store: ScoreStore = self.scoreStore()
+        if summary:
+            for deck, sessions, correct, total, percent, worst in store.summary(
+                **query
+            ):
+                print_coloured(
+                    f"{deck} {sessions} tests {correct}/{total} {percent}% worst {worst}%",
+                    color="red" if percent <= 50 else "yellow",
+                    end="\n",
+                )
+        else:
+            for taken_at, deck, correct, total, percent in store.sessions(**query):
+                print_coloured(
+                    f"{taken_at} {deck} {correct}/{total} {percent}%",
+                    color="red" if percent <= 50 else "yellow",
+                    end="\n",
+                )
 
     def do_make(self, line):
         """
@@ -565,19 +3941,26 @@ class CommandLine(Cmd):
                 Question#Answer
                 вино#R:Wine
                 R:Wine#вино
-        Command: make src_file dest_file
+        Command: make src_file dest_file [dedupe]
+        with dedupe the inverse of a line is not added if it is already in src_file
         """
         files: list = line.split(" ")
-        if len(files) == 2:
-            src, dest = files
+        if len(files) in (2, 3) and files[2:] in ([], ["dedupe"]):
+            src, dest = files[:2]
             print_coloured(
-                remodelFile(src, dest, delimiter=self.env["delimiter"]), color="cyan"
+                remodelFile(
+                    src, dest, delimiter=self.env["delimiter"], dedupe=len(files) == 3
+                ),
+                color="cyan",
             )
         else:
             print_coloured("Please providev a src and destination file", color="red")
 
     def do_automake(self, line):
         """
+        automake-dir src_dir dest_dir [language=code]
+        translates every deck under src_dir into dest_dir, see automake_dir
+
         automake src_file dest_file
         if the above command is used specify language=code as the first line of your file
 
@@ -600,6 +3983,8 @@ class CommandLine(Cmd):
                 R:He speaks#он говорит
 
         """
+        if line.startswith("-dir "):
+            return self.do_automake_dir(line[len("-dir ") :])
         lines: list = line.split(" ")
 
         if len(lines) == 3 and "language" in line:
@@ -612,6 +3997,9 @@ class CommandLine(Cmd):
                     self.env["languages"],
                     delimiter=self.env["delimiter"],
                     language=language,
+                    store=self.translationMemory(),
+                    workers=int(self.env["translation_workers"]),
+                    backend=self.translationBackend(),
                 ),
                 color="cyan",
             )
@@ -620,7 +4008,13 @@ class CommandLine(Cmd):
             src, dest = lines
             print_coloured(
                 translateFile(
-                    src, dest, self.env["languages"], delimiter=self.env["delimiter"]
+                    src,
+                    dest,
+                    self.env["languages"],
+                    delimiter=self.env["delimiter"],
+                    store=self.translationMemory(),
+                    workers=int(self.env["translation_workers"]),
+                    backend=self.translationBackend(),
                 ),
                 color="cyan",
             )
@@ -628,11 +4022,640 @@ class CommandLine(Cmd):
         else:
             print_coloured("Please provide a src and destination file", color="red")
 
+    def do_automake_dir(self, line: str):
+        """
+        automake-dir src_dir dest_dir [language=code]
+        runs automake for every deck under src_dir, automake_workers decks at a time,
+        writing each to the same path under dest_dir. An interrupted run picks up where
+        it stopped when run again, as the decks finished are recorded in dest_dir/.automake
+        """
+        args: list = line.split()
+        if len(args) not in (2, 3) or (len(args) == 3 and "language" not in args[2]):
+            print_coloured(
+                "Please provide a src and destination directory", color="red"
+            )
+            return None
+        if not os.path.isdir(args[0]):
+            print_coloured(f"{args[0]} directory does not exist", color="red")
+            return None
+        results: dict = translateDirectory(
+            args[0],
+            args[1],
+            self.env["languages"],
+            delimiter=self.env["delimiter"],
+            language=args[2] if len(args) == 3 else None,
+            store=self.translationMemory(),
+            workers=int(self.env["translation_workers"]),
+            file_workers=int(self.env["automake_workers"]),
+            excludes_ext=self.env["excludes_ext"],
+            backend=self.translationBackend(),
+        )
+        print_coloured(
+            f"Translated {results['translated']} decks, {results['lines']} lines in "
+            f"{results['seconds']}s ({results['lines_per_second']} lines/s), "
+            f"{results['skipped']} already done, {results['failed']} failed",
+            color="red" if results["failed"] else "green",
+        )
+
+    def do_render(self, line: str):
+        """
+        render deck_name outdir
+        writes the spoken question and answer of every card in the deck to outdir,
+        one numbered mp3 per card, the whole deck as deck_name.mp3 and deck_name.m3u
+        """
+        args: list = line.split()
+        if len(args) != 2:
+            print_coloured("render deck_name outdir", color="red")
+            return None
+        deck, outdir = args
+        filelist, working_dir_files = self.decks()
+        path: Optional[str] = filelist.get(deck) or working_dir_files.get(deck)
+        if path is None:
+            print_coloured(f"{deck} Not Recognized", color="red")
+            return None
+        results: dict = renderDeck(
+            compileDeck(path, self.env["delimiter"]),
+            outdir,
+            self.env["languages"],
+            self.audioCache(),
+            int(self.env["render_workers"]),
+            os.path.basename(deck),
+        )
+        print_coloured(
+            f"Rendered {results['cards']} cards ({results['clips']} clips) to {outdir} "
+            f"in {results['seconds']}s, {results['cards_per_second']} cards/s",
+            color="cyan",
+        )
+
+    def do_cache(self, line: str):
+        """
+        cache stats | shows the size and hit rate of the audio cache
+        cache clear | removes every cached clip
+        cache prune | evicts least recently used clips until under audio_cache_size MB
+        cache pcm [clear] | shows or empties the store of decoded clips, see pcm_store
+        """
+        cache: AudioCache = self.audioCache()
+        if line.startswith("pcm") and not self.env["pcm_store"]:
+            print_coloured("The pcm store is off, set pcm_store on", color="yellow")
+        elif line == "pcm":
+            for name, value in self.pcmStore().stats().items():
+                print_coloured(name, end=" : ", color="green")
+                print_coloured(value, end="\n", color="cyan")
+        elif line == "pcm clear":
+            print_coloured(f"Removed {self.pcmStore().clear()} clips", color="cyan")
+        elif line == "stats":
+            for name, value in cache.stats().items():
+                print_coloured(name, end=" : ", color="green")
+                print_coloured(value, end="\n", color="cyan")
+        elif line == "clear":
+            print_coloured(f"Removed {cache.clear()} clips", color="cyan")
+        elif line == "prune":
+            print_coloured(f"Removed {cache.prune()} clips", color="cyan")
+        else:
+            print_coloured("cache stats|clear|prune|pcm [clear]", color="red")
+
+    def do_profile(self, line: str):
+        """
+        profile on|off | starts or stops timing deck listing and parsing, speech, playback and translation
+        profile report | shows the latency of each stage timed so far, slowest first
+        profile export [file] | appends the report as a JSON line to file, default metrics_file
+        profile reset | forgets every timing
+        """
+        args: list = line.split()
+        command: str = args[0].lower() if args else ""
+        if command in ("on", "true"):
+            PROFILER.enabled = True
+        elif command in ("off", "false"):
+            PROFILER.enabled = False
+        elif command == "report" and not PROFILER.stages:
+            print_coloured("Nothing has been profiled yet", color="yellow")
+        elif command == "report":
+            for timings in PROFILER.report():
+                print_coloured(timings.pop("stage"), end=" : ", color="green")
+                print_coloured(
+                    " ".join(f"{name}={value}" for name, value in timings.items()),
+                    end="\n",
+                    color="cyan",
+                )
+        elif command == "export":
+            path: str = args[1] if len(args) > 1 else self.env["metrics_file"]
+            PROFILER.export(path)
+            print_coloured(f"Wrote metrics to {path}", color="green")
+        elif command == "reset":
+            PROFILER.reset()
+        else:
+            print_coloured("profile on|off|report|export [file]|reset", color="red")
+
     def do_exit(self, line):
         """terminates the program"""
         sys.exit(0)
 
 
+def scriptedAnswers(answers: Iterator[str]) -> Callable:
+    """returns a read() for runSession that takes answers from an iterator, "" once it runs out"""
+
+    async def read(text: str) -> str:
+        return next(answers, "").rstrip("\n")
+
+    return read
+
+
+def runBatch(argv: list) -> int:
+    """
+    python3 script.py run DECK --answers FILE [--json] [--repeat N] [--seed N]
+
+    Runs DECK without any interaction, taking the answers one per line from FILE
+    ("-" for stdin). With --json every card is written to stdout as a JSON line
+    followed by a summary line per session, the transcript of the session is not
+    shown. Scores and errors are neither logged nor tracked.
+    """
+    global COLOUR
+    parser = argparse.ArgumentParser(
+        prog="script.py run", description="runs a deck from scripted answers"
+    )
+    parser.add_argument("deck", help="deck file, or a deck in the working directory")
+    parser.add_argument("--answers", required=True, help='answers file, "-" for stdin')
+    parser.add_argument("--json", action="store_true", help="emit JSON lines")
+    parser.add_argument("--repeat", type=int, default=1, help="sessions to run")
+    parser.add_argument("--seed", type=int, help="seed the card order")
+    parser.add_argument("--config", help="environment to load, see save")
+    args = parser.parse_args(argv)
+
+    command: CommandLine = CommandLine()
+    if args.config:
+        command.do_load(args.config)
+    path: Optional[str] = (
+        args.deck if os.path.isfile(args.deck) else command.decks()[1].get(args.deck)
+    )
+    if path is None:
+        parser.error(f"{args.deck} Not Recognized")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    answers = sys.stdin if args.answers == "-" else open(args.answers)
+    output = sys.stdout
+    transcript = open(os.devnull, "w") if args.json else sys.stdout
+
+    def report(record: dict):
+        if args.json:
+            output.write(json.dumps(dict(type="card", **record), ensure_ascii=False))
+            output.write("\n")
+
+    # the transcript is plain text for as long as the batch runs
+    colour, COLOUR = COLOUR, False
+    try:
+        for session in range(args.repeat):
+            started: float = time.perf_counter()
+            with redirect_stdout(transcript):
+                correct, total, _ = Test(
+                    compileDeck(path, command.env["delimiter"]),
+                    command.env["delimiter"],
+                    command.env["languages"],
+                    audio=False,
+                    read=scriptedAnswers(answers),
+                    report=report,
+                    typos=int(command.env["typos"]),
+                )
+            summary: dict = dict(
+                type="summary",
+                session=session + 1,
+                deck=args.deck,
+                correct=correct,
+                total=total,
+                percent=round((100 / total) * correct) if total else 0,
+                seconds=round(time.perf_counter() - started, 6),
+            )
+            if args.json:
+                output.write(json.dumps(summary, ensure_ascii=False) + "\n")
+            else:
+                output.write(
+                    f"{args.deck} {correct}/{total} {summary['percent']}%"
+                    f" in {summary['seconds']}s\n"
+                )
+    finally:
+        COLOUR = colour
+        if answers is not sys.stdin:
+            answers.close()
+        if transcript is not sys.stdout:
+            transcript.close()
+    return 0
+
+
+WEBSOCKET_GUID: str = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE: int = 2**16
+USER_NAME = re.compile(r"^[\w-]{1,64}$")
+
+
+def websocketAccept(key: str) -> str:
+    """the Sec-WebSocket-Accept header for a Sec-WebSocket-Key"""
+    digest: bytes = hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def unmask(payload: bytes, mask: bytes) -> bytes:
+    """xors a client frame with its 4 byte mask, as one big integer rather than byte by byte"""
+    repeated: bytes = (mask * (len(payload) // 4 + 1))[: len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(
+        len(payload), "big"
+    )
+
+
+class WebSocket:
+    """the server end of a websocket (RFC 6455) carrying text messages"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.closed: bool = False
+
+    async def frame(self, opcode: int, payload: bytes = b""):
+        length: int = len(payload)
+        if length < 126:
+            header: bytes = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 2**16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        self.writer.write(header + payload)
+        await self.writer.drain()
+
+    async def send(self, message: dict):
+        """sends message as a JSON text frame"""
+        await self.frame(0x1, json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+    async def receive(self) -> Optional[str]:
+        """the next text message, None once the connection has been closed"""
+        message: bytearray = bytearray()
+        try:
+            while not self.closed:
+                head: bytes = await self.reader.readexactly(2)
+                opcode: int = head[0] & 0x0F
+                length: int = head[1] & 0x7F
+                if length == 126:
+                    (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+                elif length == 127:
+                    (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+                if len(message) + length > MAX_MESSAGE:
+                    await self.close(1009)
+                    return None
+                mask: bytes = (
+                    await self.reader.readexactly(4) if head[1] & 0x80 else b""
+                )
+                payload: bytes = await self.reader.readexactly(length)
+                if mask:
+                    payload = unmask(payload, mask)
+                if opcode == 0x8:
+                    await self.close()
+                    return None
+                elif opcode == 0x9:
+                    await self.frame(0xA, payload)
+                elif opcode in (0x0, 0x1):
+                    message += payload
+                    if head[0] & 0x80:
+                        return message.decode("utf-8", errors="replace")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.closed = True
+        return None
+
+    async def close(self, code: int = 1000):
+        if not self.closed:
+            self.closed = True
+            try:
+                await self.frame(0x8, struct.pack("!H", code))
+            except ConnectionError:
+                pass
+
+
+async def readRequest(reader: asyncio.StreamReader) -> Optional[tuple]:
+    """reads an HTTP request head, returns (method, path, query, headers) or None if there is none"""
+    line: bytes = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers: dict = {}
+    for _ in range(100):
+        header: bytes = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    url = urllib.parse.urlsplit(target)
+    return (method, url.path, dict(urllib.parse.parse_qsl(url.query)), headers)
+
+
+async def writeResponse(
+    writer: asyncio.StreamWriter,
+    status: str,
+    body: Union[bytes, dict, list],
+    content_type: str = "application/json",
+):
+    if not isinstance(body, bytes):
+        body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+
+
+class QuizServer:
+    """
+    Runs quiz sessions for many learners in one process
+
+        GET /decks                      the decks in the working directory
+        GET /audio?text=..&lang=..      the mp3 of a clip of a deck served so far
+        GET /session?user=..&deck=..    a websocket running a session of deck for user,
+                                        the error deck is the user's own
+
+    A session sends each card as {"type": "question"}, takes every text message as an
+    answer, replies {"type": "wrong"} while another attempt is allowed, then
+    {"type": "result"} and once every card is answered {"type": "summary"}, the
+    cards are asked and graded by runSession as they are in the terminal.
+    Every session shares the one DeckIndex, the decks parsed so far and the AudioCache
+    so a deck is read and a clip synthesized once however many learners use it,
+    each user's scores and errors are kept apart under users_dir/user.
+    """
+
+    def __init__(self, command: CommandLine, users_dir: str = "users"):
+        self.command: CommandLine = command
+        self.env: dict = command.env
+        self.users_dir: str = users_dir
+        self.cards: dict = {}
+        # the (text, language) of every clip in the decks served, /audio only speaks these
+        self.voices: dict = {}
+        self.sessions: int = 0
+        self.stores: dict = {}
+        # scores and errors are written on one thread, so each ScoreStore stays on it
+        self.writer: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="scores"
+        )
+
+    def errorFile(self, user: str) -> str:
+        return os.path.join(
+            self.users_dir, user, os.path.basename(self.env["error_file"])
+        )
+
+    async def deck(self, name: str, user: str = "") -> Optional[list]:
+        """
+        the Cards of a deck in the working directory, or of the error deck of user,
+        parsed again only once it changes, None if there is no such deck
+        """
+        loop = asyncio.get_running_loop()
+        errors: bool = bool(user) and name == os.path.basename(self.env["error_file"])
+        if errors:
+            path: Optional[str] = self.errorFile(user)
+            if not os.path.exists(path):
+                # the user has not missed anything yet
+                return None
+        else:
+            path = self.command.decks()[1].get(name)
+        if path is None:
+            return None
+        try:
+            if errors:
+                # the cards answered since are taken out first, as running it in the terminal does
+                await loop.run_in_executor(self.writer, errorJournal(path).compact)
+            stat = os.stat(path)
+            fingerprint: tuple = (stat.st_mtime_ns, stat.st_size)
+            if self.cards.get(path, (None,))[0] != fingerprint:
+                cards: list = await loop.run_in_executor(
+                    None, compileDeck, path, self.env["delimiter"]
+                )
+                self.cards[path] = (fingerprint, cards)
+                self.voices[path] = {
+                    (text, self.env["languages"][key])
+                    for card in cards
+                    for text, key in (card.question_voice, card.answer_voice)
+                    if text and key in self.env["languages"]
+                }
+        except OSError:
+            # removed or unreadable since the decks were listed
+            return None
+        return list(self.cards[path][1])
+
+    def audioUrl(self, voice: tuple) -> Optional[str]:
+        text, key = voice
+        lang: Optional[str] = self.env["languages"].get(key)
+        if not self.env["audio"] or not text or lang is None:
+            return None
+        return "/audio?" + urllib.parse.urlencode(dict(text=text, lang=lang))
+
+    def record(self, user: str, deck: str, correct: int, total: int, failed: set):
+        """
+        logs the score of a session and tracks its errors in the directory of user,
+        as in the terminal a session of the error deck is not logged and takes out
+        the cards that were answered correctly
+        """
+        directory: str = os.path.join(self.users_dir, user)
+        os.makedirs(directory, exist_ok=True)
+        if user not in self.stores:
+            self.stores[user] = ScoreStore(os.path.join(directory, "scores.db"))
+        error_file: str = self.errorFile(user)
+        if deck == os.path.basename(error_file):
+            deck = error_file
+        with StorageWriter() as writer:
+            if total > 0 and deck != error_file:
+                writeLog(
+                    deck,
+                    correct,
+                    total,
+                    os.path.join(directory, os.path.basename(self.env["log_file"])),
+                    True,
+                    self.stores[user],
+                    writer,
+                    echo=False,
+                )
+            writeErrorsToFile(deck, error_file, failed, writer, echo=False)
+
+    async def quiz(self, socket: WebSocket, cards: list, user: str, deck: str):
+        """runs a session of cards over socket with runSession, see QuizServer"""
+        random.shuffle(cards)
+        number: int = 0
+        attempts: int = 0
+
+        async def read(text: str) -> str:
+            nonlocal attempts
+            if attempts == 0:
+                card: Card = cards[number]
+                await socket.send(
+                    dict(
+                        type="question",
+                        card=number + 1,
+                        of=len(cards),
+                        question=card.question,
+                        audio=self.audioUrl(card.question_voice),
+                    )
+                )
+            else:
+                await socket.send(dict(type="wrong", attempts=attempts))
+            attempts += 1
+            user_input: Optional[str] = await socket.receive()
+            if user_input is None:
+                raise ConnectionResetError("the learner left part way")
+            return user_input
+
+        async def report(record: dict):
+            nonlocal number, attempts
+            card: Card = cards[number]
+            number, attempts = number + 1, 0
+            await socket.send(
+                dict(
+                    type="result",
+                    correct=record["correct"],
+                    answer=card.answer,
+                    audio=self.audioUrl(card.answer_voice),
+                )
+            )
+
+        try:
+            score, total, failed = await runSession(
+                cards,
+                self.env["delimiter"],
+                self.env["languages"],
+                audio=False,
+                read=read,
+                report=report,
+                typos=int(self.env["typos"]),
+                shuffle=False,
+                echo=False,
+            )
+        except ConnectionResetError:
+            # the learner left part way, nothing is scored
+            return None
+        await asyncio.get_running_loop().run_in_executor(
+            self.writer, self.record, user, deck, score, total, failed
+        )
+        await socket.send(
+            dict(
+                type="summary",
+                correct=score,
+                total=total,
+                percent=round((100 / total) * score) if total else 0,
+            )
+        )
+
+    async def session(self, reader, writer, query: dict, headers: dict):
+        user: str = query.get("user", "")
+        key: str = headers.get("sec-websocket-key", "")
+        if not USER_NAME.match(user) or not key:
+            return await writeResponse(writer, "400 Bad Request", dict(error="user"))
+        cards: Optional[list] = await self.deck(query.get("deck", ""), user)
+        if cards is None:
+            return await writeResponse(writer, "404 Not Found", dict(error="deck"))
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Accept: {websocketAccept(key)}\r\n\r\n".encode(
+                "latin-1"
+            )
+        )
+        socket: WebSocket = WebSocket(reader, writer)
+        self.sessions += 1
+        try:
+            await self.quiz(socket, cards, user, query["deck"])
+        finally:
+            self.sessions -= 1
+            await socket.close()
+
+    async def audio(self, writer, query: dict):
+        text: str = query.get("text", "")
+        lang: str = query.get("lang", "")
+        if not text or lang not in self.env["languages"].values():
+            return await writeResponse(writer, "400 Bad Request", dict(error="lang"))
+        if not any((text, lang) in voices for voices in self.voices.values()):
+            # only the clips of the decks served are synthesized
+            return await writeResponse(writer, "404 Not Found", dict(error="text"))
+        loop = asyncio.get_running_loop()
+        try:
+            path: str = await loop.run_in_executor(
+                None, self.command.audioCache().fetch, text, lang
+            )
+            with open(path, "rb") as clip:
+                data: bytes = clip.read()
+        except Exception as e:
+            return await writeResponse(writer, "502 Bad Gateway", dict(error=str(e)))
+        await writeResponse(writer, "200 OK", data, "audio/mpeg")
+
+    async def handle(self, reader, writer):
+        try:
+            request: Optional[tuple] = await readRequest(reader)
+            if request is None:
+                return None
+            method, path, query, headers = request
+            if method != "GET":
+                await writeResponse(
+                    writer, "405 Method Not Allowed", dict(error=method)
+                )
+            elif path == "/session":
+                await self.session(reader, writer, query, headers)
+            elif path == "/decks":
+                await writeResponse(
+                    writer, "200 OK", list(self.command.decks()[1].decks)
+                )
+            elif path == "/audio":
+                await self.audio(writer, query)
+            elif path == "/":
+                await writeResponse(
+                    writer,
+                    "200 OK",
+                    dict(sessions=self.sessions, decks_parsed=len(self.cards)),
+                )
+            else:
+                await writeResponse(writer, "404 Not Found", dict(error=path))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765):
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        for store in self.stores.values():
+            self.writer.submit(store.close)
+        self.writer.shutdown()
+
+
+def runServer(argv: list) -> int:
+    """
+    python3 script.py serve [--host HOST] [--port PORT] [--users DIR] [--config FILE]
+
+    Serves quiz sessions over HTTP and websockets, see QuizServer
+    """
+    global COLOUR
+    parser = argparse.ArgumentParser(
+        prog="script.py serve", description="serves quiz sessions to many learners"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", default="users", help="directory of user scores")
+    parser.add_argument("--config", help="environment to load, see save")
+    args = parser.parse_args(argv)
+
+    command: CommandLine = CommandLine()
+    if args.config:
+        command.do_load(args.config)
+    COLOUR = False
+    server: QuizServer = QuizServer(command, args.users)
+
+    async def serve():
+        listening = await server.start(args.host, args.port)
+        print(f"Serving {command.env['working_dir']} on http://{args.host}:{args.port}")
+        async with listening:
+            await listening.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["run"]:
+        sys.exit(runBatch(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        sys.exit(runServer(sys.argv[2:]))
     CommandLine().cmdloop()
-# TODO: Next step is to allow code access to sub directories so that there is no need to run this script from each sub directory and so that all errors and scores get added to one place instead of the sub directory equivalent
@@ -0,0 +1,98 @@
+import pytest
+import script
+
+
+class TestNormalizeAnswer:
+    @pytest.mark.parametrize(
+        "text, normalized",
+        [
+            ("ты говоришь!", "тыговоришь"),
+            ("Ты говори́шь", "тыговоришь"),
+            ("ёлка", "елка"),
+            ("мой", "мой"),
+            ("R:To speak", "tospeak"),
+            ("Café, s'il vous plaît", "cafesilvousplait"),
+        ],
+    )
+    def test_normalize(self, text, normalized):
+        assert script.normalizeAnswer(text) == normalized
+
+
+class TestAnswerKey:
+    def test_alternatives_are_accepted(self):
+        assert script.answerKey("говорить/сказать; болтать") == (
+            "говорить",
+            "сказать",
+            "болтать",
+        )
+
+    def test_brackets_are_optional(self):
+        assert set(script.answerKey("говорить (impf)")) == {
+            "говорить",
+            "говоритьimpf",
+        }
+
+    def test_punctuation_only_answer_keeps_a_key(self):
+        assert script.answerKey("?") == ("",)
+
+
+class TestWithinDistance:
+    @pytest.mark.parametrize(
+        "a, b, limit, expected",
+        [
+            ("говорить", "говорить", 0, True),
+            ("говорит", "говорить", 1, True),
+            ("говоритт", "говорить", 1, True),
+            ("гаварить", "говорить", 1, False),
+            ("гаварить", "говорить", 2, True),
+            ("abc", "abcdef", 2, False),
+            ("", "a", 1, True),
+        ],
+    )
+    def test_distance(self, a, b, limit, expected):
+        assert script.withinDistance(a, b, limit) is expected
+
+
+class TestRespond:
+    def test_punctuation_and_stress_are_ignored(self, capsys):
+        key = script.answerKey("ты говори́шь!")
+        assert script.respond("Ты говоришь", "ты говори́шь!", key, 0) is True
+
+    def test_typo_is_corrected_when_allowed(self, capsys):
+        key = script.answerKey("говорить")
+        assert script.respond("говорит", "говорить", key, 0) is None
+        assert script.respond("говорит", "говорить", key, 0, typos=1) is True
+        assert "говорить" in capsys.readouterr().out
+
+    def test_short_answers_must_be_exact(self, capsys):
+        key = script.answerKey("да")
+        assert script.respond("до", "да", key, 0, typos=2) is None
+
+    def test_show_is_not_a_typo(self, capsys):
+        key = script.answerKey("snow")
+        assert script.respond("show", "snow", key, 0, typos=1) is False
+
+    def test_nothing_is_printed_without_echo(self, capsys):
+        key = script.answerKey("говорить")
+        assert script.respond("нет", "говорить", key, 3, echo=False) is False
+        assert capsys.readouterr().out == ""
+
+
+class TestCheckAnswer:
+    @pytest.mark.parametrize(
+        "user_input, expected",
+        [
+            ("говорить", script.Match.EXACT),
+            ("говорит", script.Match.TYPO),
+            ("читать", script.Match.WRONG),
+            ("", script.Match.WRONG),
+        ],
+    )
+    def test_match(self, user_input, expected):
+        key = script.answerKey("говорить")
+        assert script.checkAnswer(user_input, key, typos=1) is expected
+
+    def test_typos_are_off_by_default(self):
+        assert script.CommandLine().env["typos"] == 0
+        key = script.answerKey("говоря")
+        assert script.checkAnswer("говорю", key) is script.Match.WRONG
@@ -0,0 +1,117 @@
+import os
+import time
+import pytest
+import google_speech
+import script
+
+languages = {"E": "en", "R": "ru"}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    synthesized = []
+
+    def synthesize(text, lang):
+        synthesized.append((text, lang))
+        return f"{lang}:{text}".encode("utf-8")
+
+    monkeypatch.setattr(script, "synthesize", synthesize)
+    cache = script.AudioCache(str(tmp_path), max_size=64)
+    cache.synthesized = synthesized
+    return cache
+
+
+class TestAudioCache:
+    def test_fetch_synthesizes_on_miss(self, cache):
+        path = cache.fetch("привет", "ru")
+        assert open(path, "rb").read() == "ru:привет".encode("utf-8")
+        assert cache.synthesized == [("привет", "ru")]
+
+    def test_fetch_reuses_cached_clip(self, cache):
+        first = cache.fetch("hello", "en")
+        second = cache.fetch("hello", "en")
+        assert first == second
+        assert len(cache.synthesized) == 1
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_key_includes_language(self, cache):
+        assert cache.path("da", "ru") != cache.path("da", "en")
+
+    def test_least_recently_used_is_evicted(self, cache):
+        old = cache.put("old", "en", b"x" * 30)
+        os.utime(old, (time.time() - 100, time.time() - 100))
+        new = cache.put("new", "en", b"x" * 30)
+        cache.put("newest", "en", b"x" * 30)
+        assert not os.path.exists(old)
+        assert os.path.exists(new)
+        assert cache.size() <= cache.max_size
+
+    def test_overwriting_a_clip_counts_its_size_once(self, cache):
+        cache.put("same", "en", b"x" * 30)
+        cache.put("same", "en", b"x" * 20)
+        assert cache.size() == 20
+        cache.put("other", "en", b"x" * 40)
+        assert os.path.exists(cache.path("same", "en"))
+
+    def test_directory_is_made_on_first_put(self, tmp_path):
+        cache = script.AudioCache(str(tmp_path / "audio"))
+        assert not os.path.exists(cache.directory)
+        assert cache.get("hello", "en") is None
+        assert cache.prune() == 0 and cache.stats()["entries"] == 0
+        cache.put("hello", "en", b"1")
+        assert cache.get("hello", "en") == cache.path("hello", "en")
+
+    def test_clear_removes_everything(self, cache):
+        cache.put("one", "en", b"1")
+        cache.put("two", "en", b"2")
+        assert cache.clear() == 2
+        assert cache.stats()["entries"] == 0
+
+
+class TestCachedSpeak:
+    def test_speak_returns_cached_speech(self, cache):
+        verbal_question, verbal_answer = script.speak(
+            "R:To speak", "говорить", languages, True, cache
+        )
+        assert isinstance(verbal_question, google_speech.Speech)
+        assert verbal_question.cache is cache
+        assert verbal_answer.lang == "ru"
+
+    def test_play_uses_cached_file(self, cache, monkeypatch):
+        played = []
+        monkeypatch.setattr(script, "playAudioFile", played.append)
+        verbal_question, verbal_answer = script.speak(
+            "R:To speak", "говорить", languages, True, cache
+        )
+        verbal_answer.play()
+        verbal_answer.play()
+        assert played == [cache.path("говорить", "ru")] * 2
+        assert cache.synthesized == [("говорить", "ru")]
+
+
+class TestAudioPrefetcher:
+    def test_ahead_synthesizes_next_cards(self, cache):
+        verbal_cues = [
+            script.speak(f"R:word{i}", f"слово{i}", languages, True, cache)
+            for i in range(5)
+        ]
+        with script.AudioPrefetcher(cache, depth=2) as prefetcher:
+            prefetcher.ahead(verbal_cues, 0)
+            for future in list(prefetcher.futures.values()):
+                future.result()
+        assert sorted(cache.synthesized) == sorted(
+            [(f"word{i}", "en") for i in range(3)]
+            + [(f"слово{i}", "ru") for i in range(3)]
+        )
+
+    def test_no_prefetch_without_cache(self):
+        prefetcher = script.AudioPrefetcher(None, depth=3)
+        assert prefetcher.submit(script.speak("a", "b", languages, True)[0]) is None
+        prefetcher.close()
+
+    def test_prefetched_clip_is_not_synthesized_again(self, cache, monkeypatch):
+        monkeypatch.setattr(script, "soxCommand", lambda path: ["true"])
+        monkeypatch.setattr("builtins.input", lambda _: "E:answer")
+        lines = ["E:answer#question", "E:answer1#question1"]
+        script.Test(lines, "#", {"E": "en"}, True, cache, prefetch=2)
+        assert len(cache.synthesized) == len(set(cache.synthesized))
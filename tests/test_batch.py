@@ -0,0 +1,72 @@
+import json
+import pytest
+import script
+
+
+@pytest.fixture
+def deck(tmp_path):
+    path = tmp_path / "wine"
+    path.write_text("R:Wine#вино\nR:Wine#вина\n")
+    return str(path)
+
+
+@pytest.fixture
+def answers(tmp_path):
+    path = tmp_path / "answers"
+    path.write_text("R:Wine\n" * 4)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def colour(monkeypatch):
+    monkeypatch.setattr(script, "COLOUR", True)
+
+
+def records(out):
+    return [json.loads(line) for line in out.splitlines()]
+
+
+class TestRunBatch:
+    def test_json_lines_per_card_and_summary(self, deck, answers, capsys):
+        assert script.runBatch([deck, "--answers", answers, "--json"]) == 0
+        lines = records(capsys.readouterr().out)
+        assert [line["type"] for line in lines] == ["card", "card", "summary"]
+        assert all("seconds" in line and "attempts" in line for line in lines[:2])
+        assert lines[2]["correct"] == 2
+
+    def test_scripted_answers_are_scored(self, deck, answers, capsys):
+        script.runBatch([deck, "--answers", answers, "--json", "--repeat", "2"])
+        lines = records(capsys.readouterr().out)
+        summaries = [line for line in lines if line["type"] == "summary"]
+        assert [s["total"] for s in summaries] == [2, 2]
+        assert len([line for line in lines if line["type"] == "card"]) == 4
+
+    def test_running_out_of_answers_fails_the_card(self, deck, tmp_path, capsys):
+        empty = tmp_path / "empty"
+        empty.write_text("")
+        script.runBatch([deck, "--answers", str(empty), "--json"])
+        lines = records(capsys.readouterr().out)
+        assert lines[-1]["correct"] == 0
+        assert lines[0]["attempts"] == 4
+
+    def test_json_output_has_no_transcript(self, deck, answers, capsys):
+        script.runBatch([deck, "--answers", answers, "--json"])
+        assert "QUESTION" not in capsys.readouterr().out
+
+    def test_plain_output_is_not_coloured(self, deck, answers, capsys):
+        script.runBatch([deck, "--answers", answers])
+        out = capsys.readouterr().out
+        assert "\x1b[" not in out
+        assert out.splitlines()[-1].startswith(f"{deck} ")
+
+    def test_colour_is_restored_afterwards(self, deck, answers, monkeypatch):
+        script.runBatch([deck, "--answers", answers])
+        assert script.COLOUR is True
+        monkeypatch.setattr(script, "Test", lambda *args, **kwargs: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            script.runBatch([deck, "--answers", answers])
+        assert script.COLOUR is True
+
+    def test_unknown_deck_is_an_error(self, answers):
+        with pytest.raises(SystemExit):
+            script.runBatch(["not_a_deck", "--answers", answers])
@@ -0,0 +1,76 @@
+import os
+import pytest
+import script
+
+deck = "R:To speak#говорить\nговорить#R:To speak\nnot a card\n"
+
+
+@pytest.fixture
+def deck_file(tmp_path):
+    path = tmp_path / "verbs"
+    path.write_text(deck)
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "compiled")
+
+
+class TestParseLines:
+    def test_lines_without_delimiter_are_skipped(self):
+        assert len(script.parseLines(deck.splitlines(True), "#")) == 2
+
+    def test_card_voices_match_speak(self):
+        card = script.parseLines(["R:To speak#говорить\n"], "#")[0]
+        assert card.question == "говорить"
+        assert card.answer == "R:To speak"
+        assert card.question_voice == ("говорить", "R")
+        assert card.answer_voice == ("To speak", "E")
+        assert card.key == ("tospeak",)
+
+    def test_card_keeps_original_line(self):
+        card = script.parseLines(["R:To speak#говорить\n"], "#")[0]
+        assert card.line == "R:To speak#говорить\n"
+
+
+class TestCompileDeck:
+    def test_compiled_deck_matches_parsed_lines(self, deck_file, cache_dir):
+        cards = script.compileDeck(str(deck_file), "#", cache_dir)
+        assert cards == script.parseLines(deck.splitlines(True), "#")
+
+    def test_unchanged_deck_is_not_parsed_again(
+        self, deck_file, cache_dir, monkeypatch
+    ):
+        script.compileDeck(str(deck_file), "#", cache_dir)
+        monkeypatch.setattr(
+            script, "parseLines", lambda *args: pytest.fail("parsed again")
+        )
+        assert len(script.compileDeck(str(deck_file), "#", cache_dir)) == 2
+
+    def test_changed_deck_is_parsed_again(self, deck_file, cache_dir):
+        script.compileDeck(str(deck_file), "#", cache_dir)
+        deck_file.write_text(deck + "R:Wine#вино\n")
+        assert len(script.compileDeck(str(deck_file), "#", cache_dir)) == 3
+
+    def test_touched_deck_with_same_content_is_reused(
+        self, deck_file, cache_dir, monkeypatch
+    ):
+        script.compileDeck(str(deck_file), "#", cache_dir)
+        stat = os.stat(deck_file)
+        os.utime(deck_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        monkeypatch.setattr(
+            script, "parseLines", lambda *args: pytest.fail("parsed again")
+        )
+        assert len(script.compileDeck(str(deck_file), "#", cache_dir)) == 2
+
+    def test_delimiter_is_part_of_the_cache_key(self, deck_file, cache_dir):
+        script.compileDeck(str(deck_file), "#", cache_dir)
+        assert script.compileDeck(str(deck_file), "|", cache_dir) == []
+
+    def test_compiled_cards_can_be_tested(self, deck_file, cache_dir, monkeypatch):
+        monkeypatch.setattr("builtins.input", lambda _: "говорить")
+        cards = script.compileDeck(str(deck_file), "#", cache_dir)
+        correct, total, failed = script.Test(cards, "#", {"E": "en"}, audio=False)
+        assert (correct, total) == (1, 2)
+        assert failed == {"R:To speak#говорить\n"}
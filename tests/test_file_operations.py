@@ -76,3 +76,63 @@ class Test_getRandomSelection:
     def test_getRandomSelection_returns_list(self, files):
         getRandomSelection = script.getRandomSelection(files[0], files[1], ".")
         assert isinstance(getRandomSelection, list)
+
+
+class TestDeckIndex:
+    def test_index_contains_decks_in_sub_directories(self, tmp_path):
+        (tmp_path / "P1").mkdir()
+        (tmp_path / "P1" / "verbs").write_text("R:To speak#говорить\n")
+        (tmp_path / "nouns").write_text("R:Wine#вино\n")
+        index = script.DeckIndex(str(tmp_path), [], [".py"])
+        assert os.path.join("P1", "verbs") in index
+        assert "nouns" in index
+        assert index.get("nouns") == str(tmp_path / "nouns")
+
+    def test_index_skips_excludes_and_hidden_directories(self, tmp_path):
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".git" / "HEAD").write_text("")
+        (tmp_path / "script.py").write_text("")
+        (tmp_path / "test.ini").write_text("")
+        index = script.DeckIndex(str(tmp_path), ["test.ini"], [".py"])
+        assert len(index) == 0
+
+    def test_index_refreshes_when_a_directory_changes(self, tmp_path):
+        (tmp_path / "P1").mkdir()
+        index = script.deckIndex(str(tmp_path), [], [])
+        assert len(index) == 0
+        (tmp_path / "P1" / "verbs").write_text("R:To speak#говорить\n")
+        assert script.deckIndex(str(tmp_path), [], []) is index
+        assert os.path.join("P1", "verbs") in index
+
+    def test_index_is_not_rebuilt_when_unchanged(self, tmp_path, monkeypatch):
+        (tmp_path / "nouns").write_text("R:Wine#вино\n")
+        index = script.deckIndex(str(tmp_path), [], [])
+        monkeypatch.setattr(index, "build", lambda: pytest.fail("rebuilt"))
+        assert script.deckIndex(str(tmp_path), [], []) is index
+
+    def test_getFile_reads_deck_from_sub_directory(self, tmp_path):
+        (tmp_path / "P1").mkdir()
+        (tmp_path / "P1" / "verbs").write_text("R:To speak#говорить\n")
+        index = script.DeckIndex(str(tmp_path), [], [])
+        deck = os.path.join("P1", "verbs")
+        assert script.getFile(deck, {}, index, str(tmp_path)) == [
+            "R:To speak#говорить\n"
+        ]
+
+
+class TestCommandLineDecks:
+    def test_own_files_are_not_decks(self, tmp_path, monkeypatch):
+        (tmp_path / "verbs").write_text("R:To speak#говорить\n")
+        monkeypatch.chdir(tmp_path)
+        command = script.CommandLine()
+        command.env["working_dir"] = "."
+        command.scoreStore().close()
+        script.ReviewStore(command.env["review_db"]).close()
+        (tmp_path / "scores.log").write_text("\n01/01/2024 10:00 verbs 1/1 100%")
+        (tmp_path / "_Errors").write_text("R:To speak#говорить\n")
+        filelist, working_dir_files = command.decks()
+        assert list(filelist.decks) == list(working_dir_files.decks) == ["verbs"]
+        cache_dir = str(tmp_path / "cache")
+        assert script.getRandomSelection(
+            filelist, list(working_dir_files.decks), ".", 5, "#", cache_dir
+        ) == ["R:To speak#говорить\n"]
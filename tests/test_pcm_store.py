@@ -0,0 +1,175 @@
+import os
+import pytest
+import script
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    calls = []
+
+    def decodeClip(path):
+        calls.append(path)
+        with open(path, "rb") as f:
+            return f.read().upper()
+
+    monkeypatch.setattr(script, "decodeClip", decodeClip)
+    return calls
+
+
+@pytest.fixture
+def clips(tmp_path):
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"clip{number}.mp3"
+        path.write_bytes(f"clip{number};".encode("utf-8"))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = script.PcmStore(str(tmp_path / "pcm"), max_size=2**20)
+    yield store
+    store.close()
+
+
+class TestPcmStore:
+    def test_samples_round_trip(self, store):
+        store.put("a", b"\x01\x02" * 100)
+        store.put("b", b"\x03\x04")
+        assert store.get("a") == b"\x01\x02" * 100
+        assert store.get("b") == b"\x03\x04"
+        assert store.get("c") is None
+        assert (store.hits, store.misses) == (2, 1)
+
+    def test_clips_are_decoded_once(self, store, clips, decoded):
+        assert store.fetch(clips[0]) == b"CLIP0;"
+        assert store.fetch(clips[0]) == b"CLIP0;"
+        assert decoded == [clips[0]]
+
+    def test_least_recently_used_clips_are_evicted(self, tmp_path, monkeypatch):
+        store = script.PcmStore(str(tmp_path / "pcm"), max_size=10)
+        now = iter(range(100))
+        monkeypatch.setattr(script.time, "time", lambda: next(now))
+        store.put("a", b"aaaa")
+        store.put("b", b"bbbb")
+        store.get("a")
+        store.put("c", b"cccc")
+        assert store.get("b") is None
+        assert store.get("a") == b"aaaa"
+        assert store.get("c") == b"cccc"
+        assert store.evicted == 1
+        store.close()
+
+    def test_dead_space_is_compacted(self, tmp_path):
+        store = script.PcmStore(str(tmp_path / "pcm"), max_size=8)
+        for name in "abcdef":
+            store.put(name, name.encode("utf-8") * 4)
+        assert store.size() <= 8
+        data = store.dataPath(store.generation)
+        assert os.path.getsize(data) <= 2 * store.size()
+        assert [p for p in os.listdir(tmp_path / "pcm") if p.endswith(".pcm")] == [
+            os.path.basename(data)
+        ]
+        assert store.get("f") == b"ffff"
+        store.close()
+
+    def test_other_processes_see_new_clips(self, store):
+        other = script.PcmStore(store.directory, store.max_size)
+        assert other.get("a") is None
+        store.put("a", b"samples")
+        assert other.get("a") == b"samples"
+        other.clear()
+        assert store.get("a") is None
+        other.close()
+
+    def test_index_survives_a_restart(self, store):
+        store.put("a", b"samples")
+        store.close()
+        reopened = script.PcmStore(store.directory, store.max_size)
+        assert reopened.get("a") == b"samples"
+        assert reopened.stats()["clips"] == 1
+        reopened.close()
+
+    def test_recency_of_played_clips_survives_a_restart(self, store):
+        store.put("a", b"samples")
+        store.put("b", b"samples")
+        store.get("a")
+        store.close()
+        reopened = script.PcmStore(store.directory, store.max_size)
+        assert reopened.clips["a"][2] > reopened.clips["b"][2]
+        reopened.close()
+
+    def test_clear(self, store):
+        store.put("a", b"samples")
+        assert store.clear() == 1
+        assert store.get("a") is None
+        assert store.stats()["size"] == 0
+
+
+class TestPcmPlayback:
+    def test_worker_streams_decoded_samples(self, store, clips, decoded, tmp_path):
+        output = tmp_path / "output"
+        worker = script.PlaybackWorker(["sh", "-c", f"cat >> {output}"], pcm=store)
+        for clip in clips + clips:
+            worker.submit(clip)
+        worker.wait()
+        worker.close()
+        assert output.read_text() == "CLIP0;CLIP1;CLIP2;" * 2
+        assert decoded == clips
+        assert worker.bytes_per_second == script.PCM_BYTES_PER_SECOND
+
+    def test_clip_prepared_while_played_is_decoded_once(
+        self, store, clips, decoded, tmp_path, monkeypatch
+    ):
+        started = script.threading.Event()
+        release = script.threading.Event()
+        decode = script.decodeClip
+
+        def slowDecode(path):
+            started.set()
+            release.wait(5)
+            return decode(path)
+
+        monkeypatch.setattr(script, "decodeClip", slowDecode)
+        output = tmp_path / "output"
+        worker = script.PlaybackWorker(["sh", "-c", f"cat >> {output}"], pcm=store)
+        prefetch = script.threading.Thread(target=worker.prepare, args=(clips[0],))
+        prefetch.start()
+        started.wait(5)
+        worker.submit(clips[0])
+        script.time.sleep(0.1)
+        release.set()
+        prefetch.join()
+        worker.wait()
+        worker.close()
+        assert output.read_text() == "CLIP0;"
+        assert decoded == [clips[0]]
+        assert worker.prepared == {}
+
+    def test_clips_are_decoded_with_the_trimming_effects(self, monkeypatch):
+        ran = []
+        monkeypatch.setattr(
+            script.subprocess,
+            "run",
+            lambda cmd, **kwargs: ran.append(cmd)
+            or script.subprocess.CompletedProcess(cmd, 0, b"samples"),
+        )
+        assert script.decodeClip("clip.mp3") == b"samples"
+        assert ran[0][-len(script.SOX_EFFECTS) :] == list(script.SOX_EFFECTS)
+
+    def test_raw_output_command(self, store):
+        worker = script.PlaybackWorker(pcm=store)
+        assert "raw" in worker.command
+        worker.close()
+
+    def test_setting_pcm_store_restarts_the_worker(self, tmp_path):
+        cmd = script.CommandLine()
+        cmd.env["audio"] = True
+        cmd.env["pcm_store_dir"] = str(tmp_path / "pcm")
+        worker = cmd.playbackWorker()
+        assert worker.pcm is None
+        cmd.do_set("pcm_store on")
+        assert cmd.env["pcm_store"] is True
+        assert cmd.playbackWorker().pcm is cmd.pcmStore()
+        cmd.playbackWorker().close()
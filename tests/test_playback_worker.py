@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+import threading
+import pytest
+import script
+
+
+@pytest.fixture(autouse=True)
+def decoded(monkeypatch):
+    calls = []
+
+    def decodeClip(path):
+        calls.append(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    monkeypatch.setattr(script, "decodeClip", decodeClip)
+    return calls
+
+
+@pytest.fixture
+def clips(tmp_path):
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"clip{number}.mp3"
+        path.write_bytes(f"clip{number};".encode("utf-8"))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def output(tmp_path):
+    return tmp_path / "output"
+
+
+@pytest.fixture
+def worker(output):
+    worker = script.PlaybackWorker(["sh", "-c", f"cat >> {output}"])
+    yield worker
+    worker.close()
+
+
+class TestPlaybackWorker:
+    def test_clips_are_streamed_to_one_process(self, worker, clips, output):
+        for clip in clips:
+            worker.submit(clip)
+        worker.wait()
+        worker.close()
+        assert output.read_text() == "clip0;clip1;clip2;"
+        assert worker.spawns == 1
+
+    def test_latency_is_counted(self, worker, clips):
+        worker.submit(clips[0])
+        worker.wait()
+        stats = worker.stats()
+        assert stats["clips"] == 1
+        assert stats["max_latency_ms"] >= stats["mean_latency_ms"] >= 0
+
+    def test_cancel_kills_output_while_playing(self, worker, clips):
+        worker.submit(clips[0])
+        worker.wait()
+        worker.busy_until = time.monotonic() + 60
+        worker.cancel()
+        assert worker.cancelled == 1
+        worker.submit(clips[1])
+        worker.wait()
+        assert worker.spawns == 2
+
+    def test_cancel_keeps_idle_output(self, worker, clips):
+        worker.submit(clips[0])
+        worker.wait()
+        worker.busy_until = 0
+        worker.cancel()
+        worker.submit(clips[1])
+        worker.wait()
+        assert (worker.cancelled, worker.spawns) == (0, 1)
+
+    def test_prepared_clips_are_not_decoded_on_the_playback_thread(
+        self, worker, clips, output, monkeypatch
+    ):
+        threads = []
+        decode = script.decodeClip
+        monkeypatch.setattr(
+            script,
+            "decodeClip",
+            lambda path: threads.append(threading.current_thread().name)
+            or decode(path),
+        )
+        worker.prepare(clips[0])
+        worker.submit(clips[0])
+        worker.wait()
+        worker.close()
+        assert output.read_text() == "clip0;"
+        assert threads == [threading.current_thread().name]
+        assert worker.prepared == {}
+
+    def test_prefetcher_prepares_clips_for_the_worker(
+        self, worker, tmp_path, monkeypatch, decoded
+    ):
+        monkeypatch.setattr(script, "synthesize", lambda text, lang: b"mp3")
+        cache = script.AudioCache(str(tmp_path / "cache"))
+        cues = [
+            script.speak("R:To speak", "говорить", {"E": "en", "R": "ru"}, True, cache)
+        ]
+        with script.AudioPrefetcher(cache, depth=1, player=worker) as prefetcher:
+            prefetcher.ahead(cues, 0)
+            paths = [future.result() for future in prefetcher.futures.values()]
+        assert sorted(worker.prepared) == sorted(paths) == sorted(decoded)
+
+    def test_cached_speech_is_queued_on_worker(self, worker, tmp_path, monkeypatch):
+        monkeypatch.setattr(script, "synthesize", lambda text, lang: b"mp3")
+        cache = script.AudioCache(str(tmp_path / "cache"))
+        monkeypatch.setattr(
+            script, "playAudioFile", lambda path: pytest.fail("spawned SoX")
+        )
+        question, answer = script.speak(
+            "R:To speak", "говорить", {"E": "en", "R": "ru"}, True, cache, worker
+        )
+        answer.play()
+        worker.wait()
+        assert worker.clips == 1
+
+
+class TestDrain:
+    def test_session_ends_once_the_last_clip_has_played(
+        self, worker, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(script, "synthesize", lambda text, lang: b"x" * 4800)
+        monkeypatch.setattr("builtins.input", lambda _: "E:answer")
+        cache = script.AudioCache(str(tmp_path / "cache"))
+        started = time.monotonic()
+        script.Test(["E:answer#question"], "#", {"E": "en"}, True, cache, 0, worker)
+        # answering straight away cuts off the question, the answer is 0.1s of samples
+        assert worker.clips == 1 and worker.cancelled == 0
+        assert time.monotonic() - started >= 0.1
+
+    def test_drain_waits_for_the_worker(self, worker, clips):
+        async def drain():
+            player = script.AsyncPlayer(worker)
+            worker.busy_until = time.monotonic() + 0.2
+            worker.submit(clips[0])
+            started = time.monotonic()
+            await player.drain()
+            return time.monotonic() - started
+
+        assert asyncio.run(drain()) >= 0.2
+        assert worker.clips == 1 and worker.cancelled == 0
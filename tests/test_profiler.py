@@ -0,0 +1,93 @@
+import json
+import pytest
+import script
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    profiler = script.Profiler()
+    monkeypatch.setattr(script, "PROFILER", profiler)
+    return profiler
+
+
+class TestProfiler:
+    def test_nothing_is_recorded_while_disabled(self, profiler, tmp_path):
+        (tmp_path / "deck").write_text("a#b\n")
+        script.DeckIndex(str(tmp_path), [], []).refresh()
+        assert profiler.stages == {}
+
+    def test_profiled_functions_are_timed_when_enabled(self, profiler, tmp_path):
+        (tmp_path / "deck").write_text("a#b\n")
+        profiler.enabled = True
+        index = script.DeckIndex(str(tmp_path), [], [])
+        for _ in range(3):
+            assert index.refresh().decks == {"deck": str(tmp_path / "deck")}
+        assert profiler.stages["DeckIndex.build"]["count"] == 1
+        assert profiler.stages["DeckIndex.refresh"]["count"] == 3
+
+    def test_session_decks_are_timed(self, profiler, tmp_path, monkeypatch):
+        (tmp_path / "deck").write_text("a#b\n")
+        profiler.enabled = True
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        monkeypatch.setattr(script, "DECK_INDEXES", {})
+        command.decks()
+        command.decks()
+        assert profiler.stages["DeckIndex.build"]["count"] == 2
+        assert profiler.stages["DeckIndex.refresh"]["count"] == 2
+
+    def test_worker_playback_is_timed(self, profiler, tmp_path, monkeypatch):
+        monkeypatch.setattr(script, "decodeClip", lambda path: b"samples")
+        profiler.enabled = True
+        worker = script.PlaybackWorker(["sh", "-c", "cat > /dev/null"])
+        worker.submit(str(tmp_path / "clip.mp3"))
+        worker.wait()
+        worker.close()
+        assert profiler.stages["playback"]["count"] == 1
+
+    def test_timer(self, profiler):
+        profiler.enabled = True
+        with profiler.timer("block"):
+            pass
+        assert profiler.stages["block"]["count"] == 1
+
+    def test_percentiles(self, profiler):
+        for _ in range(99):
+            profiler.record("stage", 0.001)
+        profiler.record("stage", 0.5)
+        (report,) = profiler.report()
+        assert report["count"] == 100
+        assert 1 <= report["p50_ms"] <= 2
+        assert 1 <= report["p95_ms"] <= 2
+        assert report["max_ms"] == 500
+
+    def test_report_is_slowest_first(self, profiler):
+        profiler.record("quick", 0.001)
+        profiler.record("slow", 0.1)
+        assert [timings["stage"] for timings in profiler.report()] == ["slow", "quick"]
+
+    def test_export_appends_json_lines(self, profiler, tmp_path):
+        profiler.record("stage", 0.01)
+        path = tmp_path / "metrics.jsonl"
+        profiler.export(str(path))
+        profiler.export(str(path))
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])["stages"][0]["stage"] == "stage"
+
+
+class TestProfileCommand:
+    def test_on_report_export_off(self, profiler, tmp_path, capsys):
+        cli = script.CommandLine()
+        cli.do_profile("on")
+        assert profiler.enabled
+        profiler.record("synthesize", 0.2)
+        cli.do_profile("report")
+        assert "synthesize" in capsys.readouterr().out
+        path = tmp_path / "metrics.jsonl"
+        cli.do_profile(f"export {path}")
+        assert json.loads(path.read_text())["stages"][0]["count"] == 1
+        cli.do_profile("off")
+        assert not profiler.enabled
+        cli.do_profile("reset")
+        assert profiler.stages == {}
@@ -0,0 +1,287 @@
+import os
+import resource
+import pytest
+import script
+
+
+@pytest.fixture
+def decks(tmp_path):
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"deck{number}"
+        path.write_text(
+            "header without a delimiter\n"
+            + "".join(f"R:word{number}_{i}#слово{number}_{i}\n" for i in range(10))
+        )
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "compiled")
+
+
+class TestLineIndex:
+    def test_lines_are_read_by_number(self, decks, cache_dir):
+        index = script.LineIndex(decks[0], cache_dir)
+        assert len(index) == 11
+        assert index.line(0) == "header without a delimiter\n"
+        assert index.line(10) == "R:word0_9#слово0_9\n"
+        index.close()
+
+    def test_last_line_without_newline(self, tmp_path, cache_dir):
+        path = tmp_path / "deck"
+        path.write_text("a#b\nc#d")
+        index = script.LineIndex(str(path), cache_dir)
+        assert [index.line(i) for i in range(len(index))] == ["a#b\n", "c#d"]
+        index.close()
+
+    def test_empty_deck_has_no_lines(self, tmp_path, cache_dir):
+        path = tmp_path / "empty"
+        path.write_text("")
+        assert len(script.LineIndex(str(path), cache_dir)) == 0
+
+    def test_offsets_are_not_held_in_memory(self, decks, cache_dir, monkeypatch):
+        index = script.LineIndex(decks[0], cache_dir)
+        reads = []
+        pread = os.pread
+        monkeypatch.setattr(
+            os, "pread", lambda *args: reads.append(args[1]) or pread(*args)
+        )
+        assert index.line(10) == "R:word0_9#слово0_9\n"
+        assert reads == [16]
+        index.close()
+
+    def test_index_is_rebuilt_when_deck_changes(self, decks, cache_dir):
+        script.LineIndex(decks[0], cache_dir).close()
+        with open(decks[0], "a") as deck:
+            deck.write("R:extra#ещё\n")
+        index = script.LineIndex(decks[0], cache_dir)
+        assert index.line(len(index) - 1) == "R:extra#ещё\n"
+        index.close()
+
+
+class TestCardSampler:
+    def test_sample_returns_distinct_cards(self, decks, cache_dir):
+        with script.CardSampler(decks, "#", cache_dir) as sampler:
+            lines = sampler.sample(12)
+        assert len(lines) == len(set(lines)) == 12
+        assert all("#" in line for line in lines)
+
+    def test_sample_is_bounded_by_number_of_cards(self, decks, cache_dir):
+        with script.CardSampler(decks, "#", cache_dir) as sampler:
+            lines = sampler.sample(100, max_draws=10000)
+        assert len(lines) == 30
+
+    def test_sample_without_decks_is_empty(self, cache_dir):
+        with script.CardSampler([], "#", cache_dir) as sampler:
+            assert sampler.sample(5) == []
+
+    def test_more_decks_than_open_files_allowed(self, tmp_path, cache_dir):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        limit = len(os.listdir("/proc/self/fd")) + 32
+        paths = []
+        for number in range(limit + 100):
+            path = tmp_path / f"many{number}"
+            path.write_text(f"R:word{number}#слово{number}\n")
+            paths.append(str(path))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+        try:
+            with script.CardSampler(paths, "#", cache_dir) as sampler:
+                lines = sampler.sample(50)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        assert len(lines) == 50
+
+    def test_getRandomSelection_samples_working_dir(self, decks, tmp_path):
+        names = [os.path.basename(path) for path in decks]
+        lines = script.getRandomSelection([], names, str(tmp_path), k=5)
+        assert len(lines) == 5
+
+
+@pytest.fixture
+def review_store(tmp_path):
+    store = script.ReviewStore(str(tmp_path / "review.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def cards():
+    return script.parseLines([f"R:word{i}#слово{i}\n" for i in range(600)], "#")
+
+
+@pytest.fixture
+def deck(tmp_path, cards):
+    path = tmp_path / "words"
+    path.write_text("".join(card.line for card in cards))
+    return str(path)
+
+
+def weightOf(sampler, card):
+    return sampler.weights[sampler.positions[script.cardHash(card)]]
+
+
+class TestAliasTable:
+    def test_draws_follow_the_weights(self):
+        script.random.seed(1)
+        table = script.AliasTable([1, 0, 3])
+        draws = [table.draw() for _ in range(8000)]
+        assert draws.count(1) == 0
+        assert 0.7 < draws.count(2) / len(draws) < 0.8
+
+    def test_single_weight(self):
+        assert script.AliasTable([0.2]).draw() == 0
+
+
+class TestErrorWeightedSampler:
+    def test_miss_weight(self):
+        assert script.missWeight(0, 0) == 0.5
+        assert script.missWeight(10, 0) < script.missWeight(2, 2)
+        assert script.missWeight(0, 0, True) > script.missWeight(0, 0)
+
+    def test_missed_cards_come_up_more_often(
+        self, deck, cards, review_store, cache_dir
+    ):
+        script.random.seed(2)
+        sampler = script.ErrorWeightedSampler([deck], review_store, cache_dir=cache_dir)
+        sampler.drawn = {script.cardHash(card): deck for card in cards}
+        for _ in range(5):
+            sampler.record({card: card is cards[0] for card in cards})
+        draws = [sampler.draw()[1] for _ in range(20000)]
+        # 6/7 against 1/7 for every other card
+        assert draws.count(cards[0]) > 3 * draws.count(cards[1])
+
+    def test_only_cards_with_history_or_errors_are_held(
+        self, deck, cards, review_store, cache_dir
+    ):
+        sampler = script.ErrorWeightedSampler(
+            [deck], review_store, {cards[5].line.rstrip("\n")}, cache_dir=cache_dir
+        )
+        assert sampler.cards == [cards[5]]
+        assert weightOf(sampler, cards[5]) > script.missWeight(0, 0)
+        assert sampler.uniform == 600 * script.missWeight(0, 0)
+
+    def test_decks_are_not_loaded(self, deck, review_store, cache_dir, monkeypatch):
+        monkeypatch.setattr(script, "compileDeck", lambda *args: pytest.fail("loaded"))
+        sampler = script.ErrorWeightedSampler([deck], review_store, cache_dir=cache_dir)
+        assert len(sampler.sample(5)) == 5
+
+    def test_uniform_draws_skip_held_cards(self, tmp_path, review_store, cache_dir):
+        path = tmp_path / "pair"
+        path.write_text("R:word#слово\nR:talk#говорить\n")
+        sampler = script.ErrorWeightedSampler(
+            [str(path)], review_store, cache_dir=cache_dir
+        )
+        [card] = sampler.sample(1)
+        sampler.record({card: False})
+        assert sampler.uniform == script.missWeight(0, 0)
+        assert review_store.attemptedLines() == {
+            script.cardHash(card): (card.line, str(path))
+        }
+        draws = [sampler.draw() for _ in range(200)]
+        assert all(drawn is None or drawn[2] == str(path) for drawn in draws)
+        assert {drawn[1] for drawn in draws if drawn is not None} == set(
+            script.parseLines(path.read_text().splitlines(keepends=True), "#")
+        )
+
+    def test_record_rebuilds_only_changed_blocks(self, deck, cards, review_store):
+        sampler = script.ErrorWeightedSampler([deck], review_store, block_size=256)
+        sampler.drawn = {script.cardHash(card): deck for card in cards}
+        sampler.record({card: False for card in cards})
+        blocks = list(sampler.blocks)
+        sampler.record({cards[300]: True})
+        assert sampler.blocks[0] is blocks[0] and sampler.blocks[2] is blocks[2]
+        assert sampler.blocks[1] is not blocks[1]
+        assert sampler.top.total == pytest.approx(sum(sampler.weights))
+        assert sampler.uniform == 0
+
+    def test_reweigh_only_rebuilds_changed_blocks(self, deck, cards, review_store):
+        sampler = script.ErrorWeightedSampler([deck], review_store, block_size=256)
+        sampler.drawn = {script.cardHash(card): deck for card in cards}
+        sampler.record({card: False for card in cards})
+        blocks = list(sampler.blocks)
+        sampler.reweigh({cards[300].line.rstrip("\n")})
+        assert weightOf(sampler, cards[300]) > weightOf(sampler, cards[301])
+        assert sampler.blocks[0] is blocks[0] and sampler.blocks[1] is not blocks[1]
+        sampler.reweigh(set())
+        assert weightOf(sampler, cards[300]) == weightOf(sampler, cards[301])
+
+    def test_cards_leaving_the_error_deck_are_not_drawn(self, cards, review_store):
+        sampler = script.ErrorWeightedSampler(
+            [], review_store, {cards[5].line.rstrip("\n")}
+        )
+        assert sampler.sample(1) == [cards[5]]
+        sampler.reweigh(set())
+        assert sampler.sample(1) == []
+
+    def test_attempts_persist(self, deck, cards, review_store):
+        sampler = script.ErrorWeightedSampler([deck], review_store)
+        sampler.drawn = {script.cardHash(cards[1]): deck}
+        sampler.record({cards[1]: True})
+        script.ErrorWeightedSampler([deck], review_store).record({cards[1]: False})
+        assert review_store.attempts() == {script.cardHash(cards[1]): (2, 1)}
+        sampler = script.ErrorWeightedSampler([deck], review_store)
+        assert sampler.cards == [cards[1]]
+        assert weightOf(sampler, cards[1]) == script.missWeight(2, 1)
+
+    def test_history_of_removed_decks_is_dropped(self, deck, cards, review_store):
+        sampler = script.ErrorWeightedSampler([deck], review_store)
+        sampler.drawn = {script.cardHash(cards[1]): deck}
+        sampler.record({cards[1]: True})
+        assert len(script.ErrorWeightedSampler([], review_store)) == 0
+
+    def test_sample_returns_distinct_cards(self, tmp_path, cards, review_store):
+        path = tmp_path / "ten"
+        path.write_text("".join(card.line for card in cards[:10]))
+        sampler = script.ErrorWeightedSampler([str(path)], review_store)
+        sample = sampler.sample(10, max_draws=10000)
+        assert sorted(sample) == sorted(cards[:10])
+        assert script.ErrorWeightedSampler([], review_store).sample(5) == []
+
+    def test_old_review_db_is_migrated(self, tmp_path):
+        path = str(tmp_path / "old.db")
+        connection = script.sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE attempts (card TEXT PRIMARY KEY, "
+            "asked INTEGER NOT NULL, missed INTEGER NOT NULL)"
+        )
+        connection.execute("INSERT INTO attempts VALUES ('abc', 2, 1)")
+        connection.commit()
+        connection.close()
+        store = script.ReviewStore(path)
+        assert store.attempts() == {"abc": (2, 1)}
+        assert store.attemptedLines() == {}
+        store.close()
+
+
+class TestRandomCommand:
+    def test_random_records_the_answers(self, tmp_path, monkeypatch, capfd):
+        (tmp_path / "verbs").write_text("R:word#слово\nR:talk#говорить\n")
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+        command.env["error_file"] = str(tmp_path / "_Errors")
+        command.env["log_file"] = str(tmp_path / "scores.log")
+        monkeypatch.setattr("builtins.input", lambda _: "show")
+        command.do_random("2")
+        out, err = capfd.readouterr()
+        assert "QUESTION (2 of 2)" in out
+        assert sorted(command.errorSampler().attempts.values()) == [(1, 1), (1, 1)]
+        assert len(command.errorSampler()) == 2
+        command.errorSampler().close()
+
+    def test_error_deck_changes_do_not_reload_the_decks(self, tmp_path, monkeypatch):
+        (tmp_path / "verbs").write_text("R:word#слово\nR:talk#говорить\n")
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+        command.env["error_file"] = str(tmp_path / "_Errors")
+        monkeypatch.setattr(script, "compileDeck", lambda *args: pytest.fail("loaded"))
+        sampler = command.errorSampler()
+        (tmp_path / "_Errors").write_text("R:talk#говорить\n")
+        assert command.errorSampler() is sampler
+        [card] = script.parseLines(["R:talk#говорить\n"], "#")
+        assert weightOf(sampler, card) > script.missWeight(0, 0)
+        sampler.close()
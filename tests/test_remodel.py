@@ -0,0 +1,42 @@
+import pytest
+import script
+
+
+@pytest.fixture
+def deck(tmp_path):
+    path = tmp_path / "deck"
+    path.write_text("вино#R:Wine\nR:Water#вода\nвода#R:Water\nheader\n")
+    return path
+
+
+class TestRemodel:
+    def test_inverse_lines_are_lazy(self):
+        lines = script.inverseLines(iter(["a#b\n", "c#d\n"]), "#")
+        assert next(lines) == "b#a\n"
+
+    def test_remodel_data_is_unchanged(self):
+        assert script.remodelData(["a#b\n", "x\n"], "#") == ["b#a\n", "a#b\n", "x\n"]
+
+    def test_remodel_file_streams_inverse_then_source(self, deck, tmp_path):
+        dest = tmp_path / "dest"
+        script.remodelFile(str(deck), str(dest))
+        assert dest.read_text() == (
+            "R:Wine#вино\nвода#R:Water\nR:Water#вода\n" + deck.read_text()
+        )
+
+    def test_dedupe_skips_pairs_in_both_directions(self, deck, tmp_path):
+        dest = tmp_path / "dest"
+        script.remodelFile(str(deck), str(dest), dedupe=True)
+        assert dest.read_text() == "R:Wine#вино\n" + deck.read_text()
+
+    def test_source_can_be_overwritten(self, deck, monkeypatch):
+        monkeypatch.setattr("builtins.input", lambda _: "overwrite")
+        original = deck.read_text()
+        script.remodelFile(str(deck), str(deck))
+        assert deck.read_text().endswith(original)
+        assert [path.name for path in deck.parent.iterdir()] == ["deck"]
+
+    def test_make_command(self, deck, tmp_path):
+        dest = tmp_path / "dest"
+        script.CommandLine().do_make(f"{deck} {dest} dedupe")
+        assert dest.read_text().startswith("R:Wine#вино\nвино")
@@ -0,0 +1,113 @@
+import os
+import threading
+import pytest
+import script
+
+languages = {"E": "en", "R": "ru"}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    synthesized = []
+
+    def synthesize(text, lang):
+        synthesized.append((text, lang))
+        return f"[{lang}:{text}]".encode("utf-8")
+
+    monkeypatch.setattr(script, "synthesize", synthesize)
+    cache = script.AudioCache(str(tmp_path / "cache"))
+    cache.synthesized = synthesized
+    return cache
+
+
+@pytest.fixture
+def cards():
+    return script.parseLines(
+        ["говорить#R:To speak\n", "R:To speak#говорить\n", "читать#R:To read\n"], "#"
+    )
+
+
+class TestRenderDeck:
+    def test_every_card_is_rendered(self, cards, cache, tmp_path):
+        outdir = tmp_path / "out"
+        results = script.renderDeck(cards, str(outdir), languages, cache, name="verbs")
+        assert results["cards"] == 3
+        assert sorted(os.listdir(outdir)) == [
+            "0001.mp3",
+            "0002.mp3",
+            "0003.mp3",
+            "verbs.m3u",
+            "verbs.mp3",
+        ]
+        assert (
+            outdir / "0001.mp3"
+        ).read_bytes().decode() == "[en:To speak][ru:говорить]"
+        assert (
+            outdir / "0002.mp3"
+        ).read_bytes().decode() == "[ru:говорить][en:To speak]"
+
+    def test_playlist_is_every_card_in_order(self, cards, cache, tmp_path):
+        outdir = tmp_path / "out"
+        script.renderDeck(cards, str(outdir), languages, cache, name="verbs")
+        assert (outdir / "verbs.mp3").read_bytes() == b"".join(
+            (outdir / f"000{n}.mp3").read_bytes() for n in (1, 2, 3)
+        )
+        playlist = (outdir / "verbs.m3u").read_text().splitlines()
+        assert playlist[:3] == [
+            "#EXTM3U",
+            "#EXTINF:-1,R:To speak - говорить",
+            "0001.mp3",
+        ]
+
+    def test_clips_are_synthesized_once(self, cards, cache, tmp_path):
+        script.renderDeck(cards, str(tmp_path / "a"), languages, cache)
+        assert len(cache.synthesized) == 4
+        script.renderDeck(cards, str(tmp_path / "b"), languages, cache)
+        assert len(cache.synthesized) == 4
+
+    def test_render_command(self, cache, tmp_path, monkeypatch):
+        working_dir = tmp_path / "decks"
+        working_dir.mkdir()
+        (working_dir / "verbs").write_text("говорить#R:To speak\n")
+        cli = script.CommandLine()
+        cli.env["working_dir"] = str(working_dir)
+        monkeypatch.setattr(cli, "audioCache", lambda: cache)
+        cli.do_render(f"verbs {tmp_path / 'out'}")
+        assert (tmp_path / "out" / "verbs.mp3").exists()
+
+    def test_cache_smaller_than_the_deck(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(script, "synthesize", lambda text, lang: b"x" * 10000)
+        cache = script.AudioCache(str(tmp_path / "cache"), max_size=50000)
+        cards = script.parseLines([f"слово{n}#R:word{n}\n" for n in range(20)], "#")
+        outdir = tmp_path / "out"
+        results = script.renderDeck(cards, str(outdir), languages, cache, workers=4)
+        assert results["clips"] == 40
+        assert (outdir / "0020.mp3").read_bytes() == b"x" * 20000
+        assert len((outdir / "deck.mp3").read_bytes()) == 20 * 20000
+        assert cache.size() <= 50000
+
+    def test_only_a_window_of_cards_is_rendered_ahead(self, tmp_path, monkeypatch):
+        first = threading.Event()
+        read = []
+
+        def synthesize(text, lang):
+            read.append(text)
+            if text == "слово0":
+                first.wait(5)
+            return text.encode("utf-8")
+
+        monkeypatch.setattr(script, "synthesize", synthesize)
+        cache = script.AudioCache(str(tmp_path / "cache"))
+        cards = script.parseLines([f"слово{n}#R:word{n}\n" for n in range(50)], "#")
+        rendering = threading.Thread(
+            target=script.renderDeck,
+            args=(cards, str(tmp_path / "out"), languages, cache, 2),
+        )
+        rendering.start()
+        script.time.sleep(0.2)
+        # the first card holds up the writer, so only 2 * workers cards were submitted
+        assert len({text for text in read if text.startswith("word")}) <= 4
+        first.set()
+        rendering.join()
+        data = (tmp_path / "out" / "0050.mp3").read_bytes()
+        assert data == "word49слово49".encode("utf-8")
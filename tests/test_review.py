@@ -0,0 +1,134 @@
+import pytest
+import script
+
+lines = [f"R:word{i}#слово{i}\n" for i in range(5)]
+day = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = script.ReviewStore(str(tmp_path / "review.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def cards():
+    return script.parseLines(lines, "#")
+
+
+class TestSm2:
+    def test_first_passes_are_one_then_six_days(self):
+        state = script.sm2(script.ReviewState(), 4, 0)
+        assert (state.repetitions, state.interval, state.due) == (1, 1, day)
+        state = script.sm2(state, 4, 0)
+        assert state.interval == 6
+
+    def test_interval_grows_with_ease(self):
+        state = script.ReviewState(repetitions=2, interval=6, ease=2.5)
+        assert script.sm2(state, 5, 0).interval == 15
+
+    def test_failure_resets_repetitions_and_lowers_ease(self):
+        state = script.ReviewState(repetitions=3, interval=15, ease=2.5)
+        failed = script.sm2(state, 1, 0)
+        assert (failed.repetitions, failed.interval) == (0, 1)
+        assert failed.ease < state.ease
+
+    def test_ease_never_drops_below_minimum(self):
+        state = script.ReviewState(ease=1.3)
+        assert script.sm2(state, 0, 0).ease == 1.3
+
+
+class TestReviewQueue:
+    def test_new_cards_are_due(self, cards, store):
+        queue = script.ReviewQueue(cards, store)
+        assert len(queue.due(3, now=0)) == 3
+        assert len(queue.due(10, now=0)) == 2
+
+    def test_same_card_in_two_decks_is_queued_once(self, cards, store):
+        queue = script.ReviewQueue(cards + cards, store)
+        assert len(queue) == len(cards)
+
+    def test_graded_cards_are_not_due_until_their_interval(self, cards, store):
+        queue = script.ReviewQueue(cards, store)
+        due = queue.due(2, now=0)
+        queue.grade({due[0]: 4, due[1]: 1}, now=0)
+        assert len(queue.due(10, now=0)) == 3
+        assert queue.due(10, now=day) == due
+
+    def test_states_persist_across_queues(self, cards, store):
+        queue = script.ReviewQueue(cards, store)
+        queue.grade({card: 5 for card in queue.due(5, now=0)}, now=0)
+        assert script.ReviewQueue(cards, store).due(5, now=0) == []
+
+    def test_most_overdue_card_comes_first(self, cards, store):
+        queue = script.ReviewQueue(cards[:2], store)
+        first, second = queue.due(2, now=0)
+        queue.grade({first: 4}, now=100)
+        queue.grade({second: 4}, now=0)
+        assert queue.due(1, now=2 * day) == [second]
+
+    def test_restored_cards_are_due_again(self, cards, store):
+        queue = script.ReviewQueue(cards, store)
+        due = queue.due(3, now=0)
+        queue.restore(due)
+        assert len(queue) == len(cards)
+        assert len(queue.due(10, now=0)) == len(cards)
+
+
+class TestReviewCommand:
+    def test_review_asks_due_cards_and_schedules_them(
+        self, tmp_path, monkeypatch, capfd
+    ):
+        (tmp_path / "verbs").write_text("".join(lines))
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+        monkeypatch.setattr("builtins.input", lambda _: "show")
+        command.do_review("2")
+        out, err = capfd.readouterr()
+        assert "QUESTION (2 of 2)" in out
+        assert len(command.reviewQueue().due(10)) == 3
+
+    def test_review_asks_the_most_overdue_first(self, tmp_path, monkeypatch, capfd):
+        (tmp_path / "verbs").write_text("".join(lines))
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+        queue = command.reviewQueue()
+        cards = queue.due(5, now=0)
+        for number, card in enumerate(cards):
+            # each card is a day more overdue than the one before
+            queue.grade({card: 4}, now=-number * day)
+        asked = []
+        monkeypatch.setattr("builtins.input", lambda text: "show")
+        monkeypatch.setattr(
+            script, "print_coloured", lambda text, *args, **kwargs: asked.append(text)
+        )
+        command.do_review("5")
+        questions = [card.question + "\n" for card in reversed(cards)]
+        assert [text for text in asked if text in questions] == questions
+
+    def test_interrupted_review_keeps_cards_due(self, tmp_path, monkeypatch):
+        (tmp_path / "verbs").write_text("".join(lines))
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+
+        def interrupt(text):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr("builtins.input", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            command.do_review("2")
+        assert len(command.reviewQueue().due(10)) == 5
+
+    def test_cards_added_to_a_deck_are_queued(self, tmp_path):
+        (tmp_path / "verbs").write_text(lines[0])
+        command = script.CommandLine()
+        command.env["working_dir"] = str(tmp_path)
+        command.env["review_db"] = str(tmp_path / "review.db")
+        assert len(command.reviewQueue()) == 1
+        with open(tmp_path / "verbs", "a") as deck:
+            deck.writelines(lines[1:3])
+        assert len(command.reviewQueue()) == 3
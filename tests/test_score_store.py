@@ -0,0 +1,90 @@
+import pytest
+import script
+
+log = (
+    "\n01/02/2021 18:30 verbs 3/10 30%"
+    "\n01/02/2021 19:00 verbs 8/10 80%"
+    "\n02/02/2021 09:15 nouns 9/10 90%"
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = script.ScoreStore(str(tmp_path / "scores.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "scores.log"
+    path.write_text(log)
+    return str(path)
+
+
+class TestScoreStore:
+    def test_import_log(self, store, log_file):
+        assert store.importLog(log_file) == 3
+        assert store.sessions()[0] == ("2021-02-01 18:30", "verbs", 3, 10, 30)
+
+    def test_log_is_only_imported_once(self, store, log_file):
+        store.importLog(log_file)
+        assert store.importLog(log_file) == 0
+        assert len(store.sessions()) == 3
+
+    def test_sessions_filtered_by_deck_and_threshold(self, store, log_file):
+        store.importLog(log_file)
+        assert [row[1:] for row in store.sessions(deck="verbs", below=50)] == [
+            ("verbs", 3, 10, 30)
+        ]
+
+    def test_sessions_filtered_by_date_range(self, store, log_file):
+        store.importLog(log_file)
+        assert len(store.sessions(since="02/02/2021")) == 1
+        assert len(store.sessions(until="2021-02-01")) == 2
+
+    def test_summary_uses_rollups(self, store, log_file):
+        store.importLog(log_file)
+        store.record("nouns", 1, 10, "2021-02-03 10:00")
+        assert store.summary() == [
+            ("nouns", 2, 10, 20, 50, 10),
+            ("verbs", 2, 11, 20, 55, 30),
+        ]
+        assert store.summary(below=51) == [("nouns", 2, 10, 20, 50, 10)]
+        assert store.summary(below=50) == []
+
+    def test_writeLog_records_in_store(self, store, tmp_path):
+        script.writeLog("verbs", 5, 10, str(tmp_path / "scores.log"), True, store)
+        assert [row[1:] for row in store.sessions()] == [("verbs", 5, 10, 50)]
+
+
+class TestStatsCommand:
+    def test_stats_prints_filtered_sessions(self, tmp_path, log_file, capfd):
+        command = script.CommandLine()
+        command.env["score_db"] = str(tmp_path / "scores.db")
+        command.env["log_file"] = log_file
+        command.do_stats("deck nouns")
+        out, err = capfd.readouterr()
+        assert "2021-02-02 09:15 nouns 9/10 90%" in out
+        assert "verbs" not in out
+
+    def test_stats_rejects_unknown_filters(self, tmp_path, capfd):
+        command = script.CommandLine()
+        command.env["score_db"] = str(tmp_path / "scores.db")
+        command.do_stats("colour red")
+        out, err = capfd.readouterr()
+        assert "stats [summary]" in out
+
+    @pytest.mark.parametrize("line", ["below x", "from 1/2", "to yesterday"])
+    def test_stats_rejects_bad_values(self, tmp_path, capfd, line):
+        command = script.CommandLine()
+        command.env["score_db"] = str(tmp_path / "scores.db")
+        command.do_stats(line)
+        out, err = capfd.readouterr()
+        assert "stats [summary]" in out
+
+    def test_isoDate(self):
+        assert script.isoDate("1/2/2021") == "2021-02-01"
+        assert script.isoDate("2021-02-01") == "2021-02-01"
+        with pytest.raises(ValueError):
+            script.isoDate("1/2")
@@ -0,0 +1,109 @@
+import os
+import pytest
+import script
+
+
+@pytest.fixture
+def decks(tmp_path):
+    root = tmp_path / "decks"
+    (root / "P1").mkdir(parents=True)
+    (root / "verbs").write_text("R:To speak#говори́ть\nR:To read#читать\n")
+    (root / "P1" / "phrases").write_text(
+        "header without a card\nR:Do you speak Russian?#Ты говоришь по-русски?\n"
+    )
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = script.SearchIndex(str(tmp_path / "search.db"))
+    yield index
+    index.close()
+
+
+def paths(root):
+    return [str(root / "verbs"), str(root / "P1" / "phrases")]
+
+
+class TestSearchIndex:
+    def test_finds_cards_by_question_and_answer(self, decks, index):
+        index.update(str(decks), paths(decks))
+        assert index.search("говорить", str(decks)) == [
+            (str(decks / "verbs"), 1, "R:To speak#говори́ть")
+        ]
+        assert [number for _, number, _ in index.search("speak", str(decks))] == [
+            2,
+            1,
+        ]
+
+    def test_search_folds_case_stress_and_spaces(self, decks, index):
+        index.update(str(decks), paths(decks))
+        assert len(index.search("ГОВОРИ", str(decks))) == 2
+        assert len(index.search("по русски", str(decks))) == 1
+
+    def test_short_terms_are_found(self, decks, index):
+        index.update(str(decks), paths(decks))
+        assert [text for _, _, text in index.search("re", str(decks))] == [
+            "R:To read#читать"
+        ]
+
+    def test_trigrams_without_the_term_are_not_a_match(self, decks, index):
+        index.update(str(decks), paths(decks))
+        # every trigram of "readread" is in "read" but the term is not
+        assert index.search("readread", str(decks)) == []
+
+    def test_only_changed_decks_are_read(self, decks, index):
+        assert index.update(str(decks), paths(decks)) == 2
+        assert index.update(str(decks), paths(decks)) == 0
+        (decks / "verbs").write_text("R:To write#писать\n")
+        assert index.update(str(decks), paths(decks)) == 1
+        assert index.search("говорить", str(decks)) == []
+        assert len(index.search("писать", str(decks))) == 1
+
+    def test_removed_decks_are_forgotten(self, decks, index):
+        index.update(str(decks), paths(decks))
+        os.remove(decks / "verbs")
+        index.update(str(decks), paths(decks)[1:])
+        assert index.search("читать", str(decks)) == []
+        assert index.connection.execute("SELECT COUNT(*) FROM grams").fetchone()[
+            0
+        ] == len(index.connection.execute("SELECT gram FROM grams").fetchall())
+
+    def test_search_is_limited_to_root(self, decks, index):
+        index.update(str(decks), paths(decks))
+        other = decks.parent / "decks2"
+        other.mkdir()
+        (other / "verbs").write_text("R:To speak#говорить\n")
+        index.update(str(other), [str(other / "verbs")])
+        assert len(index.search("говорить", str(decks))) == 1
+        assert len(index.search("говорить", str(decks), limit=1)) == 1
+        assert index.update(str(decks), paths(decks)) == 0
+
+    def test_index_persists(self, decks, index):
+        index.update(str(decks), paths(decks))
+        reopened = script.SearchIndex(index.path)
+        assert reopened.update(str(decks), paths(decks)) == 0
+        assert len(reopened.search("читать", str(decks))) == 1
+        reopened.close()
+
+
+class TestFindCommand:
+    def test_find_prints_deck_and_line(self, decks, tmp_path, capfd):
+        command = script.CommandLine()
+        command.env["working_dir"] = str(decks)
+        command.env["search_db"] = str(tmp_path / "search.db")
+        command.do_find("говори")
+        out, err = capfd.readouterr()
+        assert "verbs:1" in out
+        assert os.path.join("P1", "phrases") + ":2" in out
+        assert "2 cards found" in out
+
+    def test_error_deck_is_not_indexed(self, decks, tmp_path, capfd):
+        (decks / "_Errors").write_text("R:To speak#говори́ть\n")
+        command = script.CommandLine()
+        command.env["working_dir"] = str(decks)
+        command.env["search_db"] = str(tmp_path / "search.db")
+        command.do_find("speak")
+        out, err = capfd.readouterr()
+        assert "_Errors" not in out
+        assert "verbs:1" in out
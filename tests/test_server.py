@@ -0,0 +1,235 @@
+import os
+import json
+import struct
+import asyncio
+import pytest
+import script
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(script, "COLOUR", False)
+    monkeypatch.setattr(
+        script, "localTime", lambda: __import__("datetime").datetime(2024, 1, 2, 3, 4)
+    )
+    working_dir = tmp_path / "decks"
+    working_dir.mkdir()
+    (working_dir / "verbs").write_text("говорить#R:To speak\nчитать#R:To read\n")
+    command = script.CommandLine()
+    command.env["working_dir"] = str(working_dir)
+    server = script.QuizServer(command, str(tmp_path / "users"))
+    yield server
+    server.close()
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+
+    @classmethod
+    async def connect(cls, port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+            "Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        status = await reader.readline()
+        while (await reader.readline()) != b"\r\n":
+            pass
+        return cls(reader, writer), status
+
+    async def send(self, text):
+        payload = text.encode("utf-8")
+        mask = b"\x01\x02\x03\x04"
+        self.writer.write(
+            struct.pack("!BB", 0x81, 0x80 | len(payload))
+            + mask
+            + script.unmask(payload, mask)
+        )
+        await self.writer.drain()
+
+    async def receive(self):
+        head = await self.reader.readexactly(2)
+        payload = await self.reader.readexactly(head[1] & 0x7F)
+        return json.loads(payload) if head[0] & 0x0F == 0x1 else None
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0].decode(), body
+
+
+def serve(server, client):
+    async def main():
+        listening = await server.start("127.0.0.1", 0)
+        port = listening.sockets[0].getsockname()[1]
+        try:
+            return await client(port)
+        finally:
+            listening.close()
+
+    return asyncio.run(main())
+
+
+class TestWebsocketHelpers:
+    def test_accept_key_from_rfc(self):
+        assert (
+            script.websocketAccept("dGhlIHNhbXBsZSBub25jZQ==")
+            == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+        )
+
+    def test_unmask_is_symmetric(self):
+        mask = b"\x0a\x0b\x0c\x0d"
+        assert (
+            script.unmask(script.unmask("привет".encode(), mask), mask)
+            == "привет".encode()
+        )
+
+
+class TestQuizServer:
+    def test_decks_are_listed(self, server):
+        status, body = serve(server, lambda port: get(port, "/decks"))
+        assert status == "HTTP/1.1 200 OK"
+        assert json.loads(body) == ["verbs"]
+
+    def test_unknown_deck(self, server):
+        async def client(port):
+            _, status = await Client.connect(port, "/session?user=ann&deck=nope")
+            return status
+
+        assert b"404" in serve(server, client)
+
+    def test_bad_user_name(self, server):
+        async def client(port):
+            _, status = await Client.connect(port, "/session?user=../etc&deck=verbs")
+            return status
+
+        assert b"400" in serve(server, client)
+
+    def test_session_is_scored_per_user(self, server, tmp_path):
+        answers = {"R:To speak": "говорить", "R:To read": "wrong"}
+
+        async def client(port):
+            socket, status = await Client.connect(port, "/session?user=ann&deck=verbs")
+            assert b"101" in status
+            messages = []
+            while True:
+                message = await socket.receive()
+                messages.append(message)
+                if message["type"] == "question":
+                    await socket.send(answers[message["question"]])
+                elif message["type"] == "wrong":
+                    await socket.send("show")
+                elif message["type"] == "summary":
+                    return messages
+
+        messages = serve(server, client)
+        assert messages[-1] == dict(type="summary", correct=1, total=2, percent=50)
+        server.writer.submit(lambda: None).result()
+        user = tmp_path / "users" / "ann"
+        assert "verbs 1/2 50%" in (user / "scores.log").read_text()
+        assert (user / "_Errors").read_text() == "wrong#R:To read\n".replace(
+            "wrong", "читать"
+        )
+
+    def test_sessions_share_parsed_decks(self, server, monkeypatch):
+        parsed = []
+        compile_deck = script.compileDeck
+        monkeypatch.setattr(
+            script,
+            "compileDeck",
+            lambda *args: parsed.append(args) or compile_deck(*args),
+        )
+
+        async def client(port):
+            for user in ("ann", "bob"):
+                socket, _ = await Client.connect(
+                    port, f"/session?user={user}&deck=verbs"
+                )
+                assert (await socket.receive())["type"] == "question"
+                socket.writer.close()
+
+        serve(server, client)
+        assert len(parsed) == 1
+
+    def test_error_deck_is_the_users_own(self, server, tmp_path):
+        user = tmp_path / "users" / "ann"
+        user.mkdir(parents=True)
+        (user / "_Errors").write_text("читать#R:To read\nговорить#R:To speak\n")
+        answers = {"R:To read": "читать", "R:To speak": "show"}
+
+        async def client(port):
+            socket, status = await Client.connect(
+                port, "/session?user=ann&deck=_Errors"
+            )
+            assert b"101" in status
+            messages = []
+            while True:
+                message = await socket.receive()
+                messages.append(message)
+                if message["type"] == "question":
+                    await socket.send(answers[message["question"]])
+                elif message["type"] == "summary":
+                    return messages
+
+        messages = serve(server, client)
+        assert messages[0]["question"] in answers
+        assert messages[-1]["correct"] == 1
+        server.writer.submit(lambda: None).result()
+        script.errorJournal(str(user / "_Errors")).compact()
+        # the card answered correctly is taken out and the session is not logged
+        assert (user / "_Errors").read_text() == "говорить#R:To speak\n"
+        assert not (user / "scores.log").exists()
+
+    def test_error_deck_of_a_new_user(self, server):
+        async def client(port):
+            _, status = await Client.connect(port, "/session?user=new&deck=_Errors")
+            return status
+
+        assert b"404" in serve(server, client)
+
+    def test_unreadable_deck(self, server, monkeypatch):
+        def unreadable(*args):
+            raise PermissionError("verbs")
+
+        monkeypatch.setattr(script, "compileDeck", unreadable)
+
+        async def client(port):
+            _, status = await Client.connect(port, "/session?user=ann&deck=verbs")
+            return status
+
+        assert b"404" in serve(server, client)
+
+    def test_audio_is_only_spoken_for_decks_served(
+        self, server, monkeypatch, tmp_path
+    ):
+        monkeypatch.setattr(script, "synthesize", lambda text, lang: b"mp3")
+        server.env["audio_cache_dir"] = str(tmp_path / "audio")
+
+        async def client(port):
+            socket, _ = await Client.connect(port, "/session?user=ann&deck=verbs")
+            await socket.receive()
+            socket.writer.close()
+            return (
+                await get(port, "/audio?text=To+speak&lang=en"),
+                await get(port, "/audio?text=anything&lang=en"),
+            )
+
+        served, other = serve(server, client)
+        assert served == ("HTTP/1.1 200 OK", b"mp3")
+        assert other[0] == "HTTP/1.1 404 Not Found"
+
+    def test_sessions_are_not_printed(self, server, capfd):
+        async def client(port):
+            socket, _ = await Client.connect(port, "/session?user=ann&deck=verbs")
+            while (await socket.receive())["type"] != "summary":
+                await socket.send("show")
+
+        serve(server, client)
+        server.writer.submit(lambda: None).result()
+        assert capfd.readouterr().out == ""
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+import pytest
+import script
+
+languages = {"E": "en", "R": "ru"}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(script, "synthesize", lambda text, lang: b"mp3")
+    return script.AudioCache(str(tmp_path))
+
+
+class TestPromptLoop:
+    def test_prompt_asks_four_times_before_moving_on(self, monkeypatch, capfd):
+        answers = iter(["one", "two", "three", "four", "five"])
+        monkeypatch.setattr("builtins.input", lambda _: next(answers))
+        speech = script.speechClass()("", "en")
+        assert not script.prompt(0, [1], "question", "answer", speech)
+        assert next(answers) == "five"
+        out, err = capfd.readouterr()
+        assert out.count("Wrong") == 4
+
+
+class TestInput:
+    def test_unanswered_read_does_not_hold_up_the_loop(self, monkeypatch):
+        release = threading.Event()
+        calls = []
+
+        def blocked(text):
+            calls.append(text)
+            release.wait(5)
+            return "late"
+
+        monkeypatch.setattr("builtins.input", blocked)
+        monkeypatch.setattr(script, "STDIN", script.InputReader())
+
+        async def abandoned():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(script.ainput("> "), 0.1)
+
+        started = time.monotonic()
+        asyncio.run(abandoned())
+        assert time.monotonic() - started < 2
+
+        async def next_read():
+            asyncio.get_running_loop().call_later(0.05, release.set)
+            return await script.ainput("> ")
+
+        # the line typed after giving up is the answer to the next read
+        assert asyncio.run(next_read()) == "late"
+        assert len(calls) == 1
+
+
+class TestAsyncPlayer:
+    def test_stop_interrupts_playback(self, cache, monkeypatch):
+        monkeypatch.setattr(script, "soxCommand", lambda path: ["sleep", "5"])
+
+        async def session():
+            player = script.AsyncPlayer()
+            player.play(script.speechClass()("привет", "ru", cache))
+            await asyncio.sleep(0.2)
+            started = time.monotonic()
+            player.stop()
+            await asyncio.sleep(0)
+            return time.monotonic() - started
+
+        assert asyncio.run(session()) < 1
+
+    def test_speeches_play_in_order(self, cache, monkeypatch):
+        played = []
+
+        async def playSpeech(speech):
+            await asyncio.sleep(0.01 if speech.text == "first" else 0)
+            played.append(speech.text)
+
+        monkeypatch.setattr(script, "playSpeech", playSpeech)
+
+        async def session():
+            player = script.AsyncPlayer()
+            player.play(script.speechClass()("first", "en", cache))
+            player.play(script.speechClass()("second", "en", cache))
+            await player.drain()
+
+        asyncio.run(session())
+        assert played == ["first", "second"]
+
+
+class TestRunSession:
+    def test_answer_interrupts_question_audio(self, cache, monkeypatch):
+        question = cache.path("говорить", "ru")
+        monkeypatch.setattr(
+            script,
+            "soxCommand",
+            lambda path: ["sleep", "5"] if path == question else ["true"],
+        )
+        monkeypatch.setattr("builtins.input", lambda _: "show")
+        started = time.monotonic()
+        correct, total, failed = script.Test(
+            ["R:To speak#говорить"], "#", languages, True, cache
+        )
+        assert (correct, total) == (0, 1)
+        assert time.monotonic() - started < 3
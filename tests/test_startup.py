@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+import script
+
+
+class TestLazyImports:
+    def test_importing_script_does_not_import_heavy_dependencies(self):
+        loaded = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, script; "
+                "print(*[m for m in ('google_speech', 'googletrans', 'pendulum') "
+                "if m in sys.modules])",
+            ],
+            cwd=os.path.dirname(os.path.abspath(script.__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        assert loaded.strip() == ""
+
+    def test_silent_speech_does_not_need_google_speech(self):
+        verbal_question, verbal_answer = script.speak("q", "a", {"E": "en"}, False)
+        assert verbal_question.text == verbal_answer.text == ""
+        verbal_question.play()
+
+    def test_cached_speech_is_created_on_demand(self):
+        assert script.speechClass() is script.speechClass()
+        assert script.speechClass().__name__ == "CachedSpeech"
+        assert not hasattr(script, "CachedSpeech")
@@ -0,0 +1,131 @@
+import os
+import multiprocessing
+import pytest
+import script
+
+
+def appendRecords(path, worker, count):
+    for number in range(count):
+        with script.StorageWriter() as writer:
+            writer.append(path, f"{worker:02d}-{number:04d}-" + "x" * 4000 + "\n")
+
+
+def addErrors(error_file, worker, count):
+    journal = script.ErrorJournal(error_file)
+    for number in range(count):
+        journal.update(added={f"{worker}-{number}#card\n"})
+
+
+def runWorkers(target, *args):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=target, args=(*args[:1], n, *args[1:])) for n in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+
+class TestStorageWriter:
+    def test_appends_are_committed_in_one_write(self, tmp_path, monkeypatch):
+        synced = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd) or fsync(fd))
+        path = str(tmp_path / "scores.log")
+        with script.StorageWriter() as writer:
+            writer.append(path, "one\n")
+            writer.append(path, "two\n")
+            assert not os.path.exists(path)
+        assert open(path).read() == "one\ntwo\n"
+        assert len(synced) == 1
+
+    def test_operations_run_after_appends(self, tmp_path):
+        path = str(tmp_path / "deck")
+        seen = []
+        with script.StorageWriter() as writer:
+            writer.locked(path, lambda: seen.append(open(path).read()))
+            writer.append(path, "a#b\n")
+        assert seen == ["a#b\n"]
+
+    def test_replace_is_atomic(self, tmp_path):
+        path = tmp_path / "config.ini"
+        path.write_text("old")
+        with script.StorageWriter() as writer:
+            writer.replace(str(path), "new")
+        assert path.read_text() == "new"
+        assert sorted(os.listdir(tmp_path)) == [".config.ini.lock", "config.ini"]
+
+    def test_concurrent_appends_do_not_interleave(self, tmp_path):
+        path = str(tmp_path / "scores.log")
+        runWorkers(appendRecords, path, 50)
+        lines = open(path).read().splitlines()
+        assert len(lines) == 200
+        assert all(len(line) == 4008 for line in lines)
+
+    def test_concurrent_errors_are_all_kept(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        runWorkers(addErrors, error_file, 25)
+        assert len(script.ErrorJournal(error_file).cards) == 100
+
+    def test_session_writes_are_grouped(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            script, "localTime", lambda: __import__("pendulum").datetime(2024, 1, 2)
+        )
+        log_file = str(tmp_path / "scores.log")
+        error_file = str(tmp_path / "_Errors")
+        with script.StorageWriter() as writer:
+            script.score("verbs", 1, 2, log_file, True, error_file, writer=writer)
+            script.writeErrorsToFile("verbs", error_file, {"a#b\n"}, writer)
+            assert not os.path.exists(log_file)
+            assert not os.path.exists(error_file)
+        assert open(log_file).read().endswith("verbs 1/2 50%")
+        assert open(error_file).read() == "a#b\n"
+
+    def test_session_is_synced_and_reported_once_committed(
+        self, tmp_path, monkeypatch, capsys
+    ):
+        monkeypatch.setattr(
+            script, "localTime", lambda: __import__("pendulum").datetime(2024, 1, 2)
+        )
+        events = []
+        append_file, sync_file = script.appendFile, script.syncFile
+        monkeypatch.setattr(
+            script,
+            "appendFile",
+            lambda path, text, sync=True: events.append(("write", sync))
+            or append_file(path, text, sync),
+        )
+        monkeypatch.setattr(
+            script,
+            "syncFile",
+            lambda path: events.append(("sync", os.path.basename(path)))
+            or sync_file(path),
+        )
+        log_file = str(tmp_path / "scores.log")
+        error_file = str(tmp_path / "_Errors")
+        store = script.ScoreStore(str(tmp_path / "scores.db"))
+        try:
+            with script.StorageWriter() as writer:
+                script.score("verbs", 1, 2, log_file, True, error_file, store, writer)
+                script.writeErrorsToFile("verbs", error_file, {"a#b\n"}, writer)
+                assert store.sessions() == []
+                assert "Wrote" not in capsys.readouterr().out
+            assert len(store.sessions()) == 1
+        finally:
+            store.close()
+        assert events == [
+            ("write", False),
+            ("write", False),
+            ("sync", "_Errors"),
+            ("sync", "scores.log"),
+        ]
+        out = capsys.readouterr().out
+        assert "Wrote log" in out and "Wrote Errors" in out
+
+    def test_save_leaves_no_temporary_file(self, tmp_path):
+        path = tmp_path / "config.ini"
+        script.CommandLine().do_save(str(path))
+        assert "[CONFIG]" in path.read_text()
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
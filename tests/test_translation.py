@@ -0,0 +1,213 @@
+import os
+import pytest
+import script
+
+calls = []
+
+
+class FakeTranslation:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeTranslator:
+    def translate(self, text, src="en", dest="ru"):
+        calls.append((text, src, dest))
+        return FakeTranslation(f"{dest}({text})")
+
+
+@pytest.fixture(autouse=True)
+def translator(monkeypatch):
+    calls.clear()
+    monkeypatch.setattr(script, "googleTranslator", FakeTranslator)
+    yield calls
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = script.TranslationStore(str(tmp_path / "translations.db"))
+    yield store
+    store.close()
+
+
+class TestMakeTranslation:
+    data = ["I speak\n", "you speak\n", "\n", "he speaks\n", "I speak\n"]
+
+    def test_output_preserves_input_order(self):
+        translated = script.makeTranslation(self.data, "R", "ru", "#")
+        assert translated == [
+            "R:I speak#ru(I speak)\n",
+            "R:You speak#ru(you speak)\n",
+            "R:He speaks#ru(he speaks)\n",
+            "R:I speak#ru(I speak)\n",
+        ]
+
+    def test_duplicate_lines_are_translated_once(self):
+        script.makeTranslation(self.data, "R", "ru", "#")
+        assert len(calls) == 3
+
+    def test_store_memoizes_translations(self, store):
+        script.makeTranslation(self.data, "R", "ru", "#", store)
+        calls.clear()
+        script.makeTranslation(self.data, "R", "ru", "#", store)
+        assert calls == []
+        assert len(store) == 3
+
+    def test_store_is_keyed_by_destination(self, store):
+        script.makeTranslation(["I speak"], "R", "ru", "#", store)
+        script.makeTranslation(["I speak"], "U", "uk", "#", store)
+        assert store.get("I speak", "en", "uk") == "uk(I speak)"
+        assert len(calls) == 2
+
+    def test_store_persists(self, store):
+        script.makeTranslation(["wine"], "R", "ru", "#", store)
+        reopened = script.TranslationStore(store.path)
+        assert reopened.get("wine", "en", "ru") == "ru(wine)"
+        reopened.close()
+
+
+class TestTranslateFile:
+    def test_translate_file_writes_both_directions(self, tmp_path, store):
+        src = tmp_path / "src"
+        dest = tmp_path / "dest"
+        src.write_text("language=R\nwine\nbread\n")
+        script.translateFile(str(src), str(dest), {"R": "ru"}, "#", store=store)
+        assert dest.read_text().splitlines() == [
+            "ru(wine)#R:Wine",
+            "ru(bread)#R:Bread",
+            "R:Wine#ru(wine)",
+            "R:Bread#ru(bread)",
+        ]
+
+
+@pytest.fixture
+def course(tmp_path):
+    src = tmp_path / "course"
+    (src / "unit1").mkdir(parents=True)
+    (src / "unit1" / "verbs").write_text("language=R\nto speak\nto read\n")
+    (src / "nouns").write_text("language=R\nwine\nbread\n")
+    return src
+
+
+class TestTranslateDirectory:
+    def test_every_deck_is_translated(self, course, tmp_path, store):
+        dest = tmp_path / "out"
+        results = script.translateDirectory(
+            str(course), str(dest), {"R": "ru"}, store=store
+        )
+        assert results["translated"] == 2
+        assert results["lines"] == 6
+        assert (
+            (dest / "unit1" / "verbs").read_text().startswith("ru(to speak)#R:To speak")
+        )
+        assert (dest / "nouns").exists()
+
+    def test_finished_decks_are_skipped(self, course, tmp_path, store):
+        dest = tmp_path / "out"
+        script.translateDirectory(str(course), str(dest), {"R": "ru"}, store=store)
+        calls.clear()
+        results = script.translateDirectory(
+            str(course), str(dest), {"R": "ru"}, store=store
+        )
+        assert results["skipped"] == 2
+        assert results["translated"] == 0
+        assert calls == []
+
+    def test_changed_deck_is_translated_again(self, course, tmp_path, store):
+        dest = tmp_path / "out"
+        script.translateDirectory(str(course), str(dest), {"R": "ru"}, store=store)
+        (course / "nouns").write_text("language=R\nwine\nbread\nwater\n")
+        calls.clear()
+        results = script.translateDirectory(
+            str(course), str(dest), {"R": "ru"}, store=store
+        )
+        assert results["translated"] == 1
+        assert calls == [("water", "en", "ru")]
+
+    def test_interrupted_run_resumes(self, course, tmp_path, store, monkeypatch):
+        class FlakyTranslator(FakeTranslator):
+            def translate(self, text, src="en", dest="ru"):
+                if text == "bread":
+                    raise ConnectionError("offline")
+                return super().translate(text, src, dest)
+
+        dest = tmp_path / "out"
+        monkeypatch.setattr(script, "googleTranslator", FlakyTranslator)
+        results = script.translateDirectory(
+            str(course), str(dest), {"R": "ru"}, store=store, workers=1
+        )
+        assert results["failed"] == 1
+        assert store.get("wine", "en", "ru") == "ru(wine)"
+        monkeypatch.setattr(script, "googleTranslator", FakeTranslator)
+        calls.clear()
+        results = script.translateDirectory(
+            str(course), str(dest), {"R": "ru"}, store=store
+        )
+        assert (results["translated"], results["skipped"]) == (1, 1)
+        assert calls == [("bread", "en", "ru")]
+
+    def test_automake_dir_command(self, course, tmp_path, monkeypatch):
+        dest = tmp_path / "out"
+        cli = script.CommandLine()
+        cli.env["translation_store"] = str(tmp_path / "translations.db")
+        cli.onecmd(f"automake-dir {course} {dest}")
+        assert sorted(os.listdir(dest)) == [".automake", "nouns", "unit1"]
+
+    def test_decks_not_written_by_automake_are_not_overwritten(
+        self, course, tmp_path, store, monkeypatch
+    ):
+        dest = tmp_path / "out"
+        dest.mkdir()
+        (dest / "nouns").write_text("mine\n")
+        monkeypatch.setattr("builtins.input", lambda _: "no")
+        with pytest.raises(IOError):
+            script.translateDirectory(str(course), str(dest), {"R": "ru"}, store=store)
+        assert (dest / "nouns").read_text() == "mine\n"
+
+
+class TestTranslationMemory:
+    def test_seed_reads_pairs_in_both_directions(self, tmp_path, store):
+        deck = tmp_path / "deck"
+        deck.write_text("R:To speak#говорить\nвино#R:Wine\nFrance#Country\n")
+        assert store.seed([str(deck)], {"R": "ru", "E": "en"}) == 2
+        assert store.get("to speak", "en", "ru") == "говорить"
+        assert store.get("Wine", "en", "ru") == "вино"
+
+    def test_unchanged_decks_are_not_read_again(self, tmp_path, store):
+        deck = tmp_path / "deck"
+        deck.write_text("R:To speak#говорить\n")
+        store.seed([str(deck)], {"R": "ru"})
+        assert store.seed([str(deck)], {"R": "ru"}) == 0
+        deck.write_text("R:To speak#говорить\nR:To read#читать\n")
+        assert store.seed([str(deck)], {"R": "ru"}) == 2
+
+    def test_memory_is_tried_before_the_backend(self, tmp_path, store):
+        deck = tmp_path / "deck"
+        deck.write_text("R:To speak#говорить\n")
+        store.seed([str(deck)], {"R": "ru"})
+        translated = script.makeTranslation(
+            ["to speak", "to read"], "R", "ru", "#", store
+        )
+        assert translated == ["R:To speak#говорить\n", "R:To read#ru(to read)\n"]
+        assert calls == [("to read", "en", "ru")]
+
+    def test_offline_backend_leaves_out_misses(self, store):
+        store.update({"wine": "вино"}, "en", "ru")
+        translated = script.makeTranslation(
+            ["wine", "bread"], "R", "ru", "#", store, backend=script.Offline()
+        )
+        assert translated == ["R:Wine#вино\n"]
+        assert calls == []
+
+    def test_automake_seeds_from_working_dir(self, tmp_path):
+        working_dir = tmp_path / "decks"
+        working_dir.mkdir()
+        (working_dir / "verbs").write_text("R:To speak#говорить\n")
+        src = tmp_path / "src"
+        src.write_text("language=R\nto speak\n")
+        cli = script.CommandLine()
+        cli.env["working_dir"] = str(working_dir)
+        cli.env["translation_store"] = str(tmp_path / "translations.db")
+        cli.env["translation_backend"] = "offline"
+        cli.do_automake(f"{src} {tmp_path / 'dest'}")
+        assert (tmp_path / "dest").read_text().startswith("говорить#R:To speak")
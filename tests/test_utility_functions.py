@@ -12,12 +12,14 @@ errors = {"answer#question\n", "answer1#question1\n"}
 def writeLog():
     yield script.writeLog("mockTest", 3, 10, log_file, True)
     os.remove(log_file)
+    os.remove(script.lockPath(log_file))
 
 
 @pytest.fixture
 def writeErrorsToFile():
     yield script.writeErrorsToFile("MockTest", error_file, errors)
     os.remove(error_file)
+    os.remove(script.lockPath(error_file))
 
 
 class TestWriteLog:
@@ -35,3 +37,55 @@ class TestWriteErrorsToFile:
 
     def test_all_errors_in_error_file(self, writeErrorsToFile):
         assert all(error in open(error_file).readlines() for error in errors)
+
+
+class TestErrorJournal:
+    def test_existing_errors_are_kept(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        script.writeErrorsToFile("verbs", error_file, {"a#b\n"})
+        script.writeErrorsToFile("nouns", error_file, {"c#d\n"})
+        assert sorted(open(error_file).readlines()) == ["a#b\n", "c#d\n"]
+
+    def test_errors_are_appended_once(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        script.writeErrorsToFile("verbs", error_file, {"a#b\n"})
+        script.writeErrorsToFile("verbs", error_file, {"a#b\n"})
+        assert open(error_file).readlines() == ["a#b\n"]
+
+    def test_random_collection_does_not_change_errors(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        script.writeErrorsToFile("verbs", error_file, {"a#b\n"})
+        script.writeErrorsToFile("Random Collection", error_file, {"c#d\n"})
+        assert open(error_file).readlines() == ["a#b\n"]
+
+    def test_correct_answers_are_journaled_as_removed(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        script.writeErrorsToFile("verbs", error_file, {"a#b\n", "c#d\n"})
+        script.writeErrorsToFile(error_file, error_file, {"c#d\n"})
+        assert script.ErrorJournal(error_file).cards == {"c#d"}
+        assert os.path.exists(tmp_path / "._Errors.journal")
+
+    def test_removed_error_can_be_added_again(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        journal = script.ErrorJournal(error_file)
+        journal.update(added={"a#b\n"})
+        journal.update(removed={"a#b\n"})
+        journal.update(added={"a#b\n"})
+        assert script.ErrorJournal(error_file).cards == {"a#b"}
+
+    def test_compact_rewrites_deck_and_empties_journal(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        journal = script.ErrorJournal(error_file)
+        journal.update(added={"a#b\n", "c#d\n"})
+        journal.update(removed={"a#b\n"})
+        journal.compact()
+        assert open(error_file).readlines() == ["c#d\n"]
+        assert not os.path.exists(tmp_path / "._Errors.journal")
+
+    def test_journal_compacts_after_threshold(self, tmp_path):
+        error_file = str(tmp_path / "_Errors")
+        journal = script.ErrorJournal(error_file, compact_after=2)
+        journal.update(added={"a#b", "c#d", "e#f"})
+        journal.update(removed={"a#b", "c#d", "e#f"})
+        assert open(error_file).readlines() == []
+        assert journal.events == 0